@@ -0,0 +1,240 @@
+"""Benchmarks for the domain, storage & handler hot paths.
+
+Each benchmark is run at every graph size requested & reports the best time per
+operation over a number of repeats. Results are written as json lines so they can be
+kept & compared against the results of another commit with --compare.
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from conversation.backend import FilesystemStorage
+from conversation.domain import models
+from conversation.domain.generator import GraphGenerator
+from conversation.handlers import InMemoryHandler, to_facebook_message, FacebookMessageEncoder
+
+
+_SIZES = "1000,10000,100000,1000000"
+
+
+def parse_args():
+    a = argparse.ArgumentParser(description="Benchmark domain, storage & handler hot paths")
+    a.add_argument("--sizes", default=_SIZES, help=f"comma separated graph sizes (nodes). Defaults to {_SIZES}")
+    a.add_argument("-r", "--repeat", type=int, default=3, help="repeats per benchmark, the best is reported")
+    a.add_argument("-b", "--bench", action="append", help="only run the named benchmark(s)")
+    a.add_argument("-o", "--output", help="write results (json lines) here rather than stdout")
+    a.add_argument("-c", "--compare", help="results file from a previous run to compare against")
+    a.add_argument(
+        "-t", "--threshold", type=float, default=0.1, help="slowdown (fraction) reported as a regression"
+    )
+    a.add_argument("-s", "--seed", type=int, default=0)
+    return a.parse_args()
+
+
+def build_graph(size: int, seed: int) -> models.Graph:
+    """Generate a graph with the given number of nodes.
+
+    :param size:
+    :param seed:
+    :return: models.Graph
+
+    """
+    return GraphGenerator(nodes=size, roots=4, message_branching=4, reply_branching=2, join=0.1, seed=seed).graph()
+
+
+def _sample(g: models.Graph, count: int, seed: int) -> list:
+    nodes = list(g.nodes)
+    return random.Random(seed).sample(nodes, min(count, len(nodes)))
+
+
+def bench_graph_encode(g, seed, location):
+    return 1, g.encode
+
+
+def bench_graph_decode(g, seed, location):
+    data = g.encode()
+    return 1, lambda: models.Graph.decode(data)
+
+
+def bench_storage_write(g, seed, location):
+    return 1, lambda: FilesystemStorage().write("bench", location, g)
+
+
+def bench_storage_read(g, seed, location):
+    FilesystemStorage().write("bench", location, g)
+    return 1, lambda: FilesystemStorage().read("bench.cnv", location)
+
+
+def bench_graph_next_nodes(g, seed, location):
+    sample = _sample(g, 5, seed)
+
+    def run():
+        for n in sample:
+            for _ in g.next_nodes(n):
+                pass
+    return len(sample), run
+
+
+def bench_handler_can_move_to(g, seed, location):
+    hnd = InMemoryHandler(g)
+    hnd.set_state("name", "bob")
+    sample = _sample(g, 1000, seed)
+
+    def run():
+        for n in sample:
+            hnd._can_move_to(n)
+    return len(sample), run
+
+
+def bench_to_facebook_message(g, seed, location):
+    msg = models.Node()
+    msg.type = models.Node.Type.Message
+    msg.text = "hello {name}, how are you?"
+    replies = _sample(g, 4, seed)
+    state = {"name": "bob"}
+
+    def run():
+        for _ in range(1000):
+            to_facebook_message(state, msg, replies)
+    return 1000, run
+
+
+def bench_facebook_message_encoder(g, seed, location):
+    msg = models.Node()
+    msg.type = models.Node.Type.Message
+    msg.text = "hello {name}, how are you?"
+    replies = _sample(g, 4, seed)
+    state = {"name": "bob"}
+    enc = FacebookMessageEncoder()
+
+    def run():
+        for _ in range(1000):
+            enc.encode(state, msg, replies)
+    return 1000, run
+
+
+BENCHMARKS = {
+    "graph_encode": bench_graph_encode,
+    "graph_decode": bench_graph_decode,
+    "storage_write": bench_storage_write,
+    "storage_read": bench_storage_read,
+    "graph_next_nodes": bench_graph_next_nodes,
+    "handler_can_move_to": bench_handler_can_move_to,
+    "to_facebook_message": bench_to_facebook_message,
+    "facebook_message_encoder": bench_facebook_message_encoder,
+}
+
+
+def _commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return ""
+
+
+def run(names, sizes, repeat, seed):
+    """Run the given benchmarks at each size.
+
+    :param names: benchmark names
+    :param sizes: graph sizes
+    :param repeat:
+    :param seed:
+    :return: generator of dict
+
+    """
+    commit = _commit()
+    location = tempfile.TemporaryDirectory()
+
+    for size in sizes:
+        g = build_graph(size, seed)
+
+        for name in names:
+            ops, fn = BENCHMARKS[name](g, seed, location.name)
+
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                fn()
+                taken = time.perf_counter() - start
+                best = taken if best is None else min(best, taken)
+
+            yield {
+                "bench": name,
+                "size": size,
+                "seconds_per_op": best / ops,
+                "ops": ops,
+                "repeat": repeat,
+                "commit": commit,
+                "python": platform.python_version(),
+            }
+
+    location.cleanup()
+
+
+def compare(results, baseline_path, threshold) -> list:
+    """Compare results to those in the given file.
+
+    :param results: list of dict
+    :param baseline_path:
+    :param threshold: fraction slower that counts as a regression
+    :return: list of str (regressions)
+
+    """
+    baseline = {}
+    with open(baseline_path, "r") as f:
+        for line in f:
+            if line.strip():
+                r = json.loads(line)
+                baseline[(r["bench"], r["size"])] = r["seconds_per_op"]
+
+    regressions = []
+    for r in results:
+        before = baseline.get((r["bench"], r["size"]))
+        if not before:
+            continue
+
+        change = (r["seconds_per_op"] - before) / before
+        line = f"{r['bench']} @ {r['size']}: {before:.3e}s -> {r['seconds_per_op']:.3e}s ({change:+.1%})"
+        print(line, file=sys.stderr)
+        if change > threshold:
+            regressions.append(line)
+
+    return regressions
+
+
+def main(args):
+    names = args.bench or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            raise ValueError(f"unknown benchmark {name}, expected one of {', '.join(BENCHMARKS)}")
+
+    sizes = [int(float(s)) for s in args.sizes.split(",")]
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    results = []
+    try:
+        for r in run(names, sizes, args.repeat, args.seed):
+            results.append(r)
+            out.write(json.dumps(r) + "\n")
+            out.flush()
+    finally:
+        if args.output:
+            out.close()
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print("regressions:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args)
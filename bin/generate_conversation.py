@@ -0,0 +1,48 @@
+import argparse
+import os
+
+from conversation.backend import FilesystemStorage
+from conversation.domain.generator import GraphGenerator
+
+
+def parse_args():
+    loc = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples")
+
+    a = argparse.ArgumentParser(description="Generate a synthetic conversation graph")
+    a.add_argument("-l", "--location", default=loc, help=f"Defaults to {loc}")
+    a.add_argument("-n", "--name", required=True, help="conversation file to write")
+    a.add_argument("--nodes", type=int, default=1000)
+    a.add_argument("--roots", type=int, default=1)
+    a.add_argument("--depth", type=int, default=0, help="max depth, 0 for no limit")
+    a.add_argument("--message-branching", type=int, default=3, help="max replies per message")
+    a.add_argument("--reply-branching", type=int, default=1, help="max messages per reply")
+    a.add_argument("--join", type=float, default=0.0, help="chance a node has a second parent")
+    a.add_argument("--user-required", type=float, default=1.0)
+    a.add_argument("--flag-density", type=float, default=0.1)
+    a.add_argument("--state-density", type=float, default=0.1)
+    a.add_argument("--action-density", type=float, default=0.3)
+    a.add_argument("-s", "--seed", type=int, default=0)
+
+    return a.parse_args()
+
+
+def main(args):
+    gen = GraphGenerator(
+        nodes=args.nodes,
+        roots=args.roots,
+        depth=args.depth,
+        message_branching=args.message_branching,
+        reply_branching=args.reply_branching,
+        join=args.join,
+        user_required=args.user_required,
+        flag_density=args.flag_density,
+        state_density=args.state_density,
+        action_density=args.action_density,
+        seed=args.seed,
+    )
+    print("wrote", gen.write(FilesystemStorage(), args.name, args.location))
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args)
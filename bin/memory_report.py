@@ -0,0 +1,45 @@
+import argparse
+import json
+import os
+
+from conversation.backend import FilesystemStorage
+from conversation.handlers import memory
+
+
+def parse_args():
+    loc = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples")
+
+    a = argparse.ArgumentParser(description="Report the memory used by a graph & sessions running over it")
+    a.add_argument("-l", "--location", default=loc, help=f"Defaults to {loc}")
+    a.add_argument("-n", "--name", required=True, help="conversation file to load")
+    a.add_argument("--sessions", type=int, default=1000, help="number of sessions to simulate")
+    a.add_argument("--max-steps", type=int, default=50, help="max steps to walk each session")
+    a.add_argument("-s", "--seed", type=int, default=0)
+    a.add_argument("--json", action="store_true", help="print the report as json")
+
+    return a.parse_args()
+
+
+def _print(title, report):
+    print(title)
+    for k, v in report.items():
+        if isinstance(v, float):
+            v = round(v, 1)
+        print(f"  {k:<20} {v:>14,}")
+
+
+def main(args):
+    graph, graph_report = memory.load_report(FilesystemStorage(), args.name, args.location)
+    session_report = memory.session_report(graph, args.sessions, seed=args.seed, max_steps=args.max_steps)
+
+    if args.json:
+        print(json.dumps({"graph": graph_report, "sessions": session_report}, indent=2))
+        return
+
+    _print("graph (bytes)", graph_report)
+    _print("sessions (bytes)", session_report)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args)
@@ -0,0 +1,83 @@
+import argparse
+import importlib
+import json
+import os
+
+from conversation.handlers import simulator
+
+
+def parse_args():
+    loc = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples")
+
+    a = argparse.ArgumentParser(description="Run randomised conversations over a graph & report throughput")
+    a.add_argument("-l", "--location", default=loc, help=f"Defaults to {loc}")
+    a.add_argument("-n", "--name", required=True, help="conversation file to load")
+    a.add_argument("-w", "--walks", type=int, default=10000, help="number of conversations to run")
+    a.add_argument("-p", "--processes", type=int, default=0, help="run across a pool of processes")
+    a.add_argument("-s", "--seed", type=int, default=0)
+    a.add_argument("--max-steps", type=int, default=1000, help="cut conversations short after this many steps")
+    a.add_argument(
+        "--handler",
+        action="append",
+        help="module:func(graph, seed) returning a ConversationHandler, may be given more than once to compare",
+    )
+    a.add_argument(
+        "--graph",
+        action="append",
+        help="module:Class to decode the graph with, may be given more than once to compare",
+    )
+    a.add_argument("--top", type=int, default=10, help="number of most visited nodes & dead ends to show")
+    a.add_argument("--json", action="store_true", help="print full reports as json")
+
+    return a.parse_args()
+
+
+def _import(path):
+    module, name = path.split(":", 1)
+    return getattr(importlib.import_module(module), name)
+
+
+def main(args):
+    with open(os.path.join(args.location, args.name), "r") as f:
+        data = json.loads(f.read().strip())
+
+    handlers = args.handler or ["conversation.handlers.simulator:in_memory_handler"]
+    graphs = args.graph or ["conversation.domain.models:Graph"]
+
+    reports = []
+    for graph_path in graphs:
+        graph = _import(graph_path).decode(data)
+
+        for handler_path in handlers:
+            factory = _import(handler_path)
+
+            if args.processes:
+                result = simulator.simulate_parallel(
+                    graph, args.walks, args.processes, seed=args.seed, max_steps=args.max_steps, factory=factory
+                )
+            else:
+                result = simulator.simulate(
+                    graph, args.walks, seed=args.seed, max_steps=args.max_steps, factory=factory
+                )
+
+            report = result.report(top=args.top)
+            report["graph"] = graph_path
+            report["handler"] = handler_path
+            reports.append(report)
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+
+    for r in reports:
+        print(f"{r['graph']} / {r['handler']}")
+        print(f"  {r['walks']} walks, {r['steps']} steps in {r['elapsed']:.3f}s ({r['steps_per_second']:.0f} steps/sec)")
+        print(f"  length mean {r['mean_length']:.2f} max {r['max_length']}, {r['truncated']} truncated")
+        print(f"  {r['nodes_visited']} nodes visited, {r['dead_end_walks']} walks hit a dead end")
+        for node_id, count in r["dead_ends"]:
+            print(f"    dead end {node_id}: {count}")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args)
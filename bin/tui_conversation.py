@@ -1,15 +1,21 @@
 import argparse
 import os
 import sys
-import random
 
 from conversation.handlers import InMemoryHandler
+from conversation.handlers import selection
 from conversation.backend import FilesystemStorage
 from conversation.domain import models
 
 
 _QUIT = ["q", "quit", "exit"]
 
+_SELECTORS = {
+    "uniform": selection.UniformSelector,
+    "weighted": selection.WeightedSelector,
+    "priority": selection.PrioritySelector,
+}
+
 
 def parse_args():
     loc = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples")
@@ -17,6 +23,10 @@ def parse_args():
     a = argparse.ArgumentParser()
     a.add_argument("-l", "--location", default=loc, help=f"Defaults to {loc}")
     a.add_argument("-n", "--name", help="conversation file to load")
+    a.add_argument("-s", "--seed", type=int, help="seed bot choices to make the conversation reproducible")
+    a.add_argument(
+        "--selector", default="uniform", choices=sorted(_SELECTORS), help="how the bot picks between messages"
+    )
 
     return a.parse_args()
 
@@ -63,11 +73,10 @@ def run_conversation(handler):
         handler.current_node = nxt
 
         if nxt.Type.Reply == nxt.type:
-            options = handler.next_nodes()
-            if not options:
+            next_message = handler.choose_next()
+            if not next_message:
                 exit(0)
 
-            next_message = random.choice(options)
             handler.current_node = next_message
 
         nxt = send_message(handler.state(), handler.current_node, handler.next_nodes())
@@ -82,7 +91,7 @@ def main(args):
         return
 
     graph = fs.read(args.name, args.location)
-    hnd = InMemoryHandler(graph)
+    hnd = InMemoryHandler(graph, selector=_SELECTORS[args.selector](), seed=args.seed)
     run_conversation(hnd)
 
 
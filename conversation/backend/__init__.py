@@ -2,8 +2,12 @@
 
 """
 from conversation.backend.base import FilesystemStorage
+from conversation.backend.journal import FilesystemJournal
+from conversation.backend.recovery import FilesystemRecovery
 
 
 __all__ = [
     "FilesystemStorage",
+    "FilesystemJournal",
+    "FilesystemRecovery",
 ]
@@ -10,11 +10,11 @@ class Storage(metaclass=abc.ABCMeta):
     _SUFFIX = '.cnv'
 
     @abc.abstractmethod
-    def write(self, name: str, location: str, graph: models.Graph):
+    def write(self, name: str, location: str, graph: models.Graph, progress=None):
         pass
 
     @abc.abstractmethod
-    def read(self, name: str, location: str) -> models.Graph:
+    def read(self, name: str, location: str, progress=None) -> models.Graph:
         pass
 
     @abc.abstractmethod
@@ -36,12 +36,16 @@ class FilesystemStorage(Storage):
 
         return [i for i in os.listdir(location) if i.endswith(self._SUFFIX)]
 
-    def write(self, name, location, graph):
-        """Write file to disk as .json file with our suffix
+    def write(self, name, location, graph, progress=None):
+        """Write file to disk as .json file with our suffix.
+
+        The file is written alongside & moved into place, so a failed (or cancelled)
+        write never leaves a half written file behind.
 
         :param name:
         :param location:
         :param graph:
+        :param progress: func(nodes done, nodes total), passed to the encoder
         """
         if not os.path.exists(location):
             os.makedirs(location)
@@ -49,20 +53,73 @@ class FilesystemStorage(Storage):
         if not name.endswith(self._SUFFIX):
             name += self._SUFFIX
 
-        encoded = graph.encode()
+        encoded = graph.encode(progress=progress)
         data = json.dumps(encoded)
         fpath = os.path.join(location, name)
 
-        with open(fpath, "w") as f:
-            f.write(data)
+        tmp = fpath + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                f.write(data)
+            os.replace(tmp, fpath)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        return fpath
+
+    def write_stream(self, name, location, nodes, edges, metadata=None):
+        """Write a graph to disk one node at a time, for graphs too large to hold
+        in memory both as a Graph and as encoded data.
+
+        :param name:
+        :param location:
+        :param nodes: iterable of Node
+        :param edges: iterable of (id, id) tuples, only iterated after nodes
+        :param metadata: graph metadata
+        :return: str
+
+        """
+        if not os.path.exists(location):
+            os.makedirs(location)
+
+        if not name.endswith(self._SUFFIX):
+            name += self._SUFFIX
+
+        fpath = os.path.join(location, name)
+
+        # never leave a partly written file in place of the last one
+        tmp = fpath + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                f.write('{"nodes": [')
+                for i, node in enumerate(nodes):
+                    if i:
+                        f.write(", ")
+                    f.write(json.dumps(node.encode()))
+
+                f.write('], "edges": [')
+                for i, (a, b) in enumerate(edges):
+                    if i:
+                        f.write(", ")
+                    f.write(json.dumps(sorted([a, b])))
+
+                f.write('], "metadata": ')
+                f.write(json.dumps(metadata or {}))
+                f.write("}")
+            os.replace(tmp, fpath)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
 
         return fpath
 
-    def read(self, name, location):
+    def read(self, name, location, progress=None):
         """Read data from json file on disk
 
         :param name:
         :param location:
+        :param progress: func(nodes done, nodes total), passed to the decoder
         :return: Graph
 
         """
@@ -70,4 +127,4 @@ class FilesystemStorage(Storage):
             line = f.read().strip()
 
         data = json.loads(line)
-        return models.Graph.decode(data)
+        return models.Graph.decode(data, progress=progress)
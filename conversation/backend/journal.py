@@ -0,0 +1,133 @@
+import json
+import os
+import time
+
+
+class FilesystemJournal:
+    """Append only transition log for a single conversation session.
+
+    Every transition (the node moved to & the actions applied) is written as one
+    JSON line to '<session>.log'. Periodically the handler writes a compact snapshot
+    of it's state & flags to '<session>.snap', along with the log offset at that point,
+    so recovery only has to replay the tail of the log written after it.
+
+    Lines are buffered & written with a single fsync every 'batch_size' records, so
+    logging doesn't bound how fast a conversation can step. The log is never truncated,
+    so it also serves as an audit trail of the session.
+    """
+
+    _LOG_SUFFIX = '.log'
+    _SNAP_SUFFIX = '.snap'
+
+    def __init__(self, session: str, location: str, batch_size: int=64, snapshot_every: int=1000):
+        if not os.path.exists(location):
+            os.makedirs(location)
+
+        self._log_path = os.path.join(location, session + self._LOG_SUFFIX)
+        self._snap_path = os.path.join(location, session + self._SNAP_SUFFIX)
+
+        self._batch_size = batch_size
+        self._snapshot_every = snapshot_every
+
+        self._buffer = []
+        self._since_snapshot = 0
+        self._file = None
+
+    @property
+    def session(self) -> str:
+        return os.path.basename(self._log_path)[:-len(self._LOG_SUFFIX)]
+
+    def record(self, node: str, actions: list) -> bool:
+        """Record a transition to the given node.
+
+        :param node: id of the node moved to
+        :param actions: list of [action name, value] applied on arrival
+        :return: bool (True if a snapshot is due)
+
+        """
+        self._buffer.append(json.dumps({
+            "time": time.time(),
+            "node": node,
+            "actions": actions,
+        }).encode() + b"\n")
+
+        if len(self._buffer) >= self._batch_size:
+            self.flush()
+
+        self._since_snapshot += 1
+        return self._since_snapshot >= self._snapshot_every
+
+    def flush(self):
+        """Write out all buffered records & fsync the log.
+        """
+        if not self._buffer:
+            return
+
+        if self._file is None:
+            self._file = open(self._log_path, "ab")
+
+        self._file.write(b"".join(self._buffer))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._buffer = []
+
+    def snapshot(self, data: dict):
+        """Write a snapshot of the session, covering everything recorded so far.
+
+        :param data: json serialisable session state
+
+        """
+        self.flush()
+
+        offset = 0
+        if os.path.exists(self._log_path):
+            offset = os.path.getsize(self._log_path)
+
+        tmp = self._snap_path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(json.dumps({"offset": offset, "data": data}))
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp, self._snap_path)  # never leave a half written snapshot
+        self._since_snapshot = 0
+
+    def load(self) -> tuple:
+        """Read the newest snapshot & the records written after it.
+
+        :return: dict or None, list
+
+        """
+        self.flush()
+
+        snapshot = None
+        offset = 0
+        if os.path.exists(self._snap_path):
+            with open(self._snap_path, "r") as f:
+                snap = json.loads(f.read())
+            snapshot = snap.get("data")
+            offset = snap.get("offset", 0)
+
+        tail = []
+        if os.path.exists(self._log_path):
+            with open(self._log_path, "rb+") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # partially written record from a crash, drop it so that
+                        # new records aren't appended onto the end of it
+                        f.truncate(offset)
+                        break
+                    tail.append(json.loads(line))
+                    offset += len(line)
+
+        self._since_snapshot = len(tail)
+        return snapshot, tail
+
+    def close(self):
+        """Flush any buffered records & close the log.
+        """
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
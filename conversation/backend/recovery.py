@@ -0,0 +1,252 @@
+import json
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+    import msvcrt
+
+
+class FilesystemRecovery:
+    """Crash recovery files for a graph being edited.
+
+    '<name>.base' says what the graph started from -- a saved conversation file, or
+    a full encoded graph -- & '<name>.journal' holds one JSON line per autosave with
+    only the nodes & edges changed since the one before. Recovery reads the base &
+    replays the journal over it; since each line holds the latest state of what
+    changed, replaying a line twice is harmless.
+
+    The base also records the journal offset it covers, so it can be replaced in one
+    atomic step before the journal is emptied; a crash at any point leaves files
+    that recover to the same graph.
+
+    Each running editor claims its own files with an OS lock on '<name>.lock', which
+    is let go when the process exits; so files whose lock is free are left from a
+    crash (or clean exit) & can be recovered.
+    """
+
+    _BASE_SUFFIX = '.base'
+    _JOURNAL_SUFFIX = '.journal'
+    _LOCK_SUFFIX = '.lock'
+
+    def __init__(self, name: str, location: str, compact_every: int=100):
+        if not os.path.exists(location):
+            os.makedirs(location)
+
+        self._base_path = os.path.join(location, name + self._BASE_SUFFIX)
+        self._journal_path = os.path.join(location, name + self._JOURNAL_SUFFIX)
+        self._lock_path = os.path.join(location, name + self._LOCK_SUFFIX)
+
+        self._compact_every = compact_every
+        self._since_compact = 0
+        self._file = None
+        self._lock = None
+
+    @classmethod
+    def claim(cls, name: str, location: str, **kwargs):
+        """Return recovery files at the given location that no other process is
+        using, named after name (suffixed with a number if the first are in use).
+
+        :param name: str
+        :param location: str
+        :return: FilesystemRecovery (locked)
+
+        """
+        i = 1
+        while True:
+            recovery = cls(name if i == 1 else f"{name}-{i}", location, **kwargs)
+            if recovery.lock():
+                return recovery
+            i += 1
+
+    def lock(self) -> bool:
+        """Claim these files for this process until unlock is called, or we exit
+
+        :return: bool (False if another process holds them)
+
+        """
+        if self._lock is not None:
+            return True
+
+        f = open(self._lock_path, "a+b")
+        f.seek(0)
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.close()
+            return False
+
+        self._lock = f
+        return True
+
+    def unlock(self):
+        if self._lock is not None:
+            self._lock.close()  # closing lets go of the lock
+            self._lock = None
+
+    def exists(self) -> bool:
+        """Return if there are changes that haven't been saved to a conversation file
+
+        :return: bool
+
+        """
+        if os.path.exists(self._journal_path) and os.path.getsize(self._journal_path) > 0:
+            return True
+        return "graph" in self._read_base()
+
+    @property
+    def modified(self) -> float:
+        """Return when recovery files were last written, or 0 if there are none
+
+        :return: float
+
+        """
+        times = [os.path.getmtime(p) for p in (self._base_path, self._journal_path) if os.path.exists(p)]
+        return max(times) if times else 0
+
+    def append(self, changes: dict) -> bool:
+        """Append changes (see NodeGraph.take_changes) to the journal
+
+        :param changes: dict
+        :return: bool (True if the journal is due to be compacted)
+
+        """
+        if self._file is None:
+            self._file = open(self._journal_path, "ab")
+
+        record = dict(changes)
+        record["time"] = time.time()
+
+        self._file.write(json.dumps(record).encode() + b"\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+        self._since_compact += 1
+        return self._since_compact >= self._compact_every
+
+    def rebase(self, source: str=None):
+        """Start over from the given conversation file (eg. one just saved or
+        loaded), or from an empty graph.
+
+        :param source: path to a conversation file
+
+        """
+        self._reset({"file": source})
+
+    def compact(self):
+        """Fold the journal into the base, so recovery needn't replay it.
+        """
+        data, source = self.read()
+        self._reset({"file": source, "graph": data})
+
+    def read(self) -> tuple:
+        """Read the base & replay the journal over it.
+
+        :return: encoded graph (dict), path of the conversation file it started from
+
+        """
+        base = self._read_base()
+        source = base.get("file")
+
+        data = base.get("graph")
+        if data is None:
+            data = {}
+            if source and os.path.exists(source):
+                with open(source, "r") as f:
+                    data = json.loads(f.read())
+
+        nodes = {n["id"]: n for n in data.get("nodes", [])}
+        edges = {tuple(sorted(e)) for e in data.get("edges", [])}
+
+        replayed = 0
+        offset = base.get("offset", 0)
+        if os.path.exists(self._journal_path):
+            with open(self._journal_path, "rb+") as f:
+                if offset > os.path.getsize(self._journal_path):
+                    # the journal was emptied after this base was written, so it
+                    # covers everything; fix the offset so new records are replayed
+                    offset = base["offset"] = 0
+                    self._write_base(base)
+
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # partially written record from a crash, drop it so that
+                        # new records aren't appended onto the end of it
+                        f.truncate(offset)
+                        break
+                    self._replay(json.loads(line), nodes, edges)
+                    offset += len(line)
+                    replayed += 1
+
+        self._since_compact = replayed
+        return {
+            "nodes": list(nodes.values()),
+            "edges": [list(e) for e in sorted(edges) if e[0] in nodes and e[1] in nodes],
+            "metadata": data.get("metadata", {}),
+        }, source
+
+    @staticmethod
+    def _replay(record, nodes, edges):
+        for n in record.get("nodes", []):
+            nodes[n["id"]] = n
+        for id_ in record.get("removed", []):
+            nodes.pop(id_, None)
+        for e in record.get("edges", []):
+            edges.add(tuple(sorted(e)))
+        for e in record.get("unlinked", []):
+            edges.discard(tuple(sorted(e)))
+
+    def clear(self):
+        """Remove all recovery files
+        """
+        self.close()
+        for path in (self._base_path, self._journal_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._since_compact = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _read_base(self) -> dict:
+        if not os.path.exists(self._base_path):
+            return {}
+        with open(self._base_path, "r") as f:
+            return json.loads(f.read())
+
+    def _write_base(self, base):
+        tmp = self._base_path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(json.dumps(base))
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp, self._base_path)  # never leave a half written base
+
+    def _reset(self, base):
+        """Replace the base & empty the journal.
+
+        :param base: dict
+
+        """
+        self.close()
+
+        # the new base covers the journal as it is, so emptying the journal after
+        # this is safe whenever we crash
+        base["offset"] = os.path.getsize(self._journal_path) if os.path.exists(self._journal_path) else 0
+        self._write_base(base)
+
+        with open(self._journal_path, "wb"):
+            pass
+
+        base["offset"] = 0
+        self._write_base(base)
+        self._since_compact = 0
@@ -0,0 +1,238 @@
+"""Static analysis of a conversation graph.
+
+Works out, for every transition in the graph, which flags & state values could
+possibly be set by the time the conversation reaches it, based on the actions of
+the nodes that lead there. Transitions are then marked as
+
+ - Always: the flag / state conditions of the target are met on every path
+ - Never: no path can produce the flag / state the target requires
+ - Runtime: depends on the path taken, so must be checked while running
+
+User conditions depend on who is talking rather than the graph, so are always left
+to be checked at runtime.
+
+The analysis assumes sessions start at a root with no flags or state, other than
+any given as 'flags' / 'state' (eg. if your handler carries flags over between
+conversations), & that the actions of the root a session starts at are applied
+unless 'apply_roots' is False.
+"""
+from conversation.domain import actions
+
+
+Always = "always"
+Never = "never"
+Runtime = "runtime"
+
+
+class Reachability:
+
+    def __init__(self, graph, flags=(), state: dict=None, apply_roots: bool=True):
+        self._graph = graph
+        self.apply_roots = apply_roots
+
+        # node id -> tuple((node, verdict), ..) with Never transitions removed
+        self._successors = {}
+
+        # node id -> verdict of entering the node as a root
+        self._roots = {}
+
+        self._verdicts = {}
+        self._reachable = set()
+
+        initial_state = {k: {v} for k, v in (state or {}).items()}
+        self._analyse(frozenset(flags), initial_state)
+
+    @staticmethod
+    def _number(n):
+        return n.number or 0
+
+    @staticmethod
+    def _produces(n):
+        """Return what the node's actions do to a session
+
+        :param n:
+        :return: bool, set, dict (clears state, flags added, state set)
+
+        """
+        clears = False
+        flags = set()
+        state = {}
+        for action, value in n.actions:
+            if action == actions.ClearState and value:
+                clears = True
+            elif action == actions.SetState:
+                k, v = actions.SetState.parse(value)
+                state[k] = v
+            elif action == actions.AddFlag:
+                flags.add(actions.AddFlag.parse(value))
+        return clears, flags, state
+
+    @staticmethod
+    def _verdict(n, may_flags, must_flags, may_state) -> str:
+        """Decide if the flag & state conditions on the given node can be met by
+        a session that may have the given flags & state.
+
+        :param n: node being moved to
+        :param may_flags: flags set on at least one path
+        :param must_flags: flags set on every path
+        :param may_state: key -> set(values) set on at least one path
+        :return: str
+
+        """
+        flag = n.conditions.flag_required
+        if flag and flag not in may_flags:
+            return Never
+
+        required = n.conditions.state_required
+        for k, v in required.items():
+            if v not in may_state.get(k, ()):
+                return Never
+
+        if required or (flag and flag not in must_flags):
+            return Runtime
+        return Always
+
+    def _analyse(self, flags, state):
+        """Propagate the possible flags & state of sessions along the graph edges.
+
+        Edges only ever point from a lower to a higher node number, so visiting nodes
+        in number order means every node is visited after all of it's parents.
+
+        """
+        successors = {}
+        for a, b in self._graph.edges:
+            if self._number(b) > self._number(a):
+                successors.setdefault(a.id, []).append(b)
+            elif self._number(a) > self._number(b):
+                successors.setdefault(b.id, []).append(a)
+
+        may_flags = {}
+        must_flags = {}
+        may_state = {}
+
+        # nodes a session can arrive at from a parent (rather than only start at)
+        entered = set()
+
+        for n in self._graph.roots:
+            verdict = self._verdict(n, flags, flags, state)
+            self._roots[n.id] = verdict
+            if verdict != Never:
+                self._merge(n, flags, flags, state, may_flags, must_flags, may_state)
+
+        for n in sorted(self._graph.nodes, key=self._number):
+            if n.id not in may_flags:
+                # nothing can reach this node, so it can't reach anything either
+                for m in successors.get(n.id, []):
+                    self._verdicts[(n.id, m.id)] = Never
+                self._successors[n.id] = ()
+                continue
+
+            self._reachable.add(n.id)
+
+            clears, add_flags, set_state = self._produces(n)
+            if self.apply_roots or self._roots.get(n.id, Never) == Never:
+                out_may_flags = may_flags[n.id] | add_flags
+                out_must_flags = must_flags[n.id] | add_flags
+                out_state = {} if clears else dict(may_state[n.id])
+                for k, v in set_state.items():
+                    out_state[k] = {v}
+            elif n.id in entered:
+                # applied when arriving from a parent but not when starting here, so
+                # the node's actions may or may not have happened
+                out_may_flags = may_flags[n.id] | add_flags
+                out_must_flags = set(must_flags[n.id])
+                out_state = {k: set(v) for k, v in may_state[n.id].items()}
+                for k, v in set_state.items():
+                    out_state.setdefault(k, set()).add(v)
+            else:
+                out_may_flags = set(may_flags[n.id])
+                out_must_flags = set(must_flags[n.id])
+                out_state = dict(may_state[n.id])
+
+            options = []
+            for m in successors.get(n.id, []):
+                verdict = self._verdict(m, out_may_flags, out_must_flags, out_state)
+                self._verdicts[(n.id, m.id)] = verdict
+                if verdict == Never:
+                    continue
+
+                options.append((m, verdict))
+                entered.add(m.id)
+                self._merge(m, out_may_flags, out_must_flags, out_state, may_flags, must_flags, may_state)
+
+            self._successors[n.id] = tuple(options)
+
+    @staticmethod
+    def _merge(n, flags, must, state, may_flags, must_flags, may_state):
+        """Merge what a session could look like arriving at n from one parent with
+        what we know from other parents.
+        """
+        if n.id not in may_flags:
+            may_flags[n.id] = set(flags)
+            must_flags[n.id] = set(must)
+            may_state[n.id] = {k: set(v) for k, v in state.items()}
+            return
+
+        may_flags[n.id] |= flags
+        must_flags[n.id] &= must
+
+        merged = may_state[n.id]
+        for k, v in state.items():
+            merged.setdefault(k, set()).update(v)
+
+    def verdict(self, parent, node) -> str:
+        """Return if moving from parent to node is Always, Never or Runtime checked.
+        A parent of None means entering node as a root.
+
+        :param parent:
+        :param node:
+        :return: str
+
+        """
+        if parent is None:
+            return self._roots.get(node.id, Never)
+        return self._verdicts.get((parent.id, node.id), Never)
+
+    def successors(self, node) -> tuple:
+        """Return the next nodes of the given node that could ever be moved to,
+        along with the verdict for each.
+
+        :param node:
+        :return: tuple((node, verdict), ..)
+
+        """
+        return self._successors.get(node.id, ())
+
+    @property
+    def dead_nodes(self) -> list:
+        """Nodes that no conversation can ever reach.
+
+        :return: list
+
+        """
+        return [n for n in self._graph.nodes if n.id not in self._reachable]
+
+    @property
+    def never(self) -> list:
+        """Transitions that can never be taken, as (parent id, node id) tuples.
+
+        :return: list
+
+        """
+        return [k for k, v in self._verdicts.items() if v == Never]
+
+    def report(self) -> dict:
+        """Summarise the analysis.
+
+        :return: dict
+
+        """
+        counts = {Always: 0, Never: 0, Runtime: 0}
+        for v in self._verdicts.values():
+            counts[v] += 1
+
+        return {
+            "transitions": counts,
+            "never": [list(k) for k in self.never],
+            "dead_nodes": [n.id for n in self.dead_nodes],
+        }
@@ -0,0 +1,196 @@
+"""Generates synthetic conversation graphs for benchmarking & stress testing.
+
+Graphs are built breadth first from the roots, alternating message & reply nodes,
+so node numbers always increase along an edge (as Graph.next_nodes expects). All
+randomness comes from the given seed, so the same settings always give the same graph.
+"""
+import random
+
+from conversation.domain import actions
+from conversation.domain.models import Graph, Node
+
+
+class GraphGenerator:
+
+    _SPACING = 60  # distance between nodes for the x/y metadata the editor uses
+
+    def __init__(
+            self,
+            nodes: int=1000,
+            roots: int=1,
+            depth: int=0,
+            message_branching: int=3,
+            reply_branching: int=1,
+            join: float=0.0,
+            user_required: float=1.0,
+            flag_density: float=0.1,
+            state_density: float=0.1,
+            flags: int=10,
+            state_keys: int=5,
+            state_values: int=3,
+            action_density: float=0.3,
+            action_mix: dict=None,
+            seed: int=0,
+    ):
+        """
+
+        :param nodes: (max) number of nodes to generate
+        :param roots: number of root (message) nodes
+        :param depth: max depth of the graph, 0 for no limit
+        :param message_branching: max replies offered after each message
+        :param reply_branching: max messages that may follow each reply
+        :param join: chance a node is also linked to a second parent, making paths merge
+        :param user_required: chance a node requires a logged in user
+        :param flag_density: chance a node requires a flag
+        :param state_density: chance a node requires some state
+        :param flags: number of distinct flags
+        :param state_keys: number of distinct state keys
+        :param state_values: number of distinct values per state key
+        :param action_density: chance a node has an action
+        :param action_mix: Action -> relative weight of that action being chosen
+        :param seed:
+
+        """
+        self.nodes = nodes
+        self.roots = roots
+        self.depth = depth
+        self.message_branching = message_branching
+        self.reply_branching = reply_branching
+        self.join = join
+        self.user_required = user_required
+        self.flag_density = flag_density
+        self.state_density = state_density
+        self.flags = flags
+        self.state_keys = state_keys
+        self.state_values = state_values
+        self.action_density = action_density
+        self.action_mix = action_mix or {
+            actions.SetState: 5,
+            actions.AddFlag: 4,
+            actions.ClearState: 1,
+        }
+        self.seed = seed
+
+    def _node(self, rng, number, type_, level, index, flags, state) -> tuple:
+        """Build a node, returning it along with the flags & state a session
+        reaching it along this path would have.
+
+        Conditions are mostly drawn from what the path to the node sets, so that
+        generated graphs are largely traversable.
+        """
+        n = Node(x=level * self._SPACING, y=index * self._SPACING, size=20)
+        n.id = "%032x" % rng.getrandbits(128)
+        n.number = number
+        n.type = type_
+        n.text = "%s %d" % (type_.value, number)
+        n.conditions.user_required = rng.random() < self.user_required
+
+        if self.flags and rng.random() < self.flag_density:
+            if flags and rng.random() < 0.9:
+                n.conditions.flag_required = rng.choice(sorted(flags))
+            else:
+                n.conditions.flag_required = "flag%d" % rng.randrange(self.flags)
+
+        if self.state_keys and rng.random() < self.state_density:
+            if state and rng.random() < 0.9:
+                k = rng.choice(sorted(state))
+                n.conditions.state_required = {k: state[k]}
+            else:
+                k = "key%d" % rng.randrange(self.state_keys)
+                n.conditions.state_required = {k: "value%d" % rng.randrange(max(1, self.state_values))}
+
+        if rng.random() < self.action_density:
+            mix = list(self.action_mix)
+            action = rng.choices(mix, weights=[self.action_mix[a] for a in mix])[0]
+
+            if action == actions.ClearState:
+                n.add_action(action, True)
+                state = {}
+            elif action == actions.AddFlag and self.flags:
+                flag = "flag%d" % rng.randrange(self.flags)
+                n.add_action(action, flag)
+                flags = flags | {flag}
+            elif action == actions.SetState and self.state_keys:
+                k = "key%d" % rng.randrange(self.state_keys)
+                v = "value%d" % rng.randrange(max(1, self.state_values))
+                n.add_action(action, "%s=%s" % (k, v))
+                state = dict(state)
+                state[k] = v
+
+        return n, flags, state
+
+    def iter_nodes(self, edges: list):
+        """Generate nodes one at a time, appending (id, id) edge tuples to the
+        given list as we go. Only the current level of the graph is held in memory.
+
+        :param edges: list to add edges to
+        :return: generator of Node
+
+        """
+        rng = random.Random(self.seed)
+
+        count = 0
+        level = []  # (node, flags, state) of the last level generated
+        for i in range(min(self.roots, self.nodes)):
+            n, flags, state = self._node(rng, count, Node.Type.Message, 0, i, frozenset(), {})
+            n.root_node = True
+            count += 1
+            level.append((n, flags, state))
+            yield n
+
+        depth = 1
+        while level and count < self.nodes and (not self.depth or depth < self.depth):
+            nxt = []
+            for parent, flags, state in level:
+                if parent.type == Node.Type.Message:
+                    type_, branching = Node.Type.Reply, self.message_branching
+                else:
+                    type_, branching = Node.Type.Message, self.reply_branching
+
+                for _ in range(rng.randint(1, max(1, branching))):
+                    if count >= self.nodes:
+                        break
+
+                    n, child_flags, child_state = self._node(rng, count, type_, depth, len(nxt), flags, state)
+                    count += 1
+                    edges.append((parent.id, n.id))
+
+                    if self.join and rng.random() < self.join:
+                        other = rng.choice(level)[0]
+                        if other.type == parent.type and other.id != parent.id:
+                            edges.append((other.id, n.id))
+
+                    nxt.append((n, child_flags, child_state))
+                    yield n
+
+            level = nxt
+            depth += 1
+
+    def graph(self) -> Graph:
+        """Generate a graph.
+
+        :return: Graph
+
+        """
+        g = Graph(seed=self.seed)
+
+        edges = []
+        for n in self.iter_nodes(edges):
+            g.add_node(n)
+
+        for a, b in edges:
+            g.add_edge(g.get_node(a), g.get_node(b))
+
+        return g
+
+    def write(self, storage, name: str, location: str) -> str:
+        """Generate a graph straight to storage, without building it in memory.
+
+        :param storage: backend storage supporting write_stream
+        :param name:
+        :param location:
+        :return: str
+
+        """
+        edges = []
+        return storage.write_stream(name, location, self.iter_nodes(edges), edges, {"seed": self.seed})
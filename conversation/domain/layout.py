@@ -0,0 +1,207 @@
+"""Layered (Sugiyama style) automatic layout of conversation graphs.
+
+Edges run from the lower to the higher node number (as Graph.next_nodes expects),
+which gives an acyclic graph to layer. Each node is put one layer past the deepest
+of its parents, bumped a layer where needed so that messages always sit on even
+layers & replies on odd ones. Nodes within a layer start in number order & are
+then reordered by a few barycenter sweeps to cut down edge crossings.
+
+Long edges are not split into dummy nodes; they simply pull on the barycenter of
+the nodes at both ends, which keeps this cheap enough for graphs of tens of
+thousands of nodes.
+
+The layout works on plain tuples so it can be run on a snapshot, off the UI thread.
+"""
+from conversation.domain.models import Node
+
+
+class LayeredLayout:
+
+    def __init__(self, nodes, edges, spacing: int=60, layer_spacing: int=120, sweeps: int=4):
+        """
+
+        :param nodes: iterable of (id, number, is reply, x, y)
+        :param edges: iterable of (id, id), in either direction
+        :param spacing: distance between nodes in the same layer
+        :param layer_spacing: distance between layers
+        :param sweeps: number of down / up reordering passes
+
+        """
+        self.spacing = spacing
+        self.layer_spacing = layer_spacing
+        self.sweeps = sweeps
+
+        self._ids = []
+        self._order = {}  # id -> (number, index) -- a strict order, edges go from low to high
+        self._reply = {}
+        self._pos = {}
+
+        for i, (id_, number, reply, x, y) in enumerate(nodes):
+            self._ids.append(id_)
+            self._order[id_] = (number or 0, i)
+            self._reply[id_] = bool(reply)
+            self._pos[id_] = (x, y)
+
+        self._succ = {i: [] for i in self._ids}
+        self._pred = {i: [] for i in self._ids}
+        for a, b in edges:
+            if a == b or a not in self._order or b not in self._order:
+                continue
+            if self._order[a] > self._order[b]:
+                a, b = b, a
+            self._succ[a].append(b)
+            self._pred[b].append(a)
+
+    @classmethod
+    def from_graph(cls, g, **kwargs):
+        """Build a layout of a domain graph
+
+        :param g: Graph
+        :return: LayeredLayout
+
+        """
+        return cls(
+            [
+                (n.id, n.number, n.type == Node.Type.Reply, n.metadata.get("x", 0), n.metadata.get("y", 0))
+                for n in g.nodes
+            ],
+            [(a.id, b.id) for a, b in g.edges],
+            **kwargs
+        )
+
+    def descendants(self, root) -> set:
+        """Return the ids of the given node & everything reachable from it
+
+        :param root: node id
+        :return: set
+
+        """
+        seen = {root}
+        todo = [root]
+        while todo:
+            for nxt in self._succ[todo.pop()]:
+                if nxt not in seen:
+                    seen.add(nxt)
+                    todo.append(nxt)
+        return seen
+
+    def _layers(self, members) -> list:
+        """Assign each node a layer.
+
+        :param members: ids to lay out
+        :return: list of lists of ids, each in number order
+
+        """
+        layer = {}
+        for id_ in sorted(members, key=self._order.__getitem__):
+            depth = -1
+            for parent in self._pred[id_]:
+                if parent in layer and layer[parent] > depth:
+                    depth = layer[parent]
+            depth += 1
+
+            if depth % 2 != self._reply[id_]:
+                depth += 1  # keep messages on even layers & replies on odd ones
+            layer[id_] = depth
+
+        layers = [[] for _ in range(max(layer.values()) + 1)] if layer else []
+        for id_ in sorted(members, key=self._order.__getitem__):
+            layers[layer[id_]].append(id_)
+        return layers
+
+    @staticmethod
+    def _sweep(layers, neighbours, index):
+        """Reorder each layer by the mean position of each node's neighbours in
+        already ordered layers. Nodes without any such neighbour keep their place.
+
+        :param layers: layers, in the order they should be visited
+        :param neighbours: id -> [id]
+        :param index: id -> position in its layer, updated in place
+
+        """
+        for nodes in layers:
+            keys = {}
+            for id_ in nodes:
+                total = 0
+                count = 0
+                for other in neighbours[id_]:
+                    pos = index.get(other)
+                    if pos is not None:
+                        total += pos
+                        count += 1
+                keys[id_] = total / count if count else index[id_]
+
+            nodes.sort(key=keys.__getitem__)
+            for i, id_ in enumerate(nodes):
+                index[id_] = i
+
+    def _coordinates(self, layers, x0, y0) -> dict:
+        """Place nodes; each as near the mean y of its parents as it can be without
+        overlapping the node before it.
+
+        :return: dict id -> (x, y)
+
+        """
+        positions = {}
+        for depth, nodes in enumerate(layers):
+            x = x0 + depth * self.layer_spacing
+            last = None
+            for id_ in nodes:
+                ys = [positions[p][1] for p in self._pred[id_] if p in positions]
+                y = sum(ys) / len(ys) if ys else y0
+                if last is not None and y < last + self.spacing:
+                    y = last + self.spacing
+                positions[id_] = (x, y)
+                last = y
+        return positions
+
+    def run(self, subtree=None):
+        """Lay out the graph (or the part of it reachable from the given node),
+        yielding a complete set of positions after each pass so that callers can
+        show progress.
+
+        When laying out a subtree the given node stays where it is & the rest of the
+        graph is untouched.
+
+        :param subtree: node id
+        :return: generator of dict id -> (x, y)
+
+        """
+        if subtree is None:
+            members = self._ids
+            x0, y0 = 0, 0
+        else:
+            members = self.descendants(subtree)
+            x0, y0 = self._pos[subtree]
+
+        layers = self._layers(members)
+        if not layers:
+            return
+
+        if subtree is not None and self._reply[subtree]:
+            # the subtree root went on to layer one, keep it where it is
+            x0 -= self.layer_spacing
+
+        index = {}
+        for nodes in layers:
+            for i, id_ in enumerate(nodes):
+                index[id_] = i
+
+        yield self._coordinates(layers, x0, y0)
+
+        for _ in range(self.sweeps):
+            self._sweep(layers[1:], self._pred, index)
+            self._sweep(layers[-2::-1], self._succ, index)
+            yield self._coordinates(layers, x0, y0)
+
+    def positions(self, subtree=None) -> dict:
+        """Run the layout to completion.
+
+        :param subtree: node id
+        :return: dict id -> (x, y)
+
+        """
+        result = {}
+        for result in self.run(subtree=subtree):
+            pass
+        return result
@@ -24,20 +24,50 @@ class _Encodable(metaclass=abc.ABCMeta):
 
 class Graph(_Encodable):
 
+    # how many nodes are encoded / decoded between calls to a progress func
+    _PROGRESS_EVERY = 500
+
     def __init__(self, **kwargs):
         self._nodes = {}
         self._edges = {}
         self.metadata = kwargs
 
-    def encode(self) -> dict:
+    def encode(self, progress=None) -> dict:
+        """
+
+        :param progress: func(nodes done, nodes total), called every so often
+        :return: dict
+
+        """
+        if progress is None:
+            nodes = [n.encode() for n in self._nodes.values()]
+        else:
+            total = len(self._nodes)
+            nodes = []
+            for n in self._nodes.values():
+                nodes.append(n.encode())
+                if len(nodes) % self._PROGRESS_EVERY == 0:
+                    progress(len(nodes), total)
+            progress(total, total)
+
         return {
-            "nodes": [
-                n.encode() for n in self._nodes.values()
-            ],
+            "nodes": nodes,
             "edges": list(self._edges.values()),
             "metadata": copy.copy(self.metadata),
         }
 
+    def copy(self):
+        """Return a copy of this graph that shares nothing mutable with it, so that it
+        can be encoded elsewhere (eg. on another thread) while this one is edited.
+
+        :return: Graph
+
+        """
+        me = Graph(**self.metadata)
+        me._nodes = {k: n.copy() for k, n in self._nodes.items()}
+        me._edges = {k: list(v) for k, v in self._edges.items()}
+        return me
+
     def get_node(self, id_):
         return self._nodes.get(id_)
 
@@ -59,13 +89,27 @@ class Graph(_Encodable):
                 yield edge_node
 
     @classmethod
-    def decode(cls, data: dict):
+    def decode(cls, data: dict, progress=None):
+        """
+
+        :param data:
+        :param progress: func(nodes done, nodes total), called every so often
+        :return: Graph
+
+        """
         me = cls(**data.get("metadata", {}))
 
-        for node_value in data.get("nodes", []):
+        nodes = data.get("nodes", [])
+        for i, node_value in enumerate(nodes):
             node = Node.decode(node_value)
             me.add_node(node)
 
+            if progress is not None and (i + 1) % cls._PROGRESS_EVERY == 0:
+                progress(i + 1, len(nodes))
+
+        if progress is not None:
+            progress(len(nodes), len(nodes))
+
         for ea, eb in data.get("edges", []):
             na = me._nodes.get(ea)
             nb = me._nodes.get(eb)
@@ -134,6 +178,13 @@ class _Conditions(_Encodable):
     def flag_required(self, value):
         self._flag = value
 
+    def copy(self):
+        cnd = _Conditions()
+        cnd._user = self._user
+        cnd._flag = self._flag
+        cnd._state = copy.copy(self._state)
+        return cnd
+
     def encode(self) -> dict:
         return {
             "user": self._user,
@@ -167,6 +218,18 @@ class Node(_Encodable):
     def is_root(self):
         return self.root_node
 
+    def copy(self):
+        """Return a copy of this node (with the same id)
+
+        :return: Node
+
+        """
+        me = copy.copy(self)
+        me.metadata = copy.copy(self.metadata)
+        me.conditions = self.conditions.copy()
+        me._actions = list(self._actions)
+        return me
+
     def encode(self) -> dict:
         return {
             "id": self.id,
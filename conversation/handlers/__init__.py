@@ -1,9 +1,18 @@
 from conversation.handlers.base import ConversationHandler, InMemoryHandler
 from conversation.handlers.encoders import to_facebook_message
+from conversation.handlers.encoders import FacebookMessageEncoder, FacebookMessageBatch
+from conversation.handlers.selection import UniformSelector, WeightedSelector, PrioritySelector
+from conversation.handlers.metrics import Metrics
 
 
 __all__ = [
     "ConversationHandler",
     "InMemoryHandler",
     "to_facebook_message",
+    "FacebookMessageEncoder",
+    "FacebookMessageBatch",
+    "UniformSelector",
+    "WeightedSelector",
+    "PrioritySelector",
+    "Metrics",
 ]
@@ -3,11 +3,24 @@ import copy
 import random
 
 from conversation.handlers import encoders
-from conversation.domain import models, actions
+from conversation.handlers import selection
+from conversation.domain import models, actions, analysis
 
 
 class ConversationHandler(metaclass=abc.ABCMeta):
 
+    # decides between eligible nodes, shared by all handlers unless set otherwise
+    selector = selection.UniformSelector()
+
+    # source of randomness for the selector, set a seeded random.Random per session
+    # for reproducible conversations
+    rng = random
+
+    # optional static analysis of the graph (conversation.domain.analysis.Reachability), if
+    # set transitions that can never be taken are skipped & conditions it has proven are
+    # met aren't rechecked
+    analysis = None
+
     @property
     @abc.abstractmethod
     def conversation_graph(self):
@@ -82,19 +95,68 @@ class ConversationHandler(metaclass=abc.ABCMeta):
         :param node:
 
         """
-        for action, value in node.actions:
+        self._apply_actions(node.actions)
+
+    def _apply_actions(self, node_actions):
+        """Set the state / flags / clear state according to the given (action, value) list.
+
+        :param node_actions:
+
+        """
+        for action, value in node_actions:
             if action == actions.ClearState and value:
                 self.clear_state()  # clear first
                 break
 
-        for action, value in node.actions:
+        for action, value in node_actions:
             if action == actions.SetState:
                 k, v = actions.SetState.parse(value)
                 self.set_state(k, v)
             elif action == actions.AddFlag:
                 self.set_flag(actions.AddFlag.parse(value))
 
+    def _analysis_holds(self) -> bool:
+        """Return if our analysis describes this session, if not every condition is
+        checked as though there were no analysis.
+
+        :return: bool
+
+        """
+        return self.analysis is not None
+
+    def _passes(self, node, verdict) -> bool:
+        """Decide if the given node can be moved to, given the analysis verdict for
+        moving to it.
+
+        :param node:
+        :param verdict: analysis.Always, Never or Runtime
+        :return: bool
+
+        """
+        if verdict == analysis.Never:
+            return False
+        if verdict == analysis.Always:
+            return not node.conditions.user_required or self.authenticated_user()
+        return self._can_move_to(node)
+
+    def _eligible(self, parent):
+        """Return the func used to decide if a successor of parent (or a root, if
+        parent is None) can be moved to.
+
+        :param parent:
+        :return: func(node) -> bool
+
+        """
+        if not self._analysis_holds():
+            return self._can_move_to
+
+        verdict = self.analysis.verdict
+        return lambda n: self._passes(n, verdict(parent, n))
+
     def next_nodes(self):
+        if self._analysis_holds():
+            return self._analysed_next_nodes()
+
         graph = self.conversation_graph
 
         options = []
@@ -104,17 +166,68 @@ class ConversationHandler(metaclass=abc.ABCMeta):
 
         return options
 
+    def _analysed_next_nodes(self):
+        """Return next nodes using our precomputed analysis, only checking
+        conditions that weren't decided when the graph was analysed.
+
+        :return: list
+
+        """
+        return [
+            n for n, verdict in self.analysis.successors(self.current_node) if self._passes(n, verdict)
+        ]
+
+    def choose_next(self):
+        """Choose which of the eligible next nodes to move to using our selector.
+
+        :return: Node or None
+
+        """
+        return self.selector.choose(
+            self.conversation_graph, self.current_node, self._eligible(self.current_node), self.rng
+        )
+
+    def choose_root(self):
+        """Choose which of the eligible root nodes to start at using our selector.
+
+        :return: Node or None
+
+        """
+        return self.selector.choose(self.conversation_graph, None, self._eligible(None), self.rng)
+
 
 class InMemoryHandler(ConversationHandler):
     """Example handler for a conversation
 
     """
 
-    def __init__(self, graph: models.Graph, current: str=None, apply=False):
+    def __init__(
+            self,
+            graph: models.Graph,
+            current: str=None,
+            apply=False,
+            journal=None,
+            selector: selection.Selector=None,
+            seed=None,
+            reachability: analysis.Reachability=None,
+    ):
+        if reachability:
+            self.analysis = reachability
+        if selector:
+            self.selector = selector
+        if seed is not None:
+            self.rng = random.Random(seed)
+
         self._graph = graph
         self._state = {}
         self._flags = {}
         self._current = None
+        self._journal = journal
+
+        # the analysis only describes sessions that start at a root, with the root's
+        # actions applied as it assumes. Anything else (eg. starting part way through
+        # a conversation, or recovering one) has every condition checked.
+        self._analysed = not current and (self.analysis is None or self.analysis.apply_roots == bool(apply))
 
         if current:
             self._current = graph.get_node(current)
@@ -122,13 +235,74 @@ class InMemoryHandler(ConversationHandler):
                 raise ValueError(f"node with id {current} not found in graph")
         else:
             # Nb. we want to apply the node here
-            self._current = random.choice([
-                n for n in graph.roots if self._can_move_to(n)]
-            )
+            self._current = self.choose_root()
+            if not self._current:
+                raise ValueError("no root node in graph can be moved to")
 
         if apply:
             self._apply_node(self._current)
 
+        if journal and not current:
+            self._record(self._current, self._current.actions if apply else [])
+
+    def _analysis_holds(self) -> bool:
+        return self._analysed and self.analysis is not None
+
+    @classmethod
+    def recover(cls, graph: models.Graph, journal):
+        """Rebuild a handler from it's journal: the newest snapshot plus the
+        transitions recorded after it.
+
+        :param graph:
+        :param journal: backend journal the session was recorded to
+        :return: InMemoryHandler
+
+        """
+        snapshot, tail = journal.load()
+        if not snapshot and not tail:
+            return cls(graph, journal=journal)
+
+        current = snapshot["node"] if snapshot else tail[0]["node"]
+        me = cls(graph, current=current, journal=journal)
+
+        if snapshot:
+            me._state = dict(snapshot.get("state", {}))
+            me._flags = {f: True for f in snapshot.get("flags", [])}
+
+        for entry in tail:
+            node = graph.get_node(entry["node"])
+            if not node:
+                raise ValueError(f"node with id {entry['node']} not found in graph")
+
+            me._apply_actions([
+                (actions.get_action_by_name(name), value) for name, value in entry["actions"]
+            ])
+            me._current = node
+
+        return me
+
+    def snapshot(self) -> dict:
+        """Return a compact, json serialisable copy of the session.
+
+        :return: dict
+
+        """
+        return {
+            "node": self._current.id,
+            "state": copy.copy(self._state),
+            "flags": list(self._flags),
+        }
+
+    def _record(self, node, node_actions):
+        """Write the transition to our journal, snapshotting if it's due.
+
+        :param node:
+        :param node_actions:
+
+        """
+        if self._journal.record(node.id, [[a.Name, v] for (a, v) in node_actions]):
+            self._journal.snapshot(self.snapshot())
+
     @property
     def conversation_graph(self):
         return self._graph
@@ -142,6 +316,9 @@ class InMemoryHandler(ConversationHandler):
         self._apply_node(node)
         self._current = node
 
+        if self._journal:
+            self._record(node, node.actions)
+
     def state(self) -> dict:
         return copy.copy(self._state)
 
@@ -1,3 +1,5 @@
+from json.encoder import encode_basestring_ascii as _escape
+
 from conversation.domain import models
 
 
@@ -39,3 +41,152 @@ def _fb_button(title: str, payload: str) -> dict:
         'title': title,
         'payload': payload,
     }
+
+
+class FacebookMessageEncoder:
+    """Writes the JSON bytes of a facebook message directly, without building
+    the intermediate dict of `to_facebook_message`.
+
+    The output is byte for byte what `json.dumps(to_facebook_message(..))` would
+    give. Per node fragments (escaped button payloads & any text with no format
+    fields) are cached by node id, so only text that depends on the conversation
+    state is escaped per message.
+
+    An encoder is intended to be shared by all sessions running over the same graph.
+    """
+
+    _MSG_HEAD = b'{"type": "template", "payload": {"template_type": "button", "text": '
+    _MSG_BUTTONS = b', "buttons": ['
+    _MSG_TAIL = b']}}'
+    _BUTTON_HEAD = b'{"type": "postback", "title": '
+    _BUTTON_PAYLOAD = b', "payload": '
+    _SEP = b', '
+
+    def __init__(self):
+        # node id -> (text, escaped text or None, escaped payload)
+        self._fragments = {}
+
+    def clear(self):
+        """Drop all cached fragments.
+        """
+        self._fragments = {}
+
+    def _fragment(self, node) -> tuple:
+        """Return cached fragments for the given node, (re)building them if the
+        node text has changed since they were made.
+
+        :param node:
+        :return: tuple
+
+        """
+        frag = self._fragments.get(node.id)
+        if frag is not None and frag[0] == node.text:
+            return frag
+
+        text = node.text
+        static = None
+        if "{" not in text and "}" not in text:
+            # no format fields: the rendered text is always the text itself
+            static = _escape(text).encode("ascii")
+
+        frag = (text, static, _escape(node.id).encode("ascii"))
+        self._fragments[node.id] = frag
+        return frag
+
+    def _text(self, state: dict, node) -> bytes:
+        """Return the escaped, rendered text of the given node
+
+        :param state:
+        :param node:
+        :return: bytes
+
+        """
+        _, static, _ = self._fragment(node)
+        if static is not None:
+            return static
+        return _escape(node.text.format(**state)).encode("ascii")
+
+    def encode_into(self, buf: bytearray, state: dict, node: models.Node, replies: list):
+        """Append the JSON encoded message to the given buffer.
+
+        :param buf:
+        :param state: conversation state information
+        :param node:
+        :param replies:
+
+        """
+        buf += self._MSG_HEAD
+        buf += self._text(state, node)
+        buf += self._MSG_BUTTONS
+
+        first = True
+        for n in replies:
+            if not first:
+                buf += self._SEP
+            first = False
+
+            buf += self._BUTTON_HEAD
+            buf += self._text(state, n)
+            buf += self._BUTTON_PAYLOAD
+            buf += self._fragment(n)[2]
+            buf += b'}'
+
+        buf += self._MSG_TAIL
+
+    def encode(self, state: dict, node: models.Node, replies: list) -> bytes:
+        """Transforms a node (message) and it's replies to the JSON bytes of a
+        facebook message + buttons.
+
+        :param state: conversation state information
+        :param node:
+        :param replies:
+        :return: bytes
+
+        """
+        buf = bytearray()
+        self.encode_into(buf, state, node, replies)
+        return bytes(buf)
+
+
+class FacebookMessageBatch:
+    """Collects the messages of many sessions into one buffer, written out as a
+    JSON object of session id -> facebook message.
+    """
+
+    def __init__(self, encoder: FacebookMessageEncoder=None):
+        self._encoder = encoder or FacebookMessageEncoder()
+        self._buf = bytearray(b'{')
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def add(self, session: str, state: dict, node: models.Node, replies: list):
+        """Add the message for the given session to the batch.
+
+        :param session: session id
+        :param state: conversation state information
+        :param node:
+        :param replies:
+
+        """
+        if self._count:
+            self._buf += b', '
+        self._buf += _escape(session).encode("ascii")
+        self._buf += b': '
+        self._encoder.encode_into(self._buf, state, node, replies)
+        self._count += 1
+
+    def getvalue(self) -> bytes:
+        """Return the JSON bytes of all messages added so far.
+
+        :return: bytes
+
+        """
+        return bytes(self._buf) + b'}'
+
+    def reset(self):
+        """Empty the batch, keeping the encoder (and it's cache).
+        """
+        self._buf = bytearray(b'{')
+        self._count = 0
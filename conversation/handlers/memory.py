@@ -0,0 +1,171 @@
+"""Memory accounting for loaded graphs & live conversation sessions.
+
+Sizes are worked out two ways: a deep sizeof that walks the objects & attributes
+the bytes to a component (node objects, metadata, text ..), and tracemalloc which
+measures what was actually allocated while loading / running. Objects shared between
+components (eg. the same string used twice) are only counted once, against the first
+component they're found in.
+"""
+import random
+import sys
+import tracemalloc
+
+from conversation.handlers import simulator
+
+
+def _deep_sizeof(obj, seen: set) -> int:
+    """Return the size of the given object & everything it contains that
+    hasn't already been seen.
+
+    :param obj:
+    :param seen: set of ids of objects already counted
+    :return: int
+
+    """
+    if obj is None or isinstance(obj, (bool, type)) or id(obj) in seen:
+        return 0
+
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += _deep_sizeof(k, seen) + _deep_sizeof(v, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for v in obj:
+            size += _deep_sizeof(v, seen)
+
+    return size
+
+
+def graph_report(graph) -> dict:
+    """Return the bytes used by each component of the given graph.
+
+    :param graph: conversation.domain.models.Graph
+    :return: dict
+
+    """
+    seen = set()
+    report = {
+        "graph": 0,
+        "node_objects": 0,
+        "ids": 0,
+        "metadata": 0,
+        "text": 0,
+        "conditions": 0,
+        "actions": 0,
+        "edge_keys": 0,
+    }
+
+    # the graph object, it's attribute dict, metadata & node container
+    report["graph"] += sys.getsizeof(graph) + sys.getsizeof(graph.__dict__) + sys.getsizeof(graph._nodes)
+    report["graph"] += _deep_sizeof(graph.metadata, seen)
+
+    nodes = list(graph.nodes)
+    for n in nodes:
+        report["ids"] += _deep_sizeof(n.id, seen)
+
+    for n in nodes:
+        # the object, it's attribute dict & simple attributes (number, type ..)
+        report["node_objects"] += sys.getsizeof(n) + sys.getsizeof(n.__dict__)
+        report["node_objects"] += _deep_sizeof(n.number, seen)
+
+        report["metadata"] += _deep_sizeof(n.metadata, seen)
+        report["text"] += _deep_sizeof(n.text, seen)
+
+        cnd = n.conditions
+        report["conditions"] += sys.getsizeof(cnd) + _deep_sizeof(cnd.__dict__, seen)
+
+        report["actions"] += _deep_sizeof(n.actions, seen)
+
+    report["edge_keys"] += _deep_sizeof(graph._edges, seen)
+
+    report["total"] = sum(report.values())
+    report["nodes"] = len(nodes)
+    report["edges"] = len(graph._edges)
+    return report
+
+
+def load_report(storage, name: str, location: str) -> tuple:
+    """Load a graph, measuring what was allocated doing so.
+
+    :param storage: backend Storage
+    :param name:
+    :param location:
+    :return: Graph, dict
+
+    """
+    started = tracemalloc.is_tracing()
+    if not started:
+        tracemalloc.start()
+
+    before = tracemalloc.get_traced_memory()[0]
+    graph = storage.read(name, location)
+    after, peak = tracemalloc.get_traced_memory()
+
+    if not started:
+        tracemalloc.stop()
+
+    report = graph_report(graph)
+    report["tracemalloc"] = after - before
+    report["tracemalloc_peak"] = peak - before
+    return graph, report
+
+
+def session_report(graph, sessions: int, seed: int=0, max_steps: int=50, factory=simulator.in_memory_handler) -> dict:
+    """Create the given number of sessions & walk each through the graph, then
+    report the memory they hold (not including the graph itself).
+
+    :param graph:
+    :param sessions: number of sessions
+    :param seed:
+    :param max_steps: max steps to walk each session
+    :param factory: func(graph, seed) -> ConversationHandler
+    :return: dict
+
+    """
+    # the graph & it's nodes are shared by all sessions, so aren't counted
+    seen = {id(graph)}
+    for n in graph.nodes:
+        seen.add(id(n))
+
+    rng = random.Random(seed)
+    result = simulator.SimulationResult()
+
+    started = tracemalloc.is_tracing()
+    if not started:
+        tracemalloc.start()
+
+    before = tracemalloc.get_traced_memory()[0]
+    handlers = []
+    for _ in range(sessions):
+        hnd = factory(graph, rng.random())
+        simulator.walk(hnd, rng, result, max_steps)
+        handlers.append(hnd)
+    after = tracemalloc.get_traced_memory()[0]
+
+    if not started:
+        tracemalloc.stop()
+
+    report = {
+        "handler_objects": 0,
+        "state": 0,
+        "flags": 0,
+        "other": 0,
+    }
+    for hnd in handlers:
+        report["handler_objects"] += sys.getsizeof(hnd) + sys.getsizeof(hnd.__dict__)
+
+        for k, v in hnd.__dict__.items():
+            if k == "_state":
+                report["state"] += _deep_sizeof(v, seen)
+            elif k == "_flags":
+                report["flags"] += _deep_sizeof(v, seen)
+            else:
+                report["other"] += _deep_sizeof(v, seen)
+
+    report["total"] = report["handler_objects"] + report["state"] + report["flags"] + report["other"]
+    report["sessions"] = sessions
+    report["per_session"] = report["total"] / sessions if sessions else 0
+    report["tracemalloc"] = after - before
+    return report
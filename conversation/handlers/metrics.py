@@ -0,0 +1,223 @@
+"""Counters & timers for ConversationHandlers.
+
+Metrics are collected by a subclass of your handler built with Metrics.instrument,
+handlers that aren't instrumented run exactly the same code as before, so there is no
+cost at all when metrics are disabled.
+
+Each thread accumulates into it's own shard, so instrumented handlers don't contend
+with each other under load. Shards are only merged when a snapshot is taken, or
+once their thread has exited (so threads coming & going don't pile up shards).
+"""
+import threading
+import time
+
+
+Steps = "steps"
+StepSeconds = "step_seconds"
+NextNodes = "next_nodes"
+NextNodesSeconds = "next_nodes_seconds"
+Candidates = "candidates_evaluated"
+ConditionFailures = "condition_failures"
+ActionsApplied = "actions_applied"
+
+_COUNTERS = [Steps, NextNodes, Candidates, ActionsApplied]
+_TIMERS = [StepSeconds, NextNodesSeconds]
+_FAILURES = ["user", "flag", "state"]
+
+
+class _Shard:
+    """Metrics accumulated by a single thread.
+    """
+
+    __slots__ = ["counters", "failures", "timers"]
+
+    def __init__(self):
+        self.counters = {k: 0 for k in _COUNTERS}
+        self.failures = {k: 0 for k in _FAILURES}
+        self.timers = {k: [0, 0.0, 0.0] for k in _TIMERS}  # count, sum, max
+
+    def time(self, name, seconds):
+        t = self.timers[name]
+        t[0] += 1
+        t[1] += seconds
+        if seconds > t[2]:
+            t[2] = seconds
+
+    def add(self, other):
+        """Add the metrics of another shard to ours.
+
+        :param other: _Shard
+
+        """
+        for k, v in other.counters.items():
+            self.counters[k] += v
+        for k, v in other.failures.items():
+            self.failures[k] += v
+        for k, (count, total, longest) in other.timers.items():
+            t = self.timers[k]
+            t[0] += count
+            t[1] += total
+            t[2] = max(t[2], longest)
+
+
+class Metrics:
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []  # (thread, shard) of threads that were alive when last checked
+        self._totals = _Shard()  # metrics of threads that have exited
+        self._classes = {}
+
+    def _shard(self) -> _Shard:
+        """Return the shard for the calling thread.
+
+        :return: _Shard
+
+        """
+        try:
+            return self._local.shard
+        except AttributeError:
+            pass
+
+        shard = _Shard()
+        with self._lock:
+            self._fold()
+            self._shards.append((threading.current_thread(), shard))
+            self._local.shard = shard
+        return shard
+
+    def _fold(self):
+        """Fold the shards of threads that have exited into the totals, must hold
+        the lock.
+        """
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                self._totals.add(shard)  # nothing writes to it anymore
+        self._shards = live
+
+    def reset(self):
+        """Zero all metrics.
+        """
+        # shards in use are dropped rather than zeroed under the threads writing to
+        # them, each thread starts a new shard the next time it records something
+        with self._lock:
+            self._local = threading.local()
+            self._shards = []
+            self._totals = _Shard()
+
+    def snapshot(self) -> dict:
+        """Merge the metrics of all threads.
+
+        :return: dict
+
+        """
+        merged = _Shard()
+        with self._lock:
+            self._fold()
+            merged.add(self._totals)
+            shards = [shard for _, shard in self._shards]
+
+        for shard in shards:
+            merged.add(shard)
+
+        data = dict(merged.counters)
+        data[ConditionFailures] = merged.failures
+        for k, (count, total, longest) in merged.timers.items():
+            data[k] = {"count": count, "sum": total, "max": longest}
+        return data
+
+    def to_prometheus(self, prefix: str="conversation_") -> str:
+        """Return a snapshot of our metrics in the Prometheus text format.
+
+        :param prefix: prefix for metric names
+        :return: str
+
+        """
+        data = self.snapshot()
+        lines = []
+
+        for k in _COUNTERS:
+            lines.append(f"# TYPE {prefix}{k}_total counter")
+            lines.append(f"{prefix}{k}_total {data[k]}")
+
+        lines.append(f"# TYPE {prefix}{ConditionFailures}_total counter")
+        for k, v in data[ConditionFailures].items():
+            lines.append(f'{prefix}{ConditionFailures}_total{{type="{k}"}} {v}')
+
+        for k in _TIMERS:
+            lines.append(f"# TYPE {prefix}{k} summary")
+            lines.append(f"{prefix}{k}_count {data[k]['count']}")
+            lines.append(f"{prefix}{k}_sum {data[k]['sum']}")
+
+        return "\n".join(lines) + "\n"
+
+    def instrument(self, cls):
+        """Return a subclass of the given ConversationHandler class that records
+        metrics here.
+
+        :param cls: ConversationHandler subclass
+        :return: class
+
+        """
+        sub = self._classes.get(cls)
+        if sub is not None:
+            return sub
+
+        metrics = self
+        perf_counter = time.perf_counter
+        current_node = cls.current_node
+
+        class _Instrumented(cls):
+
+            @property
+            def current_node(self):
+                return current_node.fget(self)
+
+            @current_node.setter
+            def current_node(self, node):
+                start = perf_counter()
+                current_node.fset(self, node)
+                shard = metrics._shard()
+                shard.counters[Steps] += 1
+                shard.time(StepSeconds, perf_counter() - start)
+
+            def next_nodes(self):
+                start = perf_counter()
+                options = super(_Instrumented, self).next_nodes()
+                shard = metrics._shard()
+                shard.counters[NextNodes] += 1
+                shard.time(NextNodesSeconds, perf_counter() - start)
+                return options
+
+            def _can_move_to(self, node) -> bool:
+                ok = super(_Instrumented, self)._can_move_to(node)
+                shard = metrics._shard()
+                shard.counters[Candidates] += 1
+                if not ok:
+                    shard.failures[self._failed_condition(node)] += 1
+                return ok
+
+            def _failed_condition(self, node) -> str:
+                """Work out which condition stopped us moving to the given node.
+                """
+                if node.conditions.user_required and not self.authenticated_user():
+                    return "user"
+
+                flag = node.conditions.flag_required
+                if flag and not self.has_flag(flag):
+                    return "flag"
+                return "state"
+
+            def _apply_actions(self, node_actions):
+                super(_Instrumented, self)._apply_actions(node_actions)
+                metrics._shard().counters[ActionsApplied] += len(node_actions)
+
+        _Instrumented.__name__ = "Instrumented" + cls.__name__
+        _Instrumented.__qualname__ = _Instrumented.__name__
+
+        self._classes[cls] = _Instrumented
+        return _Instrumented
@@ -0,0 +1,222 @@
+"""Selectors decide which of the eligible nodes a conversation moves to when
+there is more than one option (ie. which root to start at, or which message the
+bot replies with).
+
+Each selector precomputes a table per node of it's successors (built from the graph
+the first time that node is seen) so that choosing doesn't build lists of candidates
+per step. Candidates are drawn from the table & rejected if the handler says they're
+not eligible, falling back to filtering the table only if draws keep failing. As the
+tables depend only on the graph, a single selector can be shared by every session
+running over it.
+"""
+import abc
+import math
+import weakref
+
+
+class Selector(metaclass=abc.ABCMeta):
+
+    # how many rejected draws we make before filtering the candidates instead
+    _MAX_DRAWS = 8
+
+    def __init__(self):
+        self._tables = weakref.WeakKeyDictionary()
+
+    def reset(self):
+        """Drop all precomputed tables, required if a graph is altered after
+        selections have been made from it.
+        """
+        self._tables = weakref.WeakKeyDictionary()
+
+    def _table(self, graph, node):
+        """Return the table for the successors of the given node, or for the graph
+        roots if node is None.
+
+        :param graph:
+        :param node:
+        :return: table
+
+        """
+        tables = self._tables.get(graph)
+        if tables is None:
+            tables = {}
+            self._tables[graph] = tables
+
+        key = node.id if node is not None else None
+        table = tables.get(key)
+        if table is None:
+            candidates = graph.roots if node is None else graph.next_nodes(node)
+            table = self._build(tuple(candidates))
+            tables[key] = table
+
+        return table
+
+    @staticmethod
+    def _number(node, key, default) -> float:
+        """Return a number set in a node's metadata, or the default if it's missing
+        or isn't a number (metadata is free form, so may hold eg. "2" or "high").
+
+        :param node:
+        :param key: str
+        :param default: float
+        :return: float
+
+        """
+        try:
+            value = float(node.metadata.get(key, default))
+        except (TypeError, ValueError):
+            return default
+        return default if math.isnan(value) else value
+
+    def choose(self, graph, node, eligible, rng):
+        """Choose one of the eligible successors of the given node.
+
+        :param graph: graph the node belongs to
+        :param node: node to choose a successor for, or None to choose a root
+        :param eligible: func(node) -> bool
+        :param rng: random.Random (or the random module)
+        :return: Node or None
+
+        """
+        return self._choose(self._table(graph, node), eligible, rng)
+
+    @abc.abstractmethod
+    def _build(self, candidates: tuple):
+        pass
+
+    @abc.abstractmethod
+    def _choose(self, table, eligible, rng):
+        pass
+
+    @classmethod
+    def _uniform(cls, candidates: tuple, eligible, rng):
+        """Choose uniformly among the eligible members of candidates.
+
+        :param candidates:
+        :param eligible:
+        :param rng:
+        :return: Node or None
+
+        """
+        count = len(candidates)
+        if count == 0:
+            return None
+
+        for _ in range(cls._MAX_DRAWS):
+            n = candidates[int(rng.random() * count)]
+            if eligible(n):
+                return n
+
+        options = [n for n in candidates if eligible(n)]
+        if not options:
+            return None
+        return options[int(rng.random() * len(options))]
+
+
+class UniformSelector(Selector):
+    """Every eligible node is equally likely.
+    """
+
+    def _build(self, candidates: tuple):
+        return candidates
+
+    def _choose(self, table, eligible, rng):
+        return self._uniform(table, eligible, rng)
+
+
+class WeightedSelector(Selector):
+    """Eligible nodes are chosen in proportion to the weight set in their
+    metadata. Nodes with no (or an invalid) weight count as 1, nodes with weight <= 0 are never chosen.
+
+    Draws use a precomputed alias table, so are O(1) regardless of the number of
+    successors.
+    """
+
+    def __init__(self, key: str="weight"):
+        super(WeightedSelector, self).__init__()
+        self._key = key
+
+    def _build(self, candidates: tuple):
+        nodes = []
+        weights = []
+        for n in candidates:
+            w = self._number(n, self._key, 1.0)
+            if w > 0:
+                nodes.append(n)
+                weights.append(w)
+
+        count = len(nodes)
+        if count == 0:
+            return (), (), (), ()
+
+        # Vose's alias method
+        total = sum(weights)
+        scaled = [w * count / total for w in weights]
+        prob = [1.0] * count
+        alias = list(range(count))
+
+        small = [i for i, w in enumerate(scaled) if w < 1.0]
+        large = [i for i, w in enumerate(scaled) if w >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+
+            prob[s] = scaled[s]
+            alias[s] = l
+
+            scaled[l] = scaled[l] + scaled[s] - 1.0
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+
+        return tuple(nodes), tuple(weights), tuple(prob), tuple(alias)
+
+    def _choose(self, table, eligible, rng):
+        nodes, weights, prob, alias = table
+        count = len(nodes)
+        if count == 0:
+            return None
+
+        for _ in range(self._MAX_DRAWS):
+            i = int(rng.random() * count)
+            if rng.random() >= prob[i]:
+                i = alias[i]
+
+            if eligible(nodes[i]):
+                return nodes[i]
+
+        options = []
+        option_weights = []
+        for n, w in zip(nodes, weights):
+            if eligible(n):
+                options.append(n)
+                option_weights.append(w)
+
+        if not options:
+            return None
+        return rng.choices(options, weights=option_weights)[0]
+
+
+class PrioritySelector(Selector):
+    """The eligible node with the highest priority set in it's metadata is chosen,
+    ties are broken uniformly. Nodes with no (or an invalid) priority count as 0.
+    """
+
+    def __init__(self, key: str="priority"):
+        super(PrioritySelector, self).__init__()
+        self._key = key
+
+    def _build(self, candidates: tuple):
+        groups = {}
+        for n in candidates:
+            groups.setdefault(self._number(n, self._key, 0.0), []).append(n)
+
+        return tuple(tuple(groups[p]) for p in sorted(groups, reverse=True))
+
+    def _choose(self, table, eligible, rng):
+        for group in table:
+            n = self._uniform(group, eligible, rng)
+            if n is not None:
+                return n
+        return None
@@ -0,0 +1,200 @@
+"""Monte-Carlo simulation of conversations over a graph.
+
+Runs many randomised walks through a graph using a real ConversationHandler, the
+user picks uniformly from the replies offered & the bot picks using the handler's
+selector, exactly as a live conversation would step. Useful for load testing a
+graph or comparing handler / graph implementations on the same workload.
+"""
+import collections
+import concurrent.futures
+import random
+import time
+
+from conversation.handlers.base import InMemoryHandler
+
+
+def in_memory_handler(graph, seed):
+    """Default handler factory
+
+    :param graph:
+    :param seed:
+    :return: InMemoryHandler
+
+    """
+    return InMemoryHandler(graph, apply=True, seed=seed)
+
+
+class SimulationResult:
+
+    def __init__(self):
+        self.walks = 0
+        self.steps = 0
+        self.elapsed = 0.0
+        self.truncated = 0  # walks that hit max steps
+        self.visits = collections.Counter()  # node id -> times visited
+        self.lengths = collections.Counter()  # walk length (in steps) -> number of walks
+        self.dead_ends = collections.Counter()  # reply node id -> walks that ended there
+
+    @property
+    def steps_per_second(self) -> float:
+        if not self.elapsed:
+            return 0.0
+        return self.steps / self.elapsed
+
+    def merge(self, other):
+        """Add the results of another simulation to this one.
+
+        :param other: SimulationResult
+
+        """
+        self.walks += other.walks
+        self.steps += other.steps
+        self.elapsed = max(self.elapsed, other.elapsed)
+        self.truncated += other.truncated
+        self.visits.update(other.visits)
+        self.lengths.update(other.lengths)
+        self.dead_ends.update(other.dead_ends)
+
+    def report(self, top: int=10) -> dict:
+        """Summarise the simulation.
+
+        :param top: number of most visited nodes / dead ends to include
+        :return: dict
+
+        """
+        total = sum(self.lengths.values())
+        mean = 0.0
+        if total:
+            mean = sum(k * v for k, v in self.lengths.items()) / total
+
+        return {
+            "walks": self.walks,
+            "steps": self.steps,
+            "elapsed": self.elapsed,
+            "steps_per_second": self.steps_per_second,
+            "truncated": self.truncated,
+            "nodes_visited": len(self.visits),
+            "mean_length": mean,
+            "max_length": max(self.lengths) if self.lengths else 0,
+            "lengths": {str(k): v for k, v in sorted(self.lengths.items())},
+            "most_visited": self.visits.most_common(top),
+            "dead_end_walks": sum(self.dead_ends.values()),
+            "dead_ends": self.dead_ends.most_common(top),
+        }
+
+
+def walk(handler, rng, result: SimulationResult, max_steps: int):
+    """Walk a single conversation through the given handler until it ends,
+    recording what happened.
+
+    :param handler: ConversationHandler positioned at the start of a conversation
+    :param rng: random.Random used to pick user replies
+    :param result:
+    :param max_steps:
+
+    """
+    node = handler.current_node
+    result.visits[node.id] += 1
+
+    steps = 0
+    while steps < max_steps:
+        if node.type == node.Type.Reply:
+            nxt = handler.choose_next()
+            if nxt is None:
+                result.dead_ends[node.id] += 1  # the user spoke & we had nothing to say
+                break
+        else:
+            options = handler.next_nodes()
+            if not options:
+                break  # conversation finished on a message
+            nxt = options[int(rng.random() * len(options))]
+
+        handler.current_node = nxt
+        node = nxt
+        result.visits[node.id] += 1
+        steps += 1
+    else:
+        result.truncated += 1
+
+    result.walks += 1
+    result.steps += steps
+    result.lengths[steps] += 1
+
+
+def simulate(graph, walks: int, seed: int=0, max_steps: int=1000, factory=in_memory_handler):
+    """Run the given number of walks over the graph.
+
+    :param graph:
+    :param walks: number of conversations to run
+    :param seed: seed, walks are reproducible for the same seed
+    :param max_steps: walks longer than this are cut short
+    :param factory: func(graph, seed) -> ConversationHandler
+    :return: SimulationResult
+
+    """
+    rng = random.Random(seed)
+    result = SimulationResult()
+
+    start = time.perf_counter()
+    for _ in range(walks):
+        walk(factory(graph, rng.random()), rng, result, max_steps)
+    result.elapsed = time.perf_counter() - start
+
+    return result
+
+
+_worker_graph = None
+_worker_factory = None
+
+
+def _init_worker(graph, factory):
+    global _worker_graph
+    global _worker_factory
+
+    _worker_graph = graph
+    _worker_factory = factory
+
+
+def _run_chunk(walks, seed, max_steps):
+    return simulate(_worker_graph, walks, seed=seed, max_steps=max_steps, factory=_worker_factory)
+
+
+def simulate_parallel(
+        graph,
+        walks: int,
+        processes: int,
+        seed: int=0,
+        max_steps: int=1000,
+        factory=in_memory_handler,
+        chunk: int=10000,
+):
+    """Run the given number of walks over the graph across a pool of processes.
+
+    The graph is sent to each process once, the factory must be importable by
+    the worker processes (ie. a module level function).
+
+    :param graph:
+    :param walks: number of conversations to run
+    :param processes: number of worker processes
+    :param seed:
+    :param max_steps: walks longer than this are cut short
+    :param factory: func(graph, seed) -> ConversationHandler
+    :param chunk: walks per unit of work handed to a process
+    :return: SimulationResult
+
+    """
+    result = SimulationResult()
+
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=processes, initializer=_init_worker, initargs=(graph, factory)
+    ) as pool:
+        futures = []
+        for i, offset in enumerate(range(0, walks, chunk)):
+            futures.append(pool.submit(_run_chunk, min(chunk, walks - offset), seed + i, max_steps))
+
+        for f in concurrent.futures.as_completed(futures):
+            result.merge(f.result())
+    result.elapsed = time.perf_counter() - start
+
+    return result
@@ -0,0 +1,153 @@
+"""Autosave the graph being edited to crash recovery files.
+
+Every so often the nodes & edges changed since the last autosave are taken from the
+model (on the UI thread, which only touches what changed) & queued for a background
+thread to append to the recovery journal, compacting it now & then. Autosaving
+never asks for a repaint or sets the status bar, so it's invisible to the user.
+"""
+import queue
+import threading
+
+from conversation.ui.manifest import QTimer
+from conversation.ui.trace import Tracer, Debug, Warn
+
+
+class Autosave(object):
+
+    _NAME = "autosave"
+
+    def __init__(self, recovery, model, interval=30000):
+        """
+
+        :param recovery: FilesystemRecovery
+        :param model: func that returns the NodeGraph being edited
+        :param interval: ms between autosaves
+
+        """
+        self._recovery = recovery
+        self._model = model
+
+        # recovery file jobs, run in order by our thread
+        self._jobs = queue.Queue()
+        self._thread = None
+
+        self._timer = QTimer()
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self.save)
+
+        # while a save runs, the ids of nodes & edges autosaved since it began -- these
+        # may not be in the saved file, so are autosaved again once it's written
+        self._saving = False
+        self._since_save = (set(), set())
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+
+        self._thread = threading.Thread(target=self.__run, name=self._NAME, daemon=True)
+        self._thread.start()
+        self._timer.start()
+
+    def stop(self, discard=False):
+        """Write anything outstanding & stop.
+
+        :param discard: remove the recovery files rather than writing to them
+
+        """
+        self._timer.stop()
+        if not self.running:
+            return
+
+        if discard:
+            self._jobs.put((self.__clear, None))
+        else:
+            self.save()
+
+        self._jobs.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def save(self):
+        """Queue the changes made since the last autosave, if any, to be written
+        """
+        changes = self._model().take_changes()
+        if not any(changes.values()):
+            return
+
+        if self._saving:
+            self._add_changed(changes, *self._since_save)
+
+        self._jobs.put((self.__append, changes))
+
+    def rebase(self, source=None):
+        """Start recovery over from the given conversation file (eg. one just loaded),
+        or an empty graph, dropping the changes recorded so far.
+
+        :param source: path
+
+        """
+        self._model().take_changes()
+        self._saving = False
+        self._jobs.put((self._recovery.rebase, source))
+
+    def begin_save(self):
+        """Called as the graph starts to be saved
+        """
+        # what's changed so far is in the file, so anything changed after is
+        # what saved needs to keep
+        self.save()
+        self._saving = True
+        self._since_save = (set(), set())
+
+    def saved(self, path):
+        """Called once the graph has been saved to the given file
+
+        :param path:
+
+        """
+        # what changed during the save, autosaved or not, needn't be in the file;
+        # rebase drops it so mark it again
+        ids, edges = self._since_save
+        self._add_changed(self._model().take_changes(), ids, edges)
+        self.rebase(path)
+        self._model().mark_changed(ids, edges)
+
+    def save_failed(self):
+        """Called if a save didn't finish, recovery carries on from where it was
+        """
+        self._saving = False
+        self._since_save = (set(), set())
+
+    @staticmethod
+    def _add_changed(changes, ids, edges):
+        """Add the ids of the nodes & edges in changes (see NodeGraph.take_changes)
+        to the given sets
+        """
+        ids.update(n["id"] for n in changes["nodes"])
+        ids.update(changes["removed"])
+        edges.update(tuple(e) for e in changes["edges"] + changes["unlinked"])
+
+    def __append(self, changes):
+        if self._recovery.append(changes):
+            self._recovery.compact()
+            Tracer.record(self._NAME, Debug, "compacted recovery journal")
+
+    def __clear(self, _):
+        self._recovery.clear()
+
+    def __run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                self._recovery.close()
+                return
+
+            func, arg = job
+            try:
+                func(arg)
+            except Exception as e:
+                Tracer.record(self._NAME, Warn, "autosave failed %s", e)
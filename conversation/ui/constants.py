@@ -14,6 +14,7 @@ COLOUR_DEFAULT = _black
 COLOUR_ANTI_DEFAULT = _white  # the opposite of whatever default is
 COLOUR_SELECTED = _red  # selected node
 COLOUR_BEGIN = _green  # entry node
+COLOUR_HIGHLIGHT = _purple  # search match
 
 
 def enable_dark_theme():
@@ -1,8 +1,9 @@
-
+import functools
 import inspect
 
 
 from conversation.ui.manifest import Signal, QObject
+from conversation.ui.trace import Tracer, Debug
 
 
 class _EventManager(QObject):
@@ -19,6 +20,9 @@ class _EventManager(QObject):
     # a node on the graph is selected
     NodeSelected = Signal(object)
 
+    # the set of selected nodes changed, emitted with a list of nodes (after NodeSelected)
+    SelectionChanged = Signal(object)
+
     # save shortcut
     Save = Signal()
 
@@ -29,36 +33,83 @@ class _EventManager(QObject):
 Events = _EventManager()
 
 
-def __log(name):
-    """This log wrapper allows us to print the event name (signal name) in our generic logger
-    function.
+# (event name, slot) -> the traced wrapper connected in the slot's place
+_connected = {}
+
+
+def _receiver(slot):
+    """Return the QObject the given slot belongs to, if any
+
+    :param slot: bound method or partial
+    :return: QObject or None
+    """
+    owner = getattr(slot, "__self__", None)
+    if owner is None and isinstance(slot, functools.partial) and slot.args:
+        owner = slot.args[0]
+    return owner if isinstance(owner, QObject) else None
+
+
+def connect(name, slot):
+    """Connect the given slot to the named event, timing each call to it in our
+    tracer.
+
+    Qt can't see the object a slot belongs to through our wrapper, so we disconnect
+    the slot ourselves when that object is destroyed.
+
+    :param name: name of event (eg. 'Refresh')
+    :param slot: func
+    """
+    traced = Tracer.wrap(name, slot)
+    getattr(Events, name).connect(traced)
+    _connected[(name, slot)] = traced
+
+    receiver = _receiver(slot)
+    if receiver is not None:
+        receiver.destroyed.connect(functools.partial(disconnect, name, slot))
+
+
+def disconnect(name, slot):
+    """Disconnect a slot connected with connect
+
+    :param name: name of event
+    :param slot: func
+    """
+    traced = _connected.pop((name, slot), None)
+    if traced is None:
+        return
+
+    try:
+        getattr(Events, name).disconnect(traced)
+    except (TypeError, RuntimeError):  # already disconnected, or we're shutting down
+        pass
+
+
+def __trace(name):
+    """This wrapper allows us to record the event name (signal name) in our generic
+    tracer function.
 
     :param name: name of event
     :return: function
     """
 
-    def __fn(*args, **kwargs):
-        """Log all signals sent through the event manager.
+    def __fn(*args):
+        """Trace all signals sent through the event manager.
 
         Args:
             *args:
-            **kwargs:
         """
-        try:
-            print("[event] %s %s %s" % (name, args, kwargs))
-        except Exception:  # never raise on failure to log an event
-            pass
+        Tracer.record(name, Debug, "emit %s", args)
     return __fn
 
 
 def __init():
-    """Just for the sake of verbosity we can bind to signals so we can log
+    """Just for the sake of verbosity we can bind to signals so we can trace
     them all.
     """
     sigs = [i for i in inspect.getmembers(Events) if "signal" in i[1].__class__.__name__.lower()]
 
-    for name, signal in sigs:  # bind to every signal and log it's use.
-        signal.connect(__log(name))
+    for name, signal in sigs:  # bind to every signal and trace it's use.
+        signal.connect(__trace(name))
 
 
 __init()
@@ -1,14 +1,67 @@
 import functools
 import os
 import sys
+import time
 
 from conversation.ui.manifest import *
-from conversation.ui.widgets import Canvas, Properties, Editor, Actions, Conditions
+from conversation.ui.widgets import Canvas, Properties, Editor, Actions, Conditions, Minimap
+from conversation.ui import events
 from conversation.ui.events import Events
+from conversation.ui.trace import Tracer, Warn
 from conversation.ui import resources
 from conversation.ui.undo import Undo
+from conversation.ui.worker import Worker
+from conversation.ui.autosave import Autosave
 from conversation.ui import constants as consts
-from conversation.backend import FilesystemStorage
+from conversation.backend import FilesystemStorage, FilesystemRecovery
+from conversation.domain.models import Graph
+
+
+# where unsaved changes are kept, in case we crash
+_RECOVERY_DIR = os.path.join(os.path.expanduser("~"), ".conversation", "recovery")
+
+
+def _progress(worker, verb, done, total):
+    """Progress func handed to the encoder / decoder by load & save jobs
+
+    :param worker:
+    :param verb: what we're doing (eg. 'loading')
+    :param done: nodes done
+    :param total: nodes total
+    """
+    worker.check()
+    worker.report(f"{verb}: {done}/{total} nodes")
+
+
+def _load_job(worker, name, dirpath):
+    """Read a graph & build the canvas model for it, on a worker thread
+
+    :return: NodeGraph
+    """
+    g = FilesystemStorage().read(name, dirpath, progress=functools.partial(_progress, worker, "decoding"))
+    worker.check()
+    return Canvas.build_model(g)
+
+
+def _recover_job(worker, recovery):
+    """Read the graph kept by recovery & build the canvas model for it, on a worker thread
+
+    :return: NodeGraph, path of the file it was loaded from (if any)
+    """
+    data, source = recovery.read()
+    worker.check()
+    g = Graph.decode(data, progress=functools.partial(_progress, worker, "recovering"))
+    worker.check()
+    return Canvas.build_model(g), source
+
+
+def _save_job(worker, name, dirpath, graph):
+    """Write a snapshot of a graph, on a worker thread
+
+    :return: str
+    """
+    # TODO: filesystem storage is the only backend now, but we could use more later ..
+    return FilesystemStorage().write(name, dirpath, graph, progress=functools.partial(_progress, worker, "encoding"))
 
 
 class MainWindow(QMainWindow):
@@ -34,6 +87,9 @@ class MainWindow(QMainWindow):
         # internal vars
         self._panels = {}
 
+        # load / save running in the background, if any
+        self._io = None
+
         # setup global top-level keyboard shortcuts
         self.__init_global_shortcuts()
 
@@ -48,11 +104,19 @@ class MainWindow(QMainWindow):
         self.add_panel(self.__view)
 
         # allow events to set the status bar text
-        Events.Status.connect(self.__set_status)
+        events.connect("Status", self.__set_status)
         self.__set_status("ready")
 
         self.save_file = None
 
+        # write changes to recovery files in the background, once we've offered to
+        # recover anything left by the last run
+        # (each running editor gets its own files, see FilesystemRecovery.claim)
+        self._recovery = FilesystemRecovery.claim("autosave", _RECOVERY_DIR)
+        self._kept_recovery = None
+        self._autosave = Autosave(self._recovery, lambda: self.__view.model)
+        QTimer.singleShot(0, self.__offer_recovery)
+
     def __set_status(self, text):
         """
 
@@ -90,13 +154,13 @@ class MainWindow(QMainWindow):
             pass
 
         self.removeDockWidget(wgt)
-        wgt.destroy()
+        wgt.deleteLater()  # destroyed, so it's event slots are disconnected
 
     def __init_signal_handlers(self):
         """
 
         """
-        Events.Refresh.connect(self.__action_refresh)
+        events.connect("Refresh", self.__action_refresh)
 
     def __init_global_shortcuts(self):
         """Setup top level global shortcuts
@@ -104,14 +168,22 @@ class MainWindow(QMainWindow):
         # order everything listening to 'refresh' to refresh
         self._add_shortcut("refresh", "Ctrl+r", functools.partial(self.__trigger_flush_refresh))
 
+        # write out everything our tracer has recorded
+        self._add_shortcut("dump trace", "Ctrl+Shift+t", self.__action_dump_trace)
+
+        # stop a load / save that is in progress
+        self._add_shortcut("cancel", "Esc", self.__action_cancel_io)
+
         # undo the last action, whatever it was
         self._add_shortcut("undo", "Ctrl+z", functools.partial(Undo.undo))
+        self._add_shortcut("redo", "Ctrl+Shift+z", functools.partial(Undo.redo))
 
         # open various editors
         self._add_shortcut("properties", "Ctrl+p", self.__action_open_properies)
         self._add_shortcut("editor", "Ctrl+e", self.__action_open_editor)
         self._add_shortcut("actions", "Ctrl+a", self.__action_open_actions)
         self._add_shortcut("conditions", "Ctrl+c", self.__action_open_conditions)
+        self._add_shortcut("minimap", "Ctrl+m", self.__action_open_minimap)
 
     def __action_open_actions(self):
         """
@@ -129,6 +201,14 @@ class MainWindow(QMainWindow):
         """
         self.add_panel(Conditions(self))
 
+    def __action_open_minimap(self):
+        """
+
+        :return:
+
+        """
+        self.add_panel(Minimap(self, self.__view))
+
     def __action_open_editor(self):
         """
 
@@ -153,6 +233,17 @@ class MainWindow(QMainWindow):
         Events.Flush.emit()
         Events.Refresh.emit()
 
+    def __action_dump_trace(self):
+        """Print the contents of the trace buffer
+
+        :return:
+
+        """
+        lines = Tracer.dump()
+        for line in lines:
+            print(line)
+        self.__set_status(f"dumped {len(lines)} trace records")
+
     def __action_refresh(self):
         """
 
@@ -175,21 +266,129 @@ class MainWindow(QMainWindow):
         act.setShortcut(QKeySequence(sequence))
         self.addAction(act)
 
+    def __offer_recovery(self):
+        """If the last run left unsaved changes, ask if they should be recovered
+        """
+        if not self._recovery.exists():
+            self._autosave.start()
+            self._autosave.rebase(None)
+            return
+
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(self._recovery.modified))
+        answer = QMessageBox.question(
+            self, "Recover", f"Recover unsaved changes from {when}?", QMessageBox.Yes | QMessageBox.No
+        )
+        if answer != QMessageBox.Yes:
+            self._autosave.start()
+            self._autosave.rebase(None)
+            return
+
+        worker = self._start_io("recovering", _recover_job, self._recovery)
+        worker.finished.connect(self.__recovered)
+        worker.failed.connect(self.__recover_failed)
+        worker.start()
+
+    def __recovered(self, result):
+        model, source = result
+        self.__view.set_model(model)
+        self.save_file = source
+        self._autosave.start()  # carry on from the recovered files
+        self.__set_status("recovered unsaved changes")
+
+    def __recover_failed(self, error):
+        self.__keep_recovery(error.strip().splitlines()[-1])
+
+    def __keep_recovery(self, reason):
+        """Leave the files we didn't recover for next time, & autosave to new ones
+
+        :param reason: str
+
+        """
+        if self._autosave.running:
+            return  # failed after being cancelled, they're already kept
+
+        # we hold on to them until we exit, so no one else overwrites them meanwhile
+        self._kept_recovery = self._recovery
+        self._recovery = FilesystemRecovery.claim("autosave", _RECOVERY_DIR)
+        self._autosave = Autosave(self._recovery, lambda: self.__view.model)
+        self._autosave.start()
+        self._autosave.rebase(None)
+        self.__set_status(f"recovering failed: {reason}, unsaved changes will be offered again next time")
+
+    def closeEvent(self, evt):
+        # a clean exit, nothing to recover next time
+        self._autosave.stop(discard=True)
+        self._recovery.unlock()
+        if self._kept_recovery:
+            self._kept_recovery.unlock()
+        super(MainWindow, self).closeEvent(evt)
+
     def __action_about(self):
         """
         """
         QMessageBox.about(self, "About", "Nothing to see here.")
 
+    def _start_io(self, name, fn, *args):
+        """Run a load / save job in the background, only one may run at a time
+
+        :param name: job name
+        :param fn: job func
+        :param args:
+        :return: Worker or None
+
+        """
+        if self._io and self._io.running:
+            self.__set_status(f"busy {self._io.name}, press Esc to cancel")
+            return None
+
+        worker = Worker(name, fn, *args)
+        worker.progress.connect(functools.partial(self.__io_progress, worker))
+        worker.failed.connect(functools.partial(self.__io_failed, worker))
+        self._io = worker
+        return worker
+
+    def __io_progress(self, worker, text):
+        if not worker.cancelled:  # progress may still be queued after cancelling
+            self.__set_status(text)
+
+    def __io_failed(self, worker, error):
+        Tracer.record("IO", Warn, "%s failed %s", worker.name, error)
+        self.__set_status(f"{worker.name} failed: {error.strip().splitlines()[-1]}")  # error is a traceback
+
+    def __action_cancel_io(self):
+        if not (self._io and self._io.running):
+            return
+
+        self._io.cancel()
+        if self._autosave.running:
+            self._autosave.save_failed()
+        else:
+            self.__keep_recovery("cancelled")
+        self.__set_status(f"{self._io.name} cancelled")
+
     def _save(self):
         """
 
         :return: save the current graph to disk
 
         """
+        if not self.save_file:
+            return
+
         dirpath, name = os.path.split(self.save_file)
 
-        # TODO: filesystem storage is the only backend now, but we could use more later ..
-        loc = FilesystemStorage().write(name, dirpath, self.__view.get_graph())
+        # encode a copy, so the graph may be edited while it's being written
+        worker = self._start_io(f"saving {name}", _save_job, name, dirpath, self.__view.get_graph().copy())
+        if not worker:
+            return
+
+        self._autosave.begin_save()
+        worker.finished.connect(self.__saved)
+        worker.failed.connect(self._autosave.save_failed)
+        worker.start()
+
+    def __saved(self, loc):
+        self._autosave.saved(loc)
 
         msg = "saved %s" % loc
         print("saved", msg)
@@ -202,18 +401,28 @@ class MainWindow(QMainWindow):
         self._save()
 
     def __action_load(self):
-        self.save_file, _ = QFileDialog.getOpenFileName(
+        # only replaces save_file once loaded, until then saves go where they did
+        path, _ = QFileDialog.getOpenFileName(
             self, "Choose file", os.path.expanduser('~')
         )
-        if not self.save_file:
+        if not path:
             return
 
-        dirpath, name = os.path.split(self.save_file)
+        dirpath, name = os.path.split(path)
+
+        worker = self._start_io(f"loading {name}", _load_job, name, dirpath)
+        if not worker:
+            return
+
+        worker.finished.connect(functools.partial(self.__loaded, path))
+        worker.start()
 
-        g = FilesystemStorage().read(name, dirpath)
-        self.__view.set_graph(g)
+    def __loaded(self, path, model):
+        self.__view.set_model(model)
+        self.save_file = path
+        self._autosave.rebase(path)
 
-        msg = "loaded %s" % self.save_file
+        msg = "loaded %s" % path
         print("loaded", msg)
         self.__set_status(msg)
 
@@ -246,12 +455,20 @@ class MainWindow(QMainWindow):
         action.triggered.connect(self.__action_load)
         menu_file.addAction(action)
 
+        action = QAction("Cancel Load / Save", self)
+        action.triggered.connect(self.__action_cancel_io)
+        menu_file.addAction(action)
+
         menu_edit = self.__menubar.addMenu("Edit")
 
         action = QAction("Undo", self)
         action.triggered.connect(functools.partial(Undo.undo))
         menu_edit.addAction(action)
 
+        action = QAction("Redo", self)
+        action.triggered.connect(functools.partial(Undo.redo))
+        menu_edit.addAction(action)
+
         action = QAction("Refresh", self)
         action.triggered.connect(functools.partial(self.__trigger_flush_refresh))
         menu_edit.addAction(action)
@@ -274,6 +491,10 @@ class MainWindow(QMainWindow):
         action.triggered.connect(self.__action_open_actions)
         menu_view.addAction(action)
 
+        action = QAction("Minimap", self)
+        action.triggered.connect(self.__action_open_minimap)
+        menu_view.addAction(action)
+
         menu_view.addSeparator()
 
         action = QAction("Dark Theme", self)
@@ -285,6 +506,10 @@ class MainWindow(QMainWindow):
         menu_view.addAction(action)
 
         menu_help = self.__menubar.addMenu("Help")
+        action = QAction("Dump Trace", self)
+        action.triggered.connect(self.__action_dump_trace)
+        menu_help.addAction(action)
+
         action = QAction("About", self)
         action.triggered.connect(self.__action_about)
         menu_help.addAction(action)
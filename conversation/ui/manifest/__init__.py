@@ -2,7 +2,7 @@
 """
 
 from PyQt5.Qt import Qt
-from PyQt5.QtCore import QObject, QSize, QPoint, QRect
+from PyQt5.QtCore import QObject, QSize, QPoint, QRect, QPointF, QRectF, QLineF, QTimer
 from PyQt5.QtCore import pyqtSignal as Signal
 from PyQt5.QtWidgets import (
     QWidget,
@@ -28,6 +28,10 @@ from PyQt5.QtGui import (
     QPen,
     QColor,
     QPainter,
+    QPainterPath,
+    QPolygonF,
+    QPixmap,
+    QRegion,
     QIcon,
 )
 
@@ -35,6 +39,9 @@ from PyQt5.QtGui import (
 __all__ = [
     "Qt",
     "QRect",
+    "QRectF",
+    "QPointF",
+    "QLineF",
     "QFileDialog",
     "QCheckBox",
     "QTextEdit",
@@ -61,4 +68,9 @@ __all__ = [
     "QPen",
     "QColor",
     "QPainter",
+    "QPainterPath",
+    "QPolygonF",
+    "QPixmap",
+    "QRegion",
+    "QTimer",
 ]
@@ -0,0 +1,84 @@
+"""Coalesces requests to repaint widgets.
+
+Anything that wants a widget redrawn (a Refresh event, an undo, an edit on the
+canvas) asks the Refresher rather than calling repaint(). Requests are collected
+until control returns to the event loop, at which point each widget gets at most
+one update() -- covering everything that was asked for. Requests folded into one
+already pending are counted as dropped, which is handy when tuning.
+"""
+from conversation.ui.manifest import QTimer, QRegion
+from conversation.ui.trace import Tracer, Debug
+
+
+class _Refresher(object):
+    """Collects repaint requests & flushes them once per event loop turn.
+    """
+
+    def __init__(self):
+        # widget -> QRegion to repaint, or None for the whole widget
+        self._pending = {}
+        self._scheduled = False
+
+        self.requested = 0
+        self.dropped = 0
+        self.painted = 0
+
+    def request(self, widget, rect=None):
+        """Ask for the given widget to be repainted on the next event loop turn.
+
+        Args:
+            widget (QWidget):
+            rect (QRect): only this area needs repainting, the whole widget if not given
+        """
+        self.requested += 1
+
+        if widget in self._pending:
+            self.dropped += 1
+            region = self._pending[widget]
+            if region is not None:
+                self._pending[widget] = None if rect is None else region.united(rect)
+        else:
+            self._pending[widget] = None if rect is None else QRegion(rect)
+
+        if not self._scheduled:
+            self._scheduled = True
+            QTimer.singleShot(0, self.flush)
+
+    def flush(self):
+        """Issue one update to each widget with a pending request.
+        """
+        pending = self._pending
+        self._pending = {}
+        self._scheduled = False
+
+        for widget, region in pending.items():
+            try:
+                if region is None:
+                    widget.update()
+                else:
+                    widget.update(region)
+            except RuntimeError:  # widget was deleted while it's request was pending
+                continue
+            self.painted += 1
+
+        Tracer.record("Refresh", Debug, "flushed %d updates (dropped %d total)", len(pending), self.dropped)
+
+    def stats(self):
+        """Return counts of requests made, updates issued & requests dropped.
+
+        Returns:
+            dict
+        """
+        return {
+            "requested": self.requested,
+            "painted": self.painted,
+            "dropped": self.dropped,
+        }
+
+    def reset(self):
+        self.requested = 0
+        self.dropped = 0
+        self.painted = 0
+
+
+Refresher = _Refresher()
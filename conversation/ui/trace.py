@@ -0,0 +1,148 @@
+"""Lightweight tracing for the UI.
+
+Records go to an in-memory ring buffer (never stdout) & are only formatted when
+the buffer is dumped, so tracing is cheap enough to leave running. Slots connected
+through events.connect are timed, which makes slow signal handlers easy to find.
+
+The level can be set at startup with the CONVERSATION_TRACE environment variable
+(eg. CONVERSATION_TRACE=debug to trace every signal).
+"""
+import collections
+import os
+import random
+import time
+
+
+Debug = 10
+Info = 20
+Warn = 30
+Off = 100
+
+_LEVELS = {
+    "debug": Debug,
+    "info": Info,
+    "warning": Warn,
+    "off": Off,
+}
+
+
+class _Tracer(object):
+    """Levelled tracer with per name enable & sampling.
+    """
+
+    def __init__(self, size=4096, level=Info):
+        self._buffer = collections.deque(maxlen=size)
+        self.level = level
+
+        self._disabled = set()
+        self._sample = {}
+
+    def set_enabled(self, name, enabled=True):
+        """Turn tracing of the given name (signal) on or off.
+
+        Args:
+            name (str):
+            enabled (bool):
+        """
+        if enabled:
+            self._disabled.discard(name)
+        else:
+            self._disabled.add(name)
+
+    def set_sample(self, name, rate):
+        """Only record the given fraction of traces for the given name.
+
+        Args:
+            name (str):
+            rate (float): 0 -> 1
+        """
+        if rate >= 1:
+            self._sample.pop(name, None)
+        else:
+            self._sample[name] = rate
+
+    def active(self, name, level):
+        """Return if a trace for the given name & level would be recorded.
+
+        Returns:
+            bool
+        """
+        if level < self.level or name in self._disabled:
+            return False
+
+        rate = self._sample.get(name)
+        return rate is None or random.random() < rate
+
+    def record(self, name, level, message="", *args, duration=None):
+        """Record a trace, message is %-formatted with args when dumped.
+
+        Args:
+            name (str): source of the trace, usually a signal name
+            level (int):
+            message (str):
+            *args: message args
+            duration (float): seconds taken, if timed
+        """
+        if not self.active(name, level):
+            return
+        self._buffer.append((time.time(), level, name, message, args, duration))
+
+    def wrap(self, name, slot, level=Info):
+        """Wrap the given slot so that calls to it are timed & recorded.
+
+        Args:
+            name (str): signal name
+            slot (func):
+            level (int):
+
+        Returns:
+            func
+        """
+        perf_counter = time.perf_counter
+
+        def __traced(*args):
+            if not self.active(name, level):
+                return slot(*args)
+
+            start = perf_counter()
+            try:
+                return slot(*args)
+            finally:
+                self._buffer.append((
+                    time.time(), level, name, "slot %s", (getattr(slot, "__qualname__", slot),),
+                    perf_counter() - start,
+                ))
+        return __traced
+
+    def clear(self):
+        self._buffer.clear()
+
+    def dump(self):
+        """Format everything in the buffer, oldest first.
+
+        Returns:
+            []str
+        """
+        levels = {v: k for k, v in _LEVELS.items()}
+
+        lines = []
+        for (when, level, name, message, args, duration) in list(self._buffer):
+            try:
+                text = message % args if args else message
+            except Exception:  # never raise on failure to format a trace
+                text = "%s %s" % (message, args)
+
+            line = "%s.%03d [%s] %s %s" % (
+                time.strftime("%H:%M:%S", time.localtime(when)),
+                int(when * 1000) % 1000,
+                levels.get(level, level),
+                name,
+                text,
+            )
+            if duration is not None:
+                line += " (%.3fms)" % (duration * 1000)
+            lines.append(line)
+        return lines
+
+
+Tracer = _Tracer(level=_LEVELS.get(os.environ.get("CONVERSATION_TRACE", "").lower(), Info))
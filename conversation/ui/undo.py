@@ -1,18 +1,225 @@
+import abc
+import contextlib
+import sys
+
 from conversation.ui.events import Events
+from conversation.ui.trace import Tracer, Warn
+
+
+def _sizeof(value) -> int:
+    """Rough size in bytes of a value held by a command. Containers are walked,
+    other objects (nodes, models, funcs) are only counted as the object itself
+    since they're shared with the rest of the editor.
+
+    :param value:
+    :return: int
+
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += _sizeof(k) + _sizeof(v)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for v in value:
+            size += _sizeof(v)
+    return size
+
+
+class Command(metaclass=abc.ABCMeta):
+    """Something the user did that can be undone & redone.
+    """
+
+    name = ""
+
+    @abc.abstractmethod
+    def undo(self):
+        pass
+
+    @abc.abstractmethod
+    def redo(self):
+        pass
+
+    @property
+    def can_redo(self) -> bool:
+        return True
+
+    def merge(self, other) -> bool:
+        """Try to fold a command that came straight after this one into this one.
+
+        Args:
+            other (Command):
+
+        Returns:
+            bool: True if other was merged & shouldn't be added to the stack
+        """
+        return False
+
+    def size(self) -> int:
+        """Approximate memory held by this command, in bytes.
+
+        Returns:
+            int
+        """
+        return sys.getsizeof(self) + sum(_sizeof(v) for v in vars(self).values())
+
+
+class Call(Command):
+    """A command that calls the given funcs (usually partials) to undo / redo.
+    """
+
+    def __init__(self, name, undo, redo=None):
+        """
+
+        Args:
+            name (str): arbitrary name that explains to user what this undo does
+            undo ([]functools.partial): list of funcs that would effect undo
+            redo ([]functools.partial): list of funcs that would redo the action
+        """
+        self.name = name
+        self._undo = undo
+        self._redo = redo
+
+    @property
+    def can_redo(self) -> bool:
+        return self._redo is not None
+
+    def undo(self):
+        for func in self._undo:
+            func()
+
+    def redo(self):
+        for func in self._redo or []:
+            func()
+
+
+class MoveNodes(Command):
+    """Nodes of a graph changing position. Nodes are held by id, so this doesn't keep
+    nodes alive after they've been removed from the graph.
+
+    Consecutive moves of the same node(s) merge into one command.
+    """
+
+    def __init__(self, model, before, after, refresh=None, name="move node", mergeable=True):
+        """
+
+        Args:
+            model (NodeGraph):
+            before (dict): id -> (x, y)
+            after (dict): id -> (x, y)
+            refresh (func): called before & after nodes are moved, to repaint where they were & are
+            name (str):
+            mergeable (bool): if consecutive commands may be merged into this one
+        """
+        self.name = name
+        self._model = model
+        self._before = before
+        self._after = after
+        self._refresh = refresh
+        self._mergeable = mergeable
+
+    def _apply(self, positions):
+        if self._refresh:
+            self._refresh()
+        self._model.move_nodes(positions)
+        if self._refresh:
+            self._refresh()
+
+    def undo(self):
+        self._apply(self._before)
+
+    def redo(self):
+        self._apply(self._after)
+
+    def merge(self, other) -> bool:
+        if not (self._mergeable and isinstance(other, MoveNodes) and other._mergeable):
+            return False
+
+        if other.name != self.name or other._model is not self._model:
+            return False
+
+        if other._before.keys() != self._before.keys():
+            return False
+
+        self._after = other._after
+        return True
+
+    def size(self) -> int:
+        return sys.getsizeof(self) + _sizeof(self._before) + _sizeof(self._after)
+
+
+class Group(Command):
+    """Several commands undone & redone as one.
+    """
+
+    def __init__(self, name, commands=None, refresh=None):
+        """
+
+        Args:
+            name (str):
+            commands ([]Command):
+            refresh (func): called once all commands are undone / redone
+        """
+        self.name = name
+        self.commands = commands or []
+        self._refresh = refresh
+
+    @property
+    def can_redo(self) -> bool:
+        return all(c.can_redo for c in self.commands)
+
+    def undo(self):
+        for command in reversed(self.commands):
+            command.undo()
+        if self._refresh:
+            self._refresh()
+
+    def redo(self):
+        for command in self.commands:
+            command.redo()
+        if self._refresh:
+            self._refresh()
+
+    def add(self, command):
+        if self.commands and self.commands[-1].merge(command):
+            return
+        self.commands.append(command)
+
+    def size(self) -> int:
+        return sys.getsizeof(self) + _sizeof(self.commands) + sum(c.size() for c in self.commands)
 
 
 class _UndoManager(object):
-    """Trivial undo service manager.
+    """Undo / redo stack of Commands.
 
-    Essentially you add items to the undo stack by calling 'add undo' and
-    supplying a name (for display purposes) and a list of partial functions
-    that would effectively undo the given action if called.
+    Commands are added as the user does things, if the user chooses to "undo" we pop
+    off the top command & undo it, moving it to the redo stack. Doing anything new
+    clears the redo stack.
 
-    At some point, if the user chooses to call "undo" we pop off the top action
-    and iterate through the partial funcs, calling them one at a time.
+    The stack is bounded both by number of entries & (approximate) memory, the oldest
+    entries are dropped first.
     """
-    def __init__(self):
+
+    def __init__(self, max_entries=500, max_bytes=16 * 1024 * 1024):
         self._stack = []
+        self._redo = []
+        self._bytes = 0
+        self._groups = []
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    def configure(self, max_entries=None, max_bytes=None):
+        """Change the bounds of the stack
+
+        Args:
+            max_entries (int):
+            max_bytes (int):
+        """
+        if max_entries is not None:
+            self.max_entries = max_entries
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        self._trim()
 
     @property
     def size(self):
@@ -23,6 +230,15 @@ class _UndoManager(object):
         """
         return len(self._stack)
 
+    @property
+    def memory(self):
+        """Return the approximate memory held by the undo & redo stacks, in bytes.
+
+        Returns:
+            int
+        """
+        return self._bytes
+
     @property
     def last_action_name(self):
         """Returns the given 'name' string for the last action recorded here
@@ -34,38 +250,126 @@ class _UndoManager(object):
         if not self._stack:
             return None
 
-        return self._stack[-1][0]
+        return self._stack[-1][0].name
+
+    @property
+    def next_redo_name(self):
+        if not self._redo:
+            return None
+
+        return self._redo[-1][0].name
 
     def undo(self):
-        """Pop off the last action & call the given partial funcs.
+        """Pop off the last command & undo it.
         """
         if not self._stack:
             return
 
-        name, funcs = self._stack.pop()
-        for func in funcs:
-            try:
-                func()
-            except Exception as e:
-                print("Undo action '%s' failed, aborting undo sequence. %s" % (name, e))
-                return
+        command, size = self._stack.pop()
+        try:
+            command.undo()
+        except Exception as e:
+            Tracer.record("Undo", Warn, "undo '%s' failed, aborting undo sequence %s", command.name, e)
+            self._redo.clear()
+            self._recount()
+            return
 
-        nxt = self.last_action_name
-        if nxt:
-            Events.Status.emit(f"Control+Z: Undo '{nxt}'")
+        if command.can_redo:
+            self._redo.append((command, size))
         else:
-            Events.Status.emit("Undo stack empty")
+            self._bytes -= size
+
+        self._status()
 
-    def add_undo(self, name, partials):
-        """Add a new undo to the stack.
+    def redo(self):
+        """Pop off the last undone command & redo it.
+        """
+        if not self._redo:
+            return
+
+        command, size = self._redo.pop()
+        try:
+            command.redo()
+        except Exception as e:
+            Tracer.record("Undo", Warn, "redo '%s' failed, aborting redo sequence %s", command.name, e)
+            self._redo.clear()
+            self._recount()
+            return
+
+        self._stack.append((command, size))
+        self._status()
+
+    def add(self, command):
+        """Add a command that has already been done to the stack.
 
         Args:
-            name (str): arbitrary name that explains to user what this undo does
-            partials ([]functools.partial): list of funcs that would effect undo
+            command (Command):
+        """
+        if self._groups:
+            self._groups[-1].add(command)
+            return
 
+        if self._redo:
+            self._redo.clear()
+            self._recount()
+
+        if self._stack and self._stack[-1][0].merge(command):
+            top, size = self._stack.pop()
+            self._bytes -= size
+            command = top
+
+        size = command.size()
+        self._stack.append((command, size))
+        self._bytes += size
+        self._trim()
+        self._status()
+
+    @contextlib.contextmanager
+    def group(self, name, refresh=None):
+        """Collect all commands added within this context into one entry, undone &
+        redone together. A group opened within another becomes part of the outer one.
+
+        Args:
+            name (str):
+            refresh (func): called once the group's commands are undone / redone
+        """
+        grp = Group(name, refresh=refresh)
+        self._groups.append(grp)
+        try:
+            yield grp
+        finally:
+            self._groups.pop()
+            if grp.commands:
+                self.add(grp)
+
+    def clear(self):
+        self._stack.clear()
+        self._redo.clear()
+        self._bytes = 0
+
+    def _recount(self):
+        self._bytes = sum(s for _, s in self._stack) + sum(s for _, s in self._redo)
+
+    def _trim(self):
+        """Drop the oldest entries until we're within our bounds
         """
-        self._stack.append((name, partials))
-        Events.Status.emit(f"Control+Z: Undo '{name}'")
+        drop = 0
+        while drop < len(self._stack) - 1 and (
+                len(self._stack) - drop > self.max_entries or self._bytes > self.max_bytes
+        ):
+            self._bytes -= self._stack[drop][1]
+            drop += 1
+
+        if drop:
+            del self._stack[:drop]
+
+    def _status(self):
+        nxt = self.last_action_name
+        usage = "%d entries, %.1fKB" % (len(self._stack) + len(self._redo), self._bytes / 1024)
+        if nxt:
+            Events.Status.emit(f"Control+Z: Undo '{nxt}' ({usage})")
+        else:
+            Events.Status.emit(f"Undo stack empty ({usage})")
 
 
 Undo = _UndoManager()
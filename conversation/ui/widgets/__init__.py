@@ -4,6 +4,7 @@ from conversation.ui.widgets.properties import Properties
 from conversation.ui.widgets.properties import Editor
 from conversation.ui.widgets.properties import Conditions
 from conversation.ui.widgets.properties import Actions
+from conversation.ui.widgets.minimap import Minimap
 
 
 __all__ = [
@@ -14,4 +15,5 @@ __all__ = [
     "Editor",
     "Conditions",
     "Actions",
+    "Minimap",
 ]
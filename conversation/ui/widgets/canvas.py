@@ -1,27 +1,338 @@
+import math
+import time
 from functools import partial
 
 from conversation.ui import widgets
 from conversation.ui.widgets import internal
 from conversation.ui.manifest import *
-from conversation.ui.undo import Undo
+from conversation.ui.undo import Undo, Call, MoveNodes
+from conversation.ui.refresh import Refresher
+from conversation.ui.worker import Worker
+from conversation.ui.trace import Tracer, Warn
 from conversation.ui.widgets import utils
+from conversation.ui.widgets.profiler import FrameProfiler
 from conversation.ui import constants as consts
-from conversation.ui.events import Events
+from conversation.ui import events
+from conversation.domain.layout import LayeredLayout
+
+
+def _run_layout(worker, nodes, edges, subtree):
+    """Layout job, run on a worker thread against a snapshot of the graph
+
+    :return: dict id -> (x, y)
+    """
+    positions = None
+    for positions in LayeredLayout(nodes, edges).run(subtree=subtree):
+        if worker.cancelled:
+            return None
+        worker.report(positions)
+    return positions
+
+
+class _Viewport(object):
+    """Maps between widget (screen) & graph (world) coordinates.
+
+    The world point at the top left of the widget is (x, y), and one world unit is
+    'scale' pixels.
+    """
+
+    MIN_SCALE = 0.02
+    MAX_SCALE = 8.0
+
+    def __init__(self):
+        self.x = 0.0
+        self.y = 0.0
+        self.scale = 1.0
+
+    def to_world(self, sx, sy):
+        return sx / self.scale + self.x, sy / self.scale + self.y
+
+    def to_screen(self, wx, wy):
+        return (wx - self.x) * self.scale, (wy - self.y) * self.scale
+
+    def zoom(self, factor, sx, sy):
+        """Zoom by the given factor keeping the world point under sx, sy fixed
+
+        Args:
+            factor (float):
+            sx (float):
+            sy (float):
+        """
+        wx, wy = self.to_world(sx, sy)
+        self.scale = min(self.MAX_SCALE, max(self.MIN_SCALE, self.scale * factor))
+        self.x = wx - sx / self.scale
+        self.y = wy - sy / self.scale
+
+    def pan(self, dx, dy):
+        """Move the view by the given number of screen pixels
+
+        Args:
+            dx (float):
+            dy (float):
+        """
+        self.x -= dx / self.scale
+        self.y -= dy / self.scale
+
+    def visible(self, width, height):
+        """Return the world rect visible in a widget of the given size
+
+        Returns:
+            (x0, y0, x1, y1)
+        """
+        return self.x, self.y, self.x + width / self.scale, self.y + height / self.scale
 
 
 class Canvas(widgets.Panel):
     """Simple widget to draw a bar chart given a GraphData object.
     """
+
+    _ZOOM_STEP = 1.15
+
+    # past this many separate dirty areas, repaint their bounding rect (clipped) in one go
+    _MAX_DIRTY_RECTS = 8
+
+    # a shift click that moves less than this (in pixels) selects rather than drags
+    _CLICK_DISTANCE = 3
+
+    # an area of the graph (x0, y0, x1, y1) changed, or None if all of it may have
+    world_changed = Signal(object)
+
+    # the area of the graph in view changed (panned, zoomed or resized)
+    view_changed = Signal()
+
     def __init__(self, parent):
         super(Canvas, self).__init__(parent)
         self._model = internal.NodeGraph()
         self.mouseReleaseEvent = self.__mouse_release
         self.mouseDoubleClickEvent = self.__on_dbl_click
         self.mousePressEvent = self.__on_click
+        self.mouseMoveEvent = self.__mouse_move
+        self.wheelEvent = self.__on_wheel
 
         self._dragging = None
+        self._press = None
+        self._panning = None
+        self._band = None
+        self._viewport = _Viewport()
+        self._profiler = FrameProfiler()
+
+        # off screen render of the graph, only the dirty area of which is redrawn on change
+        self._cache = None
+        self._cache_key = None
+        self._dirty = QRegion()
+
+        # automatic layout job, if one is running, & node positions from before it
+        self._layout = None
+        self._layout_before = {}
+
+        # nodes matching the search box, best first, & the one we last jumped to
+        self._matches = []
+        self._match = -1
+
+        events.connect("Refresh", self.invalidate)
+
+        self._add_shortcut("delete", "Del", self.delete_selection)
+        self._add_shortcut("find", "Ctrl+f", self.__focus_search)
+
+        # node text may have been changed by panels, which flush after we're told
+        events.connect("Flush", self.__research_later)
+        events.connect("NodeSelected", self.__research_later)
+
+    def _add_toolbar_actions(self):
+        self._search = QLineEdit(self)
+        self._search.setPlaceholderText("Search")
+        self._search.setToolTip("Find nodes by text, flags or state, enter jumps to the next match")
+        self._search.setMaximumWidth(200)
+        self._search.textChanged.connect(self.__on_search)
+        self._search.returnPressed.connect(self.__next_match)
+        self._toolbar.addWidget(self._search)
+
+        self._toolbar.addAction("Layout", self.__action_layout)
+        self._toolbar.addAction("Layout Subtree", self.__action_layout_subtree)
+        self._toolbar.addAction("Export Profile", self.__export_profile)
+
+        profile = QAction("Profile", self)
+        profile.setCheckable(True)
+        profile.setToolTip("Show paint time, nodes / edges drawn & repaint frequency")
+        profile.toggled.connect(self.__toggle_profiler)
+        self._toolbar.addAction(profile)
+
+        super(Canvas, self)._add_toolbar_actions()
+
+    def __toggle_profiler(self, value):
+        """Turn the frame profiler overlay on / off
+
+        :param value:
+
+        """
+        self._profiler.enabled = value
+        self._profiler.clear()
+        self.invalidate()
+
+    def __export_profile(self):
+        """Write the frame profiler history to a csv file
+
+        """
+        path, _ = QFileDialog.getSaveFileName(self, "Export frame profile", "", "CSV (*.csv)")
+        if not path:
+            return
+
+        self._profiler.export_csv(path)
+        events.Events.Status.emit(f"exported frame profile to {path}")
+
+    def __focus_search(self):
+        self._search.setFocus()
+        self._search.selectAll()
+
+    def __on_search(self, text):
+        """Highlight every node matching the search text
+
+        :param text:
 
-        Events.Refresh.connect(self.repaint)
+        """
+        self._matches = self._model.search(text) if text.strip() else []
+        self._match = -1
+        self._model.highlight(self._matches)
+        self.invalidate()
+
+        if text.strip():
+            events.Events.Status.emit("%d matches for '%s'" % (len(self._matches), text))
+
+    def __research_later(self, *args):
+        if self._search.text().strip():
+            QTimer.singleShot(0, self.__research)
+
+    def __research(self):
+        matches = self._model.search(self._search.text())
+        if matches != self._matches:
+            self._matches = matches
+            self._match = -1
+            self._model.highlight(matches)
+            self.invalidate()
+
+    def __next_match(self):
+        """Jump to the next best search match
+        """
+        if not self._matches:
+            return
+
+        self._match = (self._match + 1) % len(self._matches)
+        self.jump_to(self._matches[self._match])
+        events.Events.Status.emit("match %d of %d" % (self._match + 1, len(self._matches)))
+
+    def jump_to(self, node):
+        """Centre the view on the given node & select it
+
+        :param node:
+
+        """
+        self.center_on(node.x + node.size / 2, node.y + node.size / 2)
+        self._select(node)
+
+    def center_on(self, x, y):
+        """Move the view so it's centred on the given point of the graph
+
+        :param x:
+        :param y:
+
+        """
+        vp = self._viewport
+        vp.x = x - self.width() / vp.scale / 2
+        vp.y = y - self.height() / vp.scale / 2
+        Refresher.request(self)
+
+    def visible(self):
+        """Return the area of the graph in view
+
+        :return: (x0, y0, x1, y1)
+
+        """
+        return self._viewport.visible(self.width(), self.height())
+
+    def __action_layout(self):
+        self.layout()
+
+    def __action_layout_subtree(self):
+        selected = self._model.selected
+        if not selected:
+            events.Events.Status.emit("select a node to lay out from")
+            return
+        self.layout(subtree=selected.id)
+
+    def layout(self, subtree=None):
+        """Automatically lay out the graph (or everything reachable from the given node)
+        in the background. Nodes are moved as each pass completes.
+
+        :param subtree: node id
+
+        """
+        nodes, edges = self._model.snapshot()
+        before = {id_: (x, y) for (id_, _, _, x, y) in nodes}
+
+        if self._layout:
+            # the layout we're replacing may have moved nodes already, undo should
+            # take them back to where they were before it
+            self._layout.cancel()
+            before.update(self._layout_before)
+
+        worker = Worker("Layout", _run_layout, nodes, edges, subtree)
+        worker.progress.connect(partial(self.__layout_progress, worker))
+        worker.finished.connect(partial(self.__layout_finished, worker, before))
+        worker.failed.connect(partial(self.__layout_failed, worker))
+        self._layout = worker
+        self._layout_before = before
+
+        events.Events.Status.emit("laying out %d nodes .." % len(nodes))
+        worker.start()
+
+    def __layout_progress(self, worker, positions):
+        if self._layout is not worker:
+            return  # queued before the job was cancelled or replaced
+
+        self._model.move_nodes(positions)
+        self.invalidate()
+
+    def __layout_finished(self, worker, before, positions):
+        """
+
+        :param worker:
+        :param before: dict id -> (x, y) prior to the layout
+        :param positions: dict id -> (x, y)
+
+        """
+        if self._layout is not worker:
+            return
+        self._layout = None
+
+        if not positions:
+            return
+
+        # include nodes only moved by layouts this one replaced
+        after = dict(positions)
+        if len(before) > len(positions):
+            for id_, _, _, x, y in self._model.snapshot()[0]:
+                if id_ not in after and before.get(id_, (x, y)) != (x, y):
+                    after[id_] = (x, y)
+
+        Undo.add(MoveNodes(
+            self._model,
+            {k: before[k] for k in after if k in before},
+            after,
+            refresh=self.invalidate,
+            name="layout",
+            mergeable=False,
+        ))
+        events.Events.Status.emit("laid out %d nodes" % len(positions))
+
+    def __layout_failed(self, worker, error):
+        if self._layout is worker:
+            self._layout = None
+        Tracer.record("Layout", Warn, "layout failed %s", error)
+        events.Events.Status.emit("layout failed")
+
+    @property
+    def model(self):
+        return self._model
 
     def get_graph(self):
         """
@@ -31,8 +342,226 @@ class Canvas(widgets.Panel):
     def set_graph(self, graph):
         """
         """
-        self._model.set_domain_graph(graph)
-        self.repaint()
+        self.set_model(self.build_model(graph))
+
+    @staticmethod
+    def build_model(graph):
+        """Build the UI model for the given graph. This doesn't touch the canvas so
+        may be called from any thread.
+
+        :param graph: conversation.domain.Graph
+        :return: NodeGraph
+
+        """
+        model = internal.NodeGraph()
+        model.set_domain_graph(graph, select=False)
+        return model
+
+    def set_model(self, model):
+        """Swap in a new model (see build_model) in one go
+
+        :param model: NodeGraph
+
+        """
+        if self._layout:
+            self._layout.cancel()
+            self._layout = None
+
+        self._dragging = None
+        self._band = None
+        self._matches = []
+        self._match = -1
+        self._model = model
+        self._model.select(self._model.selected)
+        self.invalidate()
+
+    def invalidate(self):
+        """Throw away our cached render & schedule a full repaint
+        """
+        self._cache = None
+        Refresher.request(self)
+        self.world_changed.emit(None)
+
+    def _invalidate_world(self, x0, y0, x1, y1):
+        """Schedule a repaint of the given area of the graph
+
+        :param x0:
+        :param y0:
+        :param x1:
+        :param y1:
+
+        """
+        self.world_changed.emit((x0, y0, x1, y1))
+
+        vp = self._viewport
+        sx0, sy0 = vp.to_screen(x0, y0)
+        sx1, sy1 = vp.to_screen(x1, y1)
+
+        rect = QRect(
+            math.floor(sx0) - 1,
+            math.floor(sy0) - 1,
+            math.ceil(sx1 - sx0) + 3,
+            math.ceil(sy1 - sy0) + 3,
+        ).intersected(self.rect())
+        if rect.isEmpty():
+            return
+
+        self._dirty = self._dirty.united(rect)
+        Refresher.request(self, rect)
+
+        if self._profiler.enabled:
+            Refresher.request(self, self._profiler.rect(*self._overlay_pos()))
+
+    def _invalidate_node(self, node, edges=True):
+        """Schedule a repaint of the area the given node (& optionally it's edges)
+        cover.
+
+        :param node:
+        :param edges:
+
+        """
+        if not node:
+            return
+
+        self._invalidate_world(*node.bounds)
+
+        if edges:
+            for other in self._model.node_edges(node):
+                self._invalidate_edge(node, other)
+
+    def _invalidate_nodes(self, nodes):
+        """Schedule a repaint of the given nodes & their edges. If there are a lot of
+        them the whole canvas is repainted, but only the area they cover is reported as
+        changed.
+
+        :param nodes: list of Node
+
+        """
+        if len(nodes) <= self._MAX_DIRTY_RECTS:
+            for n in nodes:
+                self._invalidate_node(n)
+            return
+
+        areas = []
+        for n in nodes:
+            areas.append(n.bounds)
+            areas.extend(self._model.edge_bounds(n, other) for other in self._model.node_edges(n))
+
+        self._cache = None
+        Refresher.request(self)
+        self.world_changed.emit((
+            min(a[0] for a in areas),
+            min(a[1] for a in areas),
+            max(a[2] for a in areas),
+            max(a[3] for a in areas),
+        ))
+
+    def _invalidate_edge(self, a, b):
+        """Schedule a repaint of the area the line between a & b covers.
+
+        :param a:
+        :param b:
+
+        """
+        x0, y0, x1, y1 = self._model.edge_bounds(a, b)
+        if x1 - x0 > 1 and y1 - y0 > 1:
+            # repaint a diagonal line in sections so that we don't redraw the whole
+            # rectangle it spans
+            steps = max(1, int(max(x1 - x0, y1 - y0) * self._viewport.scale / 64))
+            ax, ay = a.x + a.size / 2, a.y + a.size / 2
+            dx = (b.x + b.size / 2 - ax) / steps
+            dy = (b.y + b.size / 2 - ay) / steps
+            for i in range(steps):
+                sx, sy = ax + dx * i, ay + dy * i
+                self._invalidate_world(
+                    min(sx, sx + dx), min(sy, sy + dy), max(sx, sx + dx), max(sy, sy + dy)
+                )
+            return
+
+        self._invalidate_world(x0, y0, x1, y1)
+
+    def _select(self, node):
+        """Select the given node, repainting the old & new selection
+
+        :param node:
+
+        """
+        self._invalidate_selection()
+        self._model.select(node)
+        self._invalidate_node(node, edges=False)
+
+    def _invalidate_selection(self):
+        """Schedule a repaint of the selected nodes, or of everything if there are a lot
+        of them (one full repaint is cheaper than many small ones)
+        """
+        selection = self._model.selection
+        if len(selection) > self._MAX_DIRTY_RECTS:
+            self.invalidate()
+            return
+
+        for node in selection:
+            self._invalidate_node(node, edges=False)
+
+    def delete_selection(self):
+        """Remove all selected nodes, as one undo step
+        """
+        nodes = self._model.selection
+        if not nodes:
+            return
+
+        with Undo.group("delete %d node(s)" % len(nodes)):
+            self._model.select_many([])
+            Undo.add(Call("deselect", [
+                partial(self._model.select_many, nodes),
+            ], redo=[
+                partial(self._model.select_many, []),
+            ]))
+
+            self._invalidate_nodes(nodes)
+            edges = self._model.remove_nodes(nodes)
+            Undo.add(Call("remove nodes", [
+                partial(self._model.restore_nodes, nodes, edges),
+                partial(self._invalidate_nodes, nodes),
+            ], redo=[
+                partial(self._invalidate_nodes, nodes),
+                partial(self._model.remove_nodes, nodes),
+            ]))
+
+    def __on_wheel(self, evt):
+        """Zoom in / out around the mouse
+
+        :param evt:
+
+        """
+        steps = evt.angleDelta().y() / 120
+        if not steps:
+            return
+
+        p = evt.pos()
+        self._viewport.zoom(self._ZOOM_STEP ** steps, p.x(), p.y())
+        Refresher.request(self)
+
+    def __mouse_move(self, evt):
+        """Pan the view while the middle mouse button is held, or grow the rubber
+        band selection.
+
+        :param evt:
+
+        """
+        p = evt.pos()
+
+        if self._band is not None:
+            self._band.setBottomRight(p)
+            Refresher.request(self)
+            return
+
+        if self._panning is None:
+            return
+
+        px, py = self._panning
+        self._viewport.pan(p.x() - px, p.y() - py)
+        self._panning = (p.x(), p.y())
+        Refresher.request(self)
 
     def __mouse_release(self, evt):
         """
@@ -40,25 +569,81 @@ class Canvas(widgets.Panel):
         :param evt:
 
         """
+        if evt.button() == Qt.MiddleButton:
+            self._panning = None
+            return
+
+        if self._band is not None:
+            self.__select_band(self._band.normalized())
+            self._band = None
+            return
+
         x, y = self._click_coords(evt)
 
         if self._dragging and utils.shift_held():
-            px = self._dragging.x
-            py = self._dragging.y
+            p = evt.pos()
+            if (p - self._press).manhattanLength() <= self._CLICK_DISTANCE:
+                # shift click without moving, add / remove the node from the selection
+                self._invalidate_selection()
+                self._model.toggle(self._dragging)
+                self._invalidate_node(self._dragging, edges=False)
+            else:
+                self.__move_dragged(x, y)
+
+        self._dragging = None
 
-            self._dragging.move_to(
-                x - self._dragging.size/2,
-                y - self._dragging.size/2
-            )
+    def __move_dragged(self, x, y):
+        """Move the node being dragged so it's centred on x, y. If it's selected all
+        of the selection moves with it.
 
-            Undo.add_undo("move node", [
-                partial(self._dragging.move_to, px, py),
-                self.repaint,
-            ])
+        :param x:
+        :param y:
 
-            self.repaint()
+        """
+        target = self._dragging
+        dx = x - target.size / 2 - target.x
+        dy = y - target.size / 2 - target.y
 
-        self._dragging = None
+        if self._model.is_selected(target):
+            nodes = self._model.selection
+        else:
+            nodes = [target]
+
+        before = {n.id: (n.x, n.y) for n in nodes}
+        after = {n.id: (n.x + dx, n.y + dy) for n in nodes}
+
+        self._invalidate_nodes(nodes)
+        self._model.move_nodes(after)
+        self._invalidate_nodes(nodes)
+
+        Undo.add(MoveNodes(
+            self._model,
+            before,
+            after,
+            refresh=partial(self._invalidate_nodes, nodes),
+            name="move node" if len(nodes) == 1 else "move nodes",
+        ))
+
+    def __select_band(self, rect):
+        """Select everything within the given rubber band
+
+        :param rect: QRect (in widget coordinates)
+
+        """
+        x0, y0 = self._viewport.to_world(rect.left(), rect.top())
+        x1, y1 = self._viewport.to_world(rect.right(), rect.bottom())
+
+        # nodes are indexed by their top left corner, so grow the query by a node's size
+        size = self._model.max_node_size
+        nodes = [
+            n for n in self._model.objects_in(x0 - size, y0 - size, x1, y1)
+            if n.x + n.size >= x0 and n.y + n.size >= y0
+        ]
+
+        self._invalidate_selection()
+        self._model.select_many(nodes, add=utils.control_held())
+        self._invalidate_selection()
+        Refresher.request(self)  # clear the band
 
     def __on_dbl_click(self, evt):
         """
@@ -69,32 +654,45 @@ class Canvas(widgets.Panel):
         pass
 
     def _on_right_click(self, evt):
-        """
+        """Connect the selected node(s) to the clicked node.
 
         :param evt:
         :param x:
         :param y:
 
         """
-        selected = self._model.selected
-        if not selected:
+        selection = self._model.selection
+        if not selection:
             return
 
         x, y = self._click_coords(evt)
         target = self._model.object_at(x, y)
         if not target:
             return
-        elif target.id == selected.id:
-            return
-        elif target.shape == selected.shape:
+
+        # replies can only link to messages & vice versa, skip those already linked
+        # so undo doesn't remove edges this didn't add
+        sources = [
+            n for n in selection
+            if n.id != target.id and n.shape != target.shape and not self._model.has_edge(target, n)
+        ]
+        if not sources:
             return
 
-        self._model.add_edge(target, selected)
-        Undo.add_undo("add edge", [
-            partial(self._model.remove_edge, target, selected),
-            partial(self.repaint),
-        ])
-        self.repaint()
+        for n in sources:
+            self._model.add_edge(target, n)
+
+        Undo.add(Call("add edge" if len(sources) == 1 else "add %d edges" % len(sources), [
+            partial(self._model.remove_edge, target, n) for n in sources
+        ] + [self.invalidate], redo=[
+            partial(self._model.add_edge, target, n) for n in sources
+        ] + [self.invalidate]))
+
+        if len(sources) > self._MAX_DIRTY_RECTS:
+            self.invalidate()
+        else:
+            for n in sources:
+                self._invalidate_edge(target, n)
 
     def _on_left_click(self, evt):
         """
@@ -108,40 +706,55 @@ class Canvas(widgets.Panel):
         if target:
             if utils.shift_held():
                 self._dragging = target
+                self._press = evt.pos()
             else:
-                self._model.select(target)
+                self._select(target)
+            return
 
-            self.repaint()
+        if utils.shift_held():
+            # shift drag on empty space selects everything within the band
+            self._band = QRect(evt.pos(), evt.pos())
             return
 
         n = internal.Node(x - internal.Node.DefaultSize / 2, y - internal.Node.DefaultSize / 2)
-        self._model.add_nodes(n)
-
         selected = self._model.selected
-        if selected:
-            self._model.add_edge(selected, n)
-            if selected.shape == internal.Node.ShapeSquare:
-                n.shape = internal.Node.ShapeCircle
 
-        if not utils.control_held():
-            self._model.select(n)
-
-        Undo.add_undo("create node", [
-            partial(self._model.remove_nodes, [n]),
-            partial(self._model.select, selected),
-            partial(self.repaint),
-        ])
-
-        self.repaint()
+        with Undo.group("create node", refresh=self.invalidate):
+            self._model.add_nodes(n)
+            self._invalidate_node(n, edges=False)
+            Undo.add(Call("add node", [
+                partial(self._model.remove_nodes, [n]),
+            ], redo=[
+                partial(self._model.add_nodes, n),
+            ]))
+
+            if selected:
+                self._model.add_edge(selected, n)
+                if selected.shape == internal.Node.ShapeSquare:
+                    n.shape = internal.Node.ShapeCircle
+                self._invalidate_edge(selected, n)
+                Undo.add(Call("add edge", [
+                    partial(self._model.remove_edge, selected, n),
+                ], redo=[
+                    partial(self._model.add_edge, selected, n),
+                ]))
+
+            if not utils.control_held():
+                self._select(n)
+                Undo.add(Call("select", [
+                    partial(self._model.select, selected),
+                ], redo=[
+                    partial(self._model.select, n),
+                ]))
 
     def _click_coords(self, evt):
         """
 
         :param evt: mouse click event
-        :return: int, int
+        :return: float, float (in graph coordinates)
         """
         p = evt.pos()
-        return p.x(), p.y()
+        return self._viewport.to_world(p.x(), p.y())
 
     def __on_click(self, evt):
         """Handle when the widget is clicked
@@ -153,22 +766,86 @@ class Canvas(widgets.Panel):
             return self._on_left_click(evt)
         if evt.button() == Qt.RightButton:
             return self._on_right_click(evt)
+        if evt.button() == Qt.MiddleButton:
+            p = evt.pos()
+            self._panning = (p.x(), p.y())
 
-    def paint(self, p):
+    def paint(self, p, rect=None, clip=None):
         """
 
         :param p:
+        :param rect: QRect, only draw within this area of the widget
+        :param clip: QRegion, if given only pixels within this region are touched
 
         """
+        vp = self._viewport
+        if rect is None:
+            rect = self.rect()
+
+        p.save()
+        if clip is not None:
+            p.setClipRegion(clip)
+        else:
+            p.setClipRect(rect)
+
         # draw background
-        utils.set_pen(p, consts.COLOUR_ANTI_DEFAULT)
-        p.drawRect(
-            0, self._toolbar.height(),
-            self.width(), self.height() - self._toolbar.height()
+        p.fillRect(rect, QColor(*consts.COLOUR_ANTI_DEFAULT))
+
+        # order the model to draw itself (only what is in rect) & pass it the painter
+        x0, y0 = vp.to_world(rect.left() - 1, rect.top() - 1)
+        x1, y1 = vp.to_world(rect.right() + 1, rect.bottom() + 1)
+
+        p.scale(vp.scale, vp.scale)
+        p.translate(-vp.x, -vp.y)
+        drawn = self._model.paint(p, (x0, y0, x1, y1), vp.scale)
+        p.restore()
+        return drawn
+
+    def _overlay_pos(self):
+        return 5, self._toolbar.height() + 5
+
+    def _render(self):
+        """Bring our cached render of the graph up to date, redrawing all of it if the view
+        has changed or only the dirty area if not.
+
+        :return: int, int (nodes & edges drawn)
+
+        """
+        vp = self._viewport
+        dpr = self.devicePixelRatioF()
+        key = (
+            self.width(), self.height(), dpr, vp.x, vp.y, vp.scale,
+            consts.COLOUR_DEFAULT, consts.COLOUR_ANTI_DEFAULT,
         )
 
-        # order the model to draw itself & pass it the painter
-        self._model.paint(p)
+        region = self._dirty
+        if self._cache is None or key != self._cache_key:
+            self._cache = QPixmap(int(self.width() * dpr), int(self.height() * dpr))
+            self._cache.setDevicePixelRatio(dpr)
+            self._cache_key = key
+            region = QRegion(self.rect())
+            self.view_changed.emit()
+
+        self._dirty = QRegion()
+        if region.isEmpty():
+            return 0, 0
+
+        p = QPainter()
+        p.begin(self._cache)
+
+        rects = region.rects()
+        if len(rects) > self._MAX_DIRTY_RECTS:
+            drawn = self.paint(p, region.boundingRect(), region)
+        else:
+            nodes = edges = 0
+            for rect in rects:
+                n, e = self.paint(p, rect)
+                nodes += n
+                edges += e
+            drawn = nodes, edges
+
+        p.end()
+        return drawn
 
     def paintEvent(self, evt):
         """Called by Qt when we need to draw this widget
@@ -177,7 +854,20 @@ class Canvas(widgets.Panel):
             evt:
 
         """
+        start = time.perf_counter()
+        nodes, edges = self._render()
+        taken = time.perf_counter() - start
+
         paint = QPainter()
         paint.begin(self)
-        self.paint(paint)
+        paint.drawPixmap(0, 0, self._cache)
+
+        if self._band is not None:
+            utils.set_pen(paint, consts.COLOUR_SELECTED)
+            paint.drawRect(self._band.normalized())
+
+        if self._profiler.enabled:
+            self._profiler.record(taken, nodes, edges)
+            self._profiler.paint(paint, *self._overlay_pos())
+
         paint.end()
@@ -1,9 +1,12 @@
 import uuid
 
 from conversation.ui.widgets import utils
+from conversation.ui.widgets.internal.spatial import SpatialGrid
+from conversation.ui.widgets.internal.search import SearchIndex
 from conversation.ui.manifest import *
 from conversation.ui import constants as consts
 from conversation.ui.events import Events
+from conversation.ui.trace import Tracer, Debug
 from conversation.domain.models import Graph as DGraph
 from conversation.domain.models import Node as DNode
 from conversation.domain.actions import get_action_by_name
@@ -22,10 +25,35 @@ class NodeGraph:
 
     def __init__(self):
         self._nodes = {}
+
+        # edges by key (see _edge_key) -> (node, node), & the keys of the edges
+        # touching each node by node id. Edges are dropped as soon as either node is.
         self._edges = {}
+        self._incident = {}
+
+        # spatial index of nodes by their x, y for hit testing, & the size of the
+        # largest node indexed (nodes span this far past where they're indexed)
+        self._index = SpatialGrid()
+        self._max_size = Node.DefaultSize
+
+        # spatial index of edge keys by the bounds of the line drawn for them, rebuilt
+        # lazily when nodes move
+        self._edge_index = SpatialGrid()
+        self._edge_index_valid = False
 
+        # full text index of node text, flags & state
+        self._search = SearchIndex()
+        self._highlighted = []
+
+        # selected nodes by id, in the order they were selected. The last one selected
+        # is the 'primary' selection shown in property panels
+        self._selection = {}
         self._last_selected = None
 
+        # ids of nodes & keys of edges added, changed or removed since take_changes
+        self._changed = set()
+        self._changed_edges = set()
+
     def to_domain_graph(self) -> DGraph:
         g = DGraph()
 
@@ -37,14 +65,27 @@ class NodeGraph:
 
         return g
 
-    def set_domain_graph(self, g):
+    def set_domain_graph(self, g, select=True):
         self._nodes = {}
         self._edges = {}
+        self._incident = {}
+        self._index.clear()
+        self._max_size = Node.DefaultSize
+        self._search.clear()
+        self._highlighted = []
+        self._edge_index_valid = False
+        self._selection = {}
         self._last_selected = None
+        self._changed = set()
+        self._changed_edges = set()
 
         for n in g.nodes:
             graph_node = Node.from_domain_node(n)
+            graph_node.parent = self
             self._nodes[n.id] = graph_node
+            self._index.insert(graph_node, graph_node.x, graph_node.y)
+            self._max_size = max(self._max_size, graph_node.size)
+            self._search.update(graph_node.id, SearchIndex.fields(graph_node))
 
             if graph_node.root_node:
                 self._last_selected = graph_node
@@ -58,31 +99,160 @@ class NodeGraph:
 
             self.add_edge(na, nb)
 
-        if self._last_selected:
+        if self._last_selected and select:
             self.select(self._last_selected)
 
+        self._changed_edges.clear()  # nothing has changed since the graph was loaded
+
+    def snapshot(self):
+        """Return a copy of the graph's structure & positions as plain data, safe to
+        hand to another thread.
+
+        :return: [(id, number, is reply, x, y)], [(id, id)]
+
+        """
+        nodes = [
+            (n.id, n.number, n.shape == Node.ShapeCircle, n.x, n.y) for n in self._nodes.values()
+        ]
+        edges = [(a.id, b.id) for a, b in self._edges.values()]
+        return nodes, edges
+
+    def move_nodes(self, positions):
+        """Move many nodes at once, ids that are no longer in the graph are ignored.
+
+        :param positions: dict id -> (x, y)
+
+        """
+        for id_, (x, y) in positions.items():
+            node = self._nodes.get(id_)
+            if node:
+                node.move_to(x, y)
+
+    def take_changes(self) -> dict:
+        """Return the nodes & edges added, changed or removed since the last call, as
+        plain data safe to hand to another thread. Only what changed is touched.
+
+        :return: dict with
+            nodes: [encoded node] added or changed
+            removed: [node id]
+            edges: [[id, id]] added
+            unlinked: [[id, id]] removed
+
+        """
+        nodes, removed = [], []
+        for id_ in self._changed:
+            n = self._nodes.get(id_)
+            if n is None:
+                removed.append(id_)
+            else:
+                nodes.append(n.to_domain_node().copy().encode())
+
+        edges, unlinked = [], []
+        for key in self._changed_edges:
+            if key in self._edges:
+                edges.append(list(key))
+            else:
+                unlinked.append(list(key))
+
+        self._changed = set()
+        self._changed_edges = set()
+        return {"nodes": nodes, "removed": removed, "edges": edges, "unlinked": unlinked}
+
+    def mark_changed(self, ids=(), edges=()):
+        """Have the given nodes & edges returned by the next take_changes
+
+        :param ids: node ids
+        :param edges: edge keys (id, id)
+
+        """
+        self._changed.update(ids)
+        self._changed_edges.update(edges)
+
+    @property
+    def max_node_size(self) -> int:
+        """Return the size of the largest node added, nodes are indexed by their top
+        left corner so areas searched for nodes should be grown by this.
+
+        :return: int
+
+        """
+        return self._max_size
+
     @property
     def selected(self):
         return self._last_selected
 
+    @property
+    def selection(self) -> list:
+        """Return all selected nodes, the primary (last) selection last
+
+        :return: list
+
+        """
+        return list(self._selection.values())
+
+    def is_selected(self, node) -> bool:
+        return node.id in self._selection
+
     def nodes(self):
         for a in self._nodes.values():
             yield a
 
     def select(self, node):
-        """Mark a node as 'selected'
+        """Mark a node as 'selected', deselecting everything else
 
         :param node:
 
         """
-        print(len(self._edges), len(self._nodes))
-        if self._last_selected:
-            self._last_selected.selected = False
+        Tracer.record("NodeGraph.select", Debug, "%s edges %s nodes", len(self._edges), len(self._nodes))
+        self.select_many([node] if node else [])
+
+    def select_many(self, nodes, add=False):
+        """Select all of the given nodes, the last becomes the primary selection.
 
-        self._last_selected = node
-        if node:
-            node.selected = True
-            Events.NodeSelected.emit(node)
+        :param nodes: list of Node
+        :param add: add to the current selection rather than replacing it
+
+        """
+        if not add:
+            for n in self._selection.values():
+                n.selected = False
+            self._selection = {}
+
+        for n in nodes:
+            n.selected = True
+            self._selection.pop(n.id, None)  # re-selecting moves a node to the end
+            self._selection[n.id] = n
+
+        self._selection_changed(nodes[-1] if nodes else (self._last_selected if add else None))
+
+    def toggle(self, node):
+        """Add the given node to the selection, or remove it if it's already selected
+
+        :param node:
+
+        """
+        if node.id in self._selection:
+            node.selected = False
+            del self._selection[node.id]
+
+            primary = self._last_selected
+            if primary is node:
+                primary = next(reversed(self._selection.values()), None)
+            self._selection_changed(primary)
+        else:
+            self.select_many([node], add=True)
+
+    def _selection_changed(self, primary):
+        """Update the primary selection & tell everyone what is now selected
+
+        :param primary: Node or None
+
+        """
+        self._last_selected = primary
+        if primary:
+            Events.NodeSelected.emit(primary)
+        Events.SelectionChanged.emit(self.selection)
 
     def edges(self):
         """Return edges as a list of (node, node) tuple(s)
@@ -90,23 +260,85 @@ class NodeGraph:
         :return: generator
 
         """
-        trimmed = {}
-        for key, (a, b) in self._edges.items():
-            nodea = self._nodes.get(a)
-            nodeb = self._nodes.get(b)
+        for a, b in list(self._edges.values()):
+            yield a, b
+
+    def object_at(self, x, y):
+        """Return the node at the given point, if more than one node is there we return
+        the closest.
+
+        :param x:
+        :param y:
+        :return: Node or None
 
-            if not all([nodea, nodeb]):
-                continue  # edge is now invalid -> don't return it
+        """
+        b = Node.HitRadius
+        best = None
+        best_distance = None
+        for node in self._index.query(x - b, y - b, x + b, y + b):
+            if not node.contains(x, y):
+                continue
 
-            trimmed[key] = (a, b)  # still a valid edge, so we wont remove it
-            yield nodea, nodeb
-        self._edges = trimmed
+            distance = (node.x - x) ** 2 + (node.y - y) ** 2
+            if best is None or distance < best_distance:
+                best = node
+                best_distance = distance
+        return best
 
-    def object_at(self, x, y):
-        for node in self._nodes.values():
-            if node.contains(x, y):
-                return node
-        return None
+    def objects_in(self, x0, y0, x1, y1):
+        """Return all nodes whose x, y fall within the given rect.
+
+        :return: generator
+
+        """
+        return self._index.query(min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+
+    def _node_moved(self, node):
+        """Called by a node when it's position changes.
+
+        :param node:
+
+        """
+        if node in self._index:
+            self._index.insert(node, node.x, node.y)
+            self._changed.add(node.id)
+
+            if self._edge_index_valid:
+                for key in self._incident.get(node.id, ()):
+                    self._edge_index.insert(key, *self.edge_bounds(*self._edges[key]))
+
+    def _node_edited(self, node):
+        """Called by a node when any of it's fields change.
+
+        :param node:
+
+        """
+        if node.id in self._nodes:
+            self._search.update(node.id, SearchIndex.fields(node))
+            self._changed.add(node.id)
+
+    def search(self, query, limit=None) -> list:
+        """Return nodes whose text, flags or state start with the words of the
+        given query, best matches first.
+
+        :param query: str
+        :param limit: max results
+        :return: list of Node
+
+        """
+        return [self._nodes[id_] for id_, _ in self._search.search(query, limit=limit)]
+
+    def highlight(self, nodes):
+        """Highlight the given nodes (only), eg. search results
+
+        :param nodes: list of Node
+
+        """
+        for n in self._highlighted:
+            n.highlighted = False
+        for n in nodes:
+            n.highlighted = True
+        self._highlighted = list(nodes)
 
     def add_nodes(self, value):
         if not isinstance(value, list):
@@ -119,54 +351,244 @@ class NodeGraph:
             n.parent = self
             n.number = len(self._nodes)
             self._nodes[n.id] = n
+            self._index.insert(n, n.x, n.y)
+            self._max_size = max(self._max_size, n.size)
+            self._search.update(n.id, SearchIndex.fields(n))
+            self._changed.add(n.id)
+
+    def remove_nodes(self, value) -> list:
+        """Remove nodes & all of their edges
 
-    def remove_nodes(self, value):
+        :param value: Node or list of Node
+        :return: list of (node, node), the edges removed
+
+        """
         if not isinstance(value, list):
             value = [value]
 
-        selected_id = None
-        if self.selected:
-            selected_id = self.selected.id
-
+        removed = []
+        deselected = False
         for n in value:
-            if n.id == selected_id:
-                self.select(None)
+            if n.id in self._selection:
+                n.selected = False
+                del self._selection[n.id]
+                deselected = True
 
             try:
                 del self._nodes[n.id]
             except KeyError:
                 pass
+            self._index.remove(n)
+            self._search.remove(n.id)
+            self._changed.add(n.id)
+            self._changed_edges.update(self._incident.get(n.id, ()))
+
+            for key in self._incident.pop(n.id, ()):
+                a, b = self._edges.pop(key)
+                other = b if a is n else a
+                self._incident.get(other.id, set()).discard(key)
+                self._edge_index.remove(key)
+                removed.append((a, b))
+
+        if deselected:
+            primary = self._last_selected
+            if primary and primary.id not in self._selection:
+                primary = next(reversed(self._selection.values()), None)
+            self._selection_changed(primary)
+
+        return removed
+
+    def restore_nodes(self, value, edges=()):
+        """Put back nodes removed by remove_nodes, as they were (unlike add_nodes,
+        which numbers nodes as new).
+
+        :param value: list of Node
+        :param edges: list of (node, node), as returned by remove_nodes
+
+        """
+        for n in value:
+            n.parent = self
+            self._nodes[n.id] = n
+            self._index.insert(n, n.x, n.y)
+            self._max_size = max(self._max_size, n.size)
+            self._search.update(n.id, SearchIndex.fields(n))
+            self._changed.add(n.id)
+
+        for a, b in edges:
+            self.add_edge(a, b)
 
     @staticmethod
     def _edge_key(a, b):
-        return ":".join(sorted([a.id, b.id]))
+        return (a.id, b.id) if a.id < b.id else (b.id, a.id)
+
+    def has_edge(self, a, b) -> bool:
+        return self._edge_key(a, b) in self._edges
 
     def add_edge(self, a, b):
         edge_key = self._edge_key(a, b)
-        self._edges[edge_key] = [a.id, b.id]
+        self._edges[edge_key] = (a, b)
+        self._incident.setdefault(a.id, set()).add(edge_key)
+        self._incident.setdefault(b.id, set()).add(edge_key)
+        self._changed_edges.add(edge_key)
+
+        if self._edge_index_valid:
+            self._edge_index.insert(edge_key, *self.edge_bounds(a, b))
 
     def remove_edge(self, a, b):
         edge_key = self._edge_key(a, b)
-        try:
-            del self._edges[edge_key]
-        except KeyError:
-            pass
+        if self._edges.pop(edge_key, None) is None:
+            return
+
+        self._incident[a.id].discard(edge_key)
+        self._incident[b.id].discard(edge_key)
+        self._changed_edges.add(edge_key)
+        self._edge_index.remove(edge_key)
+
+    @staticmethod
+    def edge_bounds(a, b):
+        """Return the bounding rect of the line drawn between two nodes
+
+        :return: x0, y0, x1, y1
+
+        """
+        ax, ay = a.x + a.size / 2, a.y + a.size / 2
+        bx, by = b.x + b.size / 2, b.y + b.size / 2
+        return min(ax, bx), min(ay, by), max(ax, bx), max(ay, by)
+
+    def node_edges(self, node):
+        """Return the nodes connected to the given node
+
+        :param node:
+        :return: generator of Node
+
+        """
+        for key in self._incident.get(node.id, ()):
+            a, b = self._edges[key]
+            yield b if a is node else a
+
+    def _visible_edges(self, x0, y0, x1, y1):
+        """Return edges whose line bounds intersect the given rect
+
+        :return: generator of (node, node)
+
+        """
+        if not self._edge_index_valid:
+            self._edge_index.clear()
+            for key, (a, b) in self._edges.items():
+                self._edge_index.insert(key, *self.edge_bounds(a, b))
+            self._edge_index_valid = True
+
+        edges = self._edges
+        for key in self._edge_index.query(x0, y0, x1, y1):
+            yield edges[key]
+
+    def _visible_nodes(self, x0, y0, x1, y1):
+        """Return nodes that would draw something within the given rect
+
+        :return: generator of Node
 
-    def paint(self, p):
         """
+        # nodes are indexed by their top left corner, but draw their text above & to the left
+        # of that & their shape below & to the right
+        margin = self._max_size * 2 + Node.HitRadius
+        for node in self._index.query(x0 - margin, y0 - margin, x1 + margin, y1 + margin):
+            yield node
+
+    # below this scale node text isn't drawn
+    TextScale = 0.5
+
+    # below this scale nodes are drawn as points
+    PointScale = 0.15
+
+    def paint(self, p, rect=None, scale=1.0):
+        """Draw the graph, batching primitives so that each pen is set once &
+        all shapes drawn with it go in a single call.
 
         :param p: QPainter
+        :param rect: only draw what intersects this (x0, y0, x1, y1) rect
+        :param scale: current zoom, used to decide the level of detail
+        :return: int, int (nodes & edges drawn)
 
         """
-        utils.set_pen(p, consts.COLOUR_DEFAULT)
-        for ea, eb in self.edges():
-            p.drawLine(
+        if rect:
+            edge_iter = self._visible_edges(*rect)
+            node_iter = self._visible_nodes(*rect)
+        else:
+            edge_iter = self.edges()
+            node_iter = self.nodes()
+
+        lines = [
+            QLineF(
                 ea.x + ea.size/2, ea.y + ea.size/2,
                 eb.x + eb.size/2, eb.y + eb.size/2
-            )
+            ) for ea, eb in edge_iter
+        ]
+        if lines:
+            utils.set_pen(p, consts.COLOUR_DEFAULT)
+            p.drawLines(lines)
+
+        # group nodes by the colour they're drawn in
+        groups = {}
+        for node in node_iter:
+            groups.setdefault(node.colour, []).append(node)
+
+        nodes = sum(len(g) for g in groups.values())
+        if scale < self.PointScale:
+            self._paint_points(p, groups)
+        else:
+            self._paint_shapes(p, groups, scale >= self.TextScale)
 
-        for node in self.nodes():
-            node.paint(p)
+        return nodes, len(lines)
+
+    @staticmethod
+    def _paint_points(p, groups):
+        """Draw each node as a single point
+
+        :param p: QPainter
+        :param groups: colour -> [node]
+
+        """
+        for colour, nodes in groups.items():
+            pen = QPen(QColor(*colour))
+            pen.setWidth(3)
+            pen.setCosmetic(True)  # don't scale the point size with the zoom
+            p.setPen(pen)
+            p.drawPoints(QPolygonF([
+                QPointF(n.x + n.size / 2, n.y + n.size / 2) for n in nodes
+            ]))
+
+    @staticmethod
+    def _paint_shapes(p, groups, with_text):
+        """Draw node outlines as one path per colour, filled with the background
+        so edges don't show through.
+
+        :param p: QPainter
+        :param groups: colour -> [node]
+        :param with_text: if node text should be drawn
+
+        """
+        background = QColor(*consts.COLOUR_ANTI_DEFAULT)
+
+        for colour, nodes in groups.items():
+            path = QPainterPath()
+            path.setFillRule(Qt.WindingFill)
+            for n in nodes:
+                if n.shape == Node.ShapeCircle:
+                    path.addEllipse(QPointF(n.x + n.size / 2, n.y + n.size / 2), n.size / 2, n.size / 2)
+                else:
+                    path.addRect(QRectF(n.x, n.y, n.size, n.size))
+
+            p.setPen(QColor(*colour))
+            p.setBrush(background)
+            p.drawPath(path)
+
+            if not with_text:
+                continue
+
+            for n in nodes:
+                label = n.label
+                if label:
+                    p.drawText(n.text_rect, Qt.AlignLeft, label)
 
 
 class Node:
@@ -187,8 +609,13 @@ class Node:
     _TextHeight = 20
     _Buffer = 30
 
+    # how far from a click a node's x, y may be & still count as being clicked
+    HitRadius = _Buffer
+
     def __init__(self, x=0, y=0, number=0, shape=ShapeSquare):
+        self.parent = None
         self.selected = False
+        self.highlighted = False
         self._shape = shape
 
         self._node = DNode(x=x, y=y, size=self.DefaultSize)
@@ -214,12 +641,14 @@ class Node:
             if (name, val) in self._node.actions:
                 continue
             else:
-                self._node.add_action(name, value)
+                self._node.add_action(name, val)
 
-        for (name, val) in self._node.actions:
+        for (name, val) in list(self._node.actions):
             if (name, val) not in value:
                 self._node.remove_action(name, val)
 
+        self._edited()
+
     @property
     def text(self) -> str:
         return self._node.text
@@ -227,6 +656,11 @@ class Node:
     @text.setter
     def text(self, value):
         self._node.text = value
+        self._edited()
+
+    def _edited(self):
+        if self.parent:
+            self.parent._node_edited(self)
 
     @property
     def _size(self) -> int:
@@ -283,6 +717,7 @@ class Node:
     @root_node.setter
     def root_node(self, value):
         self._node.root_node = value
+        self._edited()
 
     @property
     def requires_user(self):
@@ -291,6 +726,7 @@ class Node:
     @requires_user.setter
     def requires_user(self, value):
         self._node.conditions.user_required = value
+        self._edited()
 
     @property
     def requires_flag(self):
@@ -299,6 +735,7 @@ class Node:
     @requires_flag.setter
     def requires_flag(self, value):
         self._node.conditions.flag_required = value
+        self._edited()
 
     @property
     def requires_state(self):
@@ -307,6 +744,7 @@ class Node:
     @requires_state.setter
     def requires_state(self, value):
         self._node.conditions.state_required = value
+        self._edited()
 
     def to_domain_node(self) -> DNode:
         """Convert this node into a domain node
@@ -316,62 +754,60 @@ class Node:
         """
         return self._node
 
-    def _set_shape_colour(self, p):
+    @property
+    def colour(self) -> tuple:
         """Decide what colour this shape should be
 
-        :param p:
+        :return: (r, g, b)
 
         """
-        utils.set_pen(p, consts.COLOUR_DEFAULT)
         if self.selected:
-            utils.set_pen(p, consts.COLOUR_SELECTED)
+            return consts.COLOUR_SELECTED
+        elif self.highlighted:
+            return consts.COLOUR_HIGHLIGHT
         elif self.root_node:
-            utils.set_pen(p, consts.COLOUR_BEGIN)
+            return consts.COLOUR_BEGIN
+        return consts.COLOUR_DEFAULT
+
+    @property
+    def label(self) -> str:
+        """Return our text, truncated to fit above the node
+
+        :return: str
 
-    def paint(self, p):
         """
+        t = self.text
+        if len(t) > self._Buffer:
+            t = t[:self._Buffer] + ".."
+        return t
 
-        :param p: QPainter
+    @property
+    def text_rect(self):
+        """Return where our label is drawn
+
+        :return: QRectF
 
         """
-        if self.shape == self.ShapeCircle:
-            self._set_shape_colour(p)
-            p.drawEllipse(
-                QPoint(self.x + self.size / 2, self.y + self.size / 2),
-                self.size / 2,
-                self.size / 2
-            )
-
-            utils.set_pen(p, consts.COLOUR_ANTI_DEFAULT)
-            p.drawEllipse(
-                QPoint(self.x + self.size / 2, self.y + self.size / 2),
-                self.size / 2 - 1,
-                self.size / 2 - 1
-            )
-        else:
-            utils.set_pen(p, consts.COLOUR_ANTI_DEFAULT)
-            p.drawRect(self.x, self.y, self.size, self.size)
-
-            self._set_shape_colour(p)
-            utils.draw_hollow_rect(p, self.x, self.y, self.size, self.size)
-
-        if self.text:
-            self._set_shape_colour(p)
-
-            t = self.text
-            if len(t) > self._Buffer:
-                t = t[:self._Buffer] + ".."
-
-            p.drawText(
-                QRect(
-                    self.x - self._Buffer/2,
-                    self.y - self._TextHeight,
-                    self._size + self._Buffer,
-                    self._TextHeight
-                ),
-                Qt.AlignLeft,
-                t
-            )
+        return QRectF(
+            self.x - self._Buffer/2,
+            self.y - self._TextHeight,
+            self._size + self._Buffer,
+            self._TextHeight
+        )
+
+    @property
+    def bounds(self):
+        """Return the area this node draws over, including it's label
+
+        :return: x0, y0, x1, y1
+
+        """
+        return (
+            self.x - self._Buffer / 2 - 1,
+            self.y - self._TextHeight - 1,
+            self.x + self._size + self._Buffer / 2 + 1,
+            self.y + self.size + 1,
+        )
 
     def contains(self, x, y):
         """
@@ -387,6 +823,9 @@ class Node:
         self.x = x
         self.y = y
 
+        if self.parent:
+            self.parent._node_moved(self)
+
     @property
     def size(self):
         return self._size
@@ -395,6 +834,7 @@ class Node:
     def shape(self, value):
         self._shape = value
         self._node.type = self._type_for_shape(self._shape)
+        self._edited()
 
     @property
     def id(self):
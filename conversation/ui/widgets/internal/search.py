@@ -0,0 +1,169 @@
+import bisect
+import re
+
+from conversation.domain import actions
+
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text) -> list:
+    """Split text into lower case words
+
+    :param text: str
+    :return: list
+
+    """
+    if not text:
+        return []
+    return _WORD.findall(str(text).lower())
+
+
+class SearchIndex:
+
+    """
+    Inverted index of words to the nodes they appear in.
+
+    Nodes are indexed by id with a weight per word (how often it appears, times how
+    much the field it's in counts). The vocabulary is kept sorted so a prefix query
+    only visits the words starting with that prefix. Re-indexing a node only touches
+    the words it had & has.
+
+    """
+
+    # how much a word counts, by the field it was found in
+    WeightText = 1
+    WeightFlag = 3
+    WeightState = 2
+
+    # a query word matching a word exactly counts this many times more than a prefix match
+    ExactBonus = 2
+
+    def __init__(self):
+        self._postings = {}  # word -> {node id: weight}
+        self._words = []  # sorted vocabulary
+        self._node_words = {}  # node id -> {word: weight}
+
+    def __len__(self):
+        return len(self._node_words)
+
+    def __contains__(self, id_):
+        return id_ in self._node_words
+
+    def clear(self):
+        self._postings = {}
+        self._words = []
+        self._node_words = {}
+
+    @classmethod
+    def fields(cls, node) -> dict:
+        """Return the weighted words of a (UI) node
+
+        :param node:
+        :return: dict word -> weight
+
+        """
+        words = {}
+
+        def add(text, weight):
+            for word in tokenize(text):
+                words[word] = words.get(word, 0) + weight
+
+        add(node.text, cls.WeightText)
+        add(node.requires_flag, cls.WeightFlag)
+        for k, v in (node.requires_state or {}).items():
+            add(k, cls.WeightState)
+            add(v, cls.WeightState)
+
+        for action, value in node.actions:
+            if action is actions.AddFlag:
+                add(value, cls.WeightFlag)
+            elif not isinstance(value, bool):
+                add(value, cls.WeightState)
+
+        return words
+
+    def update(self, id_, words):
+        """Set the words a node is indexed under
+
+        :param id_: node id
+        :param words: dict word -> weight (see fields)
+
+        """
+        old = self._node_words.get(id_, {})
+        if old == words:
+            return
+
+        for word in old:
+            if word not in words:
+                self._unpost(word, id_)
+
+        for word, weight in words.items():
+            posting = self._postings.get(word)
+            if posting is None:
+                posting = self._postings[word] = {}
+                bisect.insort(self._words, word)
+            posting[id_] = weight
+
+        if words:
+            self._node_words[id_] = words
+        else:
+            self._node_words.pop(id_, None)
+
+    def remove(self, id_):
+        """Remove a node from the index
+
+        :param id_: node id
+
+        """
+        for word in self._node_words.pop(id_, {}):
+            self._unpost(word, id_)
+
+    def _unpost(self, word, id_):
+        posting = self._postings[word]
+        posting.pop(id_, None)
+        if not posting:
+            del self._postings[word]
+            del self._words[bisect.bisect_left(self._words, word)]
+
+    def _prefixed(self, prefix):
+        """Return all words starting with the given prefix
+
+        :return: generator of str
+
+        """
+        i = bisect.bisect_left(self._words, prefix)
+        while i < len(self._words) and self._words[i].startswith(prefix):
+            yield self._words[i]
+            i += 1
+
+    def search(self, query, limit=None) -> list:
+        """Return the ids of nodes matching every word of the query, where each
+        query word may be the start of a word in the node. Best matches first.
+
+        :param query: str
+        :param limit: max results
+        :return: list of (node id, score)
+
+        """
+        scores = None
+        for term in set(tokenize(query)):
+            found = {}
+            for word in self._prefixed(term):
+                bonus = self.ExactBonus if word == term else 1
+                for id_, weight in self._postings[word].items():
+                    found[id_] = found.get(id_, 0) + weight * bonus
+
+            if scores is None:
+                scores = found
+            else:
+                scores = {k: v + found[k] for k, v in scores.items() if k in found}
+
+            if not scores:
+                return []
+
+        if not scores:
+            return []
+
+        ranked = sorted(scores.items(), key=lambda i: (-i[1], i[0]))
+        return ranked[:limit] if limit else ranked
@@ -0,0 +1,117 @@
+import math
+
+
+class SpatialGrid:
+
+    """
+    Uniform grid spatial index.
+
+    Items are stored against every cell their bounding box overlaps, so looking up
+    what is at (or near) a point or within a rectangle only visits the cells covering
+    the area asked about, rather than every item.
+
+    """
+
+    def __init__(self, cell=128):
+        self._cell = cell
+        self._cells = {}  # (cx, cy) -> set(items)
+        self._bounds = {}  # item -> (x0, y0, x1, y1)
+
+    def __len__(self):
+        return len(self._bounds)
+
+    def __contains__(self, item):
+        return item in self._bounds
+
+    def clear(self):
+        self._cells = {}
+        self._bounds = {}
+
+    def _keys(self, x0, y0, x1, y1):
+        """Return the keys of all cells overlapping the given rect
+
+        :return: generator
+
+        """
+        c = self._cell
+        for cx in range(math.floor(x0 / c), math.floor(x1 / c) + 1):
+            for cy in range(math.floor(y0 / c), math.floor(y1 / c) + 1):
+                yield cx, cy
+
+    def insert(self, item, x0, y0, x1=None, y1=None):
+        """Add an item with the given bounds, if x1 / y1 are not given the item is
+        treated as a point. Inserting an item already present moves it.
+
+        :param item: any hashable
+        :param x0:
+        :param y0:
+        :param x1:
+        :param y1:
+
+        """
+        if item in self._bounds:
+            self.remove(item)
+
+        bounds = (x0, y0, x0 if x1 is None else x1, y0 if y1 is None else y1)
+        self._bounds[item] = bounds
+
+        for key in self._keys(*bounds):
+            cell = self._cells.get(key)
+            if cell is None:
+                cell = set()
+                self._cells[key] = cell
+            cell.add(item)
+
+    def remove(self, item):
+        """Remove an item, does nothing if the item isn't present
+
+        :param item:
+
+        """
+        bounds = self._bounds.pop(item, None)
+        if bounds is None:
+            return
+
+        for key in self._keys(*bounds):
+            cell = self._cells.get(key)
+            if cell is None:
+                continue
+
+            cell.discard(item)
+            if not cell:
+                del self._cells[key]
+
+    def bounds(self, item):
+        return self._bounds.get(item)
+
+    def query(self, x0, y0, x1, y1):
+        """Return all items whose bounds intersect the given rect.
+
+        :return: generator
+
+        """
+        cells = self._cells
+        bounds = self._bounds
+
+        # if the rect covers more cells than exist, walking the cells we have is cheaper
+        c = self._cell
+        area = (math.floor(x1 / c) - math.floor(x0 / c) + 1) * (math.floor(y1 / c) - math.floor(y0 / c) + 1)
+        if area > len(cells):
+            keys = (k for k in cells if x0 // c <= k[0] <= x1 // c and y0 // c <= k[1] <= y1 // c)
+        else:
+            keys = self._keys(x0, y0, x1, y1)
+
+        seen = set()
+        for key in keys:
+            cell = cells.get(key)
+            if not cell:
+                continue
+
+            for item in cell:
+                if item in seen:
+                    continue
+                seen.add(item)
+
+                bx0, by0, bx1, by1 = bounds[item]
+                if bx0 <= x1 and bx1 >= x0 and by0 <= y1 and by1 >= y0:
+                    yield item
@@ -0,0 +1,264 @@
+import math
+
+from conversation.ui import widgets
+from conversation.ui.manifest import *
+from conversation.ui.refresh import Refresher
+from conversation.ui.widgets import utils
+from conversation.ui import constants as consts
+
+
+class Minimap(widgets.ClosablePanel):
+    """The whole graph drawn small, with the area the canvas shows as a rectangle that
+    can be dragged to move the canvas.
+
+    The graph is drawn once into a cached low resolution image, after which only the
+    areas the canvas reports as changed are redrawn into it. Panning & zooming the
+    canvas only moves the rectangle drawn over the image.
+    """
+
+    _TITLE = "Minimap"
+    _MIN_WIDTH = 200
+    _MIN_HEIGHT = 150
+
+    # past this many separate dirty areas, redraw their bounding rect (clipped) in one go
+    _MAX_DIRTY_RECTS = 8
+
+    # the whole map is redrawn at most this often (ms) while the graph changes wholesale
+    # (eg. during a layout), the old image is shown in the meantime
+    _REDRAW_DELAY = 250
+
+    # fraction of the graph's size left around it, so that nodes moved or added near
+    # the edge don't need the whole map redrawn at a new scale
+    _MARGIN = 0.1
+
+    def __init__(self, parent, canvas):
+        super(Minimap, self).__init__(parent)
+        self.set_title(self._TITLE)
+        self.setMinimumSize(self._MIN_WIDTH, self._MIN_HEIGHT)
+
+        self._canvas = canvas
+
+        self._view = QWidget(self)
+        self._view.paintEvent = self.__paint
+        self._view.mousePressEvent = self.__mouse_press
+        self._view.mouseMoveEvent = self.__mouse_move
+        self._view.mouseReleaseEvent = self.__mouse_release
+        self.setWidget(self._view)
+
+        # cached render of the graph, the area of the graph it covers (x0, y0, x1, y1)
+        # & the area of the cache yet to be redrawn
+        self._cache = None
+        self._cache_key = None
+        self._bounds = None
+        self._dirty = QRegion()
+
+        self._redraw = QTimer(self)
+        self._redraw.setSingleShot(True)
+        self._redraw.setInterval(self._REDRAW_DELAY)
+        self._redraw.timeout.connect(self.__redraw)
+
+        # offset from the centre of the view rect to where it was grabbed, while dragging
+        self._grab = None
+
+        canvas.world_changed.connect(self.__world_changed)
+        canvas.view_changed.connect(self.__view_changed)
+
+    def on_close(self):
+        self._canvas.world_changed.disconnect(self.__world_changed)
+        self._canvas.view_changed.disconnect(self.__view_changed)
+
+    @property
+    def default_dock_widget_area(self):
+        """Return where this widget should be placed by default, relative to
+        the dock widget it belongs to.
+
+        Returns:
+            int
+        """
+        return Qt.RightDockWidgetArea
+
+    def __world_changed(self, rect):
+        """Called when an area of the graph changes, or all of it (if rect is None)
+
+        :param rect: (x0, y0, x1, y1)
+
+        """
+        if self._cache is None:
+            return  # a full redraw is already due
+
+        bx0, by0, bx1, by1 = self._bounds
+        if rect is None or rect[0] < bx0 or rect[1] < by0 or rect[2] > bx1 or rect[3] > by1:
+            if not self._redraw.isActive():
+                self._redraw.start()
+            return
+
+        sx0, sy0 = self._to_map(rect[0], rect[1])
+        sx1, sy1 = self._to_map(rect[2], rect[3])
+        area = QRect(
+            math.floor(sx0) - 2,
+            math.floor(sy0) - 2,
+            math.ceil(sx1 - sx0) + 5,
+            math.ceil(sy1 - sy0) + 5,
+        )
+        self._dirty = self._dirty.united(area)
+        Refresher.request(self._view, area)
+
+    def __view_changed(self):
+        Refresher.request(self._view)
+
+    def __redraw(self):
+        self._cache = None
+        Refresher.request(self._view)
+
+    def _scale(self) -> float:
+        bx0, by0, bx1, by1 = self._bounds
+        return min(self._view.width() / (bx1 - bx0), self._view.height() / (by1 - by0))
+
+    def _to_map(self, x, y):
+        bx0, by0, _, _ = self._bounds
+        scale = self._scale()
+        return (x - bx0) * scale, (y - by0) * scale
+
+    def _to_world(self, sx, sy):
+        bx0, by0, _, _ = self._bounds
+        scale = self._scale()
+        return sx / scale + bx0, sy / scale + by0
+
+    def _graph_bounds(self):
+        """Return the area of the graph to draw, the extent of all nodes plus a margin
+        sized to fit the shape of the widget.
+
+        :return: (x0, y0, x1, y1)
+
+        """
+        xs = []
+        ys = []
+        for n in self._canvas.model.nodes():
+            xs.append(n.x)
+            ys.append(n.y)
+
+        if not xs:
+            xs, ys = [0], [0]
+
+        size = max(1.0, max(xs) - min(xs), max(ys) - min(ys)) * self._MARGIN + 50
+        x0, y0 = min(xs) - size, min(ys) - size
+        x1, y1 = max(xs) + size, max(ys) + size
+
+        # grow the short side so the graph is centred
+        w, h = max(1, self._view.width()), max(1, self._view.height())
+        if (x1 - x0) / w > (y1 - y0) / h:
+            pad = ((x1 - x0) * h / w - (y1 - y0)) / 2
+            y0, y1 = y0 - pad, y1 + pad
+        else:
+            pad = ((y1 - y0) * w / h - (x1 - x0)) / 2
+            x0, x1 = x0 - pad, x1 + pad
+
+        return x0, y0, x1, y1
+
+    def _render(self):
+        """Bring the cached render of the graph up to date, drawing all of it only if
+        the graph, widget size or colours changed wholesale.
+        """
+        key = (self._view.width(), self._view.height(), consts.COLOUR_DEFAULT, consts.COLOUR_ANTI_DEFAULT)
+
+        region = self._dirty
+        if self._cache is None or key != self._cache_key:
+            self._redraw.stop()  # we're about to
+            self._bounds = self._graph_bounds()
+            self._cache = QPixmap(self._view.width(), self._view.height())
+            self._cache_key = key
+            region = QRegion(self._view.rect())
+
+        self._dirty = QRegion()
+        region = region.intersected(self._view.rect())
+        if region.isEmpty():
+            return
+
+        rects = region.rects()
+        if len(rects) > self._MAX_DIRTY_RECTS:
+            rects = [region.boundingRect()]
+
+        p = QPainter()
+        p.begin(self._cache)
+        p.setClipRegion(region)
+        for rect in rects:
+            self.paint(p, rect)
+        p.end()
+
+    def paint(self, p, rect):
+        """Draw the area of the graph under the given rect of the widget
+
+        :param p: QPainter
+        :param rect: QRect
+
+        """
+        bx0, by0, _, _ = self._bounds
+        scale = self._scale()
+        x0, y0 = self._to_world(rect.left() - 1, rect.top() - 1)
+        x1, y1 = self._to_world(rect.right() + 1, rect.bottom() + 1)
+
+        # everything is drawn when the whole map is, so skip the spatial lookups
+        area = None if rect.contains(self._view.rect()) else (x0, y0, x1, y1)
+
+        p.save()
+        p.fillRect(rect, QColor(*consts.COLOUR_ANTI_DEFAULT))
+        p.scale(scale, scale)
+        p.translate(-bx0, -by0)
+        self._canvas.model.paint(p, area, scale)
+        p.restore()
+
+    def _view_rect(self) -> QRectF:
+        """Return the area the canvas shows, in our coordinates
+
+        :return: QRectF
+
+        """
+        x0, y0, x1, y1 = self._canvas.visible()
+        sx0, sy0 = self._to_map(x0, y0)
+        sx1, sy1 = self._to_map(x1, y1)
+        return QRectF(sx0, sy0, sx1 - sx0, sy1 - sy0)
+
+    def __paint(self, evt):
+        self._render()
+
+        p = QPainter()
+        p.begin(self._view)
+        p.drawPixmap(0, 0, self._cache)
+        utils.set_pen(p, consts.COLOUR_SELECTED)
+        p.drawRect(self._view_rect())
+        p.end()
+
+    def __mouse_press(self, evt):
+        """Grab the view rect, or centre the view where clicked & grab it there
+
+        :param evt:
+
+        """
+        if evt.button() != Qt.LeftButton or self._bounds is None:
+            return
+
+        rect = self._view_rect()
+        pos = QPointF(evt.pos())
+        if rect.contains(pos):
+            self._grab = pos - rect.center()
+        else:
+            self._grab = QPointF(0, 0)
+            self.__move_view(pos)
+
+    def __mouse_move(self, evt):
+        if self._grab is not None:
+            self.__move_view(QPointF(evt.pos()))
+
+    def __mouse_release(self, evt):
+        self._grab = None
+
+    def __move_view(self, pos):
+        """Centre the canvas on the graph under the given point, less where the view
+        rect was grabbed
+
+        :param pos: QPointF
+
+        """
+        centre = pos - self._grab
+        self._canvas.center_on(*self._to_world(centre.x(), centre.y()))
+        Refresher.request(self._view)
@@ -0,0 +1,121 @@
+import collections
+import csv
+import time
+
+from conversation.ui.manifest import *
+from conversation.ui.widgets import utils
+from conversation.ui import constants as consts
+from conversation.ui.refresh import Refresher
+
+
+class FrameProfiler(object):
+    """Records how long each paint of a widget takes & what was drawn, keeping a
+    rolling history that can be drawn as an overlay or exported to CSV.
+    """
+
+    _HISTORY = 1000
+    _LINE_HEIGHT = 15
+    _WIDTH = 220
+
+    def __init__(self):
+        self.enabled = False
+        self._frames = collections.deque(maxlen=self._HISTORY)
+
+    def record(self, seconds, nodes, edges):
+        """Record a frame.
+
+        Args:
+            seconds (float): time taken to paint
+            nodes (int): nodes drawn
+            edges (int): edges drawn
+        """
+        self._frames.append((time.time(), seconds, nodes, edges))
+
+    def clear(self):
+        self._frames.clear()
+
+    @property
+    def fps(self):
+        """Return the number of repaints in the last second.
+
+        Returns:
+            int
+        """
+        cutoff = time.time() - 1
+        count = 0
+        for frame in reversed(self._frames):
+            if frame[0] < cutoff:
+                break
+            count += 1
+        return count
+
+    def summary(self):
+        """Return the last frame & the average / worst paint time over the history.
+
+        Returns:
+            dict
+        """
+        if not self._frames:
+            return {}
+
+        times = [f[1] for f in self._frames]
+        _, seconds, nodes, edges = self._frames[-1]
+        return {
+            "paint_ms": seconds * 1000,
+            "avg_ms": sum(times) / len(times) * 1000,
+            "max_ms": max(times) * 1000,
+            "nodes": nodes,
+            "edges": edges,
+            "fps": self.fps,
+            "dropped": Refresher.dropped,
+        }
+
+    def export_csv(self, path):
+        """Write the frame history to the given file.
+
+        Args:
+            path (str):
+        """
+        with open(path, "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(["time", "paint_seconds", "nodes", "edges"])
+            for row in self._frames:
+                w.writerow(row)
+
+    def rect(self, x, y):
+        """Return the area the overlay covers when drawn at x, y
+
+        Returns:
+            QRect
+        """
+        return QRect(x, y, self._WIDTH + 1, self._LINE_HEIGHT * 4 + 5)
+
+    def paint(self, p, x, y):
+        """Draw the overlay with it's top left corner at x, y
+
+        Args:
+            p (QPainter):
+            x (int):
+            y (int):
+        """
+        data = self.summary()
+        if not data:
+            return
+
+        lines = [
+            "paint %.2fms (avg %.2f, max %.2f)" % (data["paint_ms"], data["avg_ms"], data["max_ms"]),
+            "nodes %d edges %d" % (data["nodes"], data["edges"]),
+            "repaints/sec %d" % data["fps"],
+            "repaints dropped %d" % data["dropped"],
+        ]
+
+        utils.set_pen(p, consts.COLOUR_ANTI_DEFAULT)
+        p.drawRect(x, y, self._WIDTH, self._LINE_HEIGHT * len(lines) + 4)
+
+        utils.set_pen(p, consts.COLOUR_DEFAULT)
+        for i, line in enumerate(lines):
+            p.drawText(
+                QRect(x + 4, y + 2 + i * self._LINE_HEIGHT, self._WIDTH - 8, self._LINE_HEIGHT),
+                Qt.AlignLeft,
+                line,
+            )
@@ -1,15 +1,23 @@
+import abc
 from collections import namedtuple
 from functools import partial
 
 from conversation.domain import actions
 from conversation.ui.manifest import *
 from conversation.ui import widgets
-from conversation.ui.events import Events
+from conversation.ui import events
 from conversation.ui import resources
+from conversation.ui.refresh import Refresher
+from conversation.ui.undo import Undo, Call
 
 
 class _Widgette(widgets.ClosablePanel):
-    """Properties widget super class -- this sets min size & adds a node-change listener
+    """Properties widget super class -- this sets min size & adds a node-change listener.
+
+    Panels describe what they show as a dict of fields (see _read_fields). We remember
+    the values we last showed so that when the selection changes or the user flushes
+    only fields the user edited are written to nodes, & only fields whose value
+    differs are updated in the panel.
     """
 
     _MIN_WIDTH = 300
@@ -27,26 +35,156 @@ class _Widgette(widgets.ClosablePanel):
 
         self._current_node = None
 
-        Events.Refresh.connect(self.repaint)
-        Events.NodeSelected.connect(self.__set_node)
-        Events.Flush.connect(self._flush)
+        # all selected nodes & the field values we last showed for the current node
+        self._selection = []
+        self._shown = {}
+
+        events.connect("Refresh", partial(Refresher.request, self))
+        events.connect("NodeSelected", self.__set_node)
+        events.connect("SelectionChanged", self.__set_selection)
+        events.connect("Flush", self._flush)
 
     def __set_node(self, n):
-        self._set_node(self._current_node, n)
+        self._store(self._current_node)
         self._current_node = n
-        self.repaint()
+        self._show_node(n)
+        Refresher.request(self)
+
+    def __set_selection(self, nodes):
+        self._store(self._current_node)
+        self._selection = nodes
 
     def _flush(self):
-        self._set_node(self._current_node, self._current_node)
+        self._store(self._current_node)
+        self._show_node(self._current_node)
+
+    def _reload(self):
+        """Show the current node's fields again, discarding any edits
+        """
+        self._show_node(self._current_node)
+
+    def _edited(self) -> dict:
+        """Return the fields the user has changed since we last showed / stored them
+
+        :return: dict
+
+        """
+        return {k: v for k, v in self._read_fields().items() if self._shown.get(k) != v}
+
+    def _store(self, node):
+        """Write the fields the user edited to the given node (& the rest of the
+        selection).
+
+        :param node: the node the panel is showing
+
+        """
+        if node is None:
+            return
+
+        edited = self._edited()
+        if not edited:
+            return
+
+        self._apply_to_selection(node, edited)
+        self._write_fields(node, edited)
+        self._shown = self._read_fields()
+
+    def _show_node(self, node):
+        """Show the given node's fields (or the defaults if None)
+
+        :param node:
+
+        """
+        fields = self._default_fields()
+        if node:
+            fields.update(self._node_fields(node))
+
+        self._show_fields(fields)
+        self._shown = self._read_fields()
+
+    def _apply_to_selection(self, primary, edited):
+        """Copy the fields edited in this panel from the primary node to every other
+        selected node, as one undo step. The primary node is written by _store.
+
+        :param primary: the node the panel is showing
+        :param edited: dict of edited fields
+
+        """
+        others = [n for n in self._selection if n is not primary]
+        if not others:
+            return
+
+        before = [(n, {k: v for k, v in self._node_fields(n).items() if k in edited}) for n in others]
+        before.append((primary, {k: v for k, v in self._shown.items() if k in edited}))
+
+        with Undo.group("edit %d nodes" % len(before), refresh=self._reload):
+            for n, fields in before:
+                if n is not primary:
+                    self._write_fields(n, edited)
+                Undo.add(Call("edit node", [
+                    partial(self._write_fields, n, fields),
+                ], redo=[
+                    partial(self._write_fields, n, edited),
+                ]))
 
-    def _set_node(self, old, new):
+    def _read_fields(self) -> dict:
+        """Return the values shown in the panel by field name
+
+        :return: dict
+
+        """
+        return {}
+
+    def _default_fields(self) -> dict:
+        """Return the fields shown when there is no node, or for fields a node
+        doesn't have.
+
+        :return: dict
+
+        """
+        return {}
+
+    def _node_fields(self, node) -> dict:
+        """Return the given node's values for the fields returned by _read_fields
+
+        :param node:
+        :return: dict
+
+        """
+        return {}
+
+    def _show_fields(self, fields):
+        """Display the given fields, only touching widgets whose value differs
+
+        :param fields: dict
+
+        """
+        pass
+
+    def _write_fields(self, node, fields):
+        """Set the given fields (as returned by _read_fields) on a node
+
+        :param node:
+        :param fields: dict
+
+        """
         pass
 
 
-class _GridWidgette(_Widgette):
+class _PanelMeta(type(QDockWidget), abc.ABCMeta):
+    """Lets Qt widgets declare abstract methods
+    """
+
+
+class _GridWidgette(_Widgette, metaclass=_PanelMeta):
     """A subclass of widget that expects it's fields to be laid out in a grid.
+
+    Each field is a row (label & widget). Rows are pooled: they're made the first
+    time a field needs one, & hidden rather than removed when no longer needed.
     """
 
+    _ROW = namedtuple("Row", "key label widget read write default")
+
     def __init__(self, parent):
         super(_GridWidgette, self).__init__(parent)
 
@@ -56,12 +194,16 @@ class _GridWidgette(_Widgette):
         grid.setLayout(self.layout)
         self.setWidget(grid)
 
+        # field key -> row, in the order rows were made, & the keys of hidden rows
+        self._rows = {}
+        self._pooled = set()
+
     def _add_widget_row(self, text, row, widget, tip=""):
         """Adds a widget with a label beside it.
 
         :param text:
         :param row:
-        :return: QCheckBox
+        :return: QLabel
         """
         label = QLabel(text)
         if tip:
@@ -69,7 +211,86 @@ class _GridWidgette(_Widgette):
             widget.setToolTip(tip)
         self.layout.addWidget(label, row, 1)
         self.layout.addWidget(widget, row, 2)
-        return widget
+        return label
+
+    def _add_field_row(self, key, text, field_type, tip=""):
+        """Make a (pooled) row for the given field
+
+        :param key: field key
+        :param text: label
+        :param field_type: bool or str
+        :param tip:
+        :return: namedTuple
+
+        """
+        if field_type == bool:
+            widget = QCheckBox()
+            row = self._ROW(key, None, widget, widget.isChecked, widget.setChecked, False)
+        else:
+            widget = QLineEdit()
+            row = self._ROW(key, None, widget, widget.text, widget.setText, "")
+
+        label = self._add_widget_row(text, len(self._rows) + 1, widget, tip=tip)  # rows start at 1
+        row = row._replace(label=label)
+        self._rows[key] = row
+        return row
+
+    @abc.abstractmethod
+    def _make_row(self, key):
+        """Make the row for a field we don't have a row for yet
+
+        :param key: field key
+        :return: namedTuple
+
+        """
+        pass
+
+    def _show_row(self, key, value=None):
+        """Make sure the given field's row is visible, making it if need be
+
+        :param key: field key
+        :param value: value to show, if given
+        :return: namedTuple
+
+        """
+        row = self._rows.get(key) or self._make_row(key)
+        if value is not None and row.read() != value:
+            row.write(value)
+        if key in self._pooled:
+            self._pooled.discard(key)
+            row.label.setVisible(True)
+            row.widget.setVisible(True)
+        return row
+
+    def _read_fields(self) -> dict:
+        return {k: row.read() for k, row in self._rows.items() if k not in self._pooled}
+
+    def _show_fields(self, fields):
+        for key, value in fields.items():
+            self._show_row(key, value)
+
+        for key, row in self._rows.items():
+            if key in fields or key in self._pooled:
+                continue
+
+            # not needed for this node -> return it to the pool
+            if row.read() != row.default:
+                row.write(row.default)
+            row.label.setVisible(False)
+            row.widget.setVisible(False)
+            self._pooled.add(key)
+
+    def _count_rows(self, prefix) -> int:
+        """Return the number of visible rows with keys (prefix, index)
+
+        :param prefix:
+        :return: int
+
+        """
+        return sum(
+            1 for k, row in self._rows.items()
+            if isinstance(k, tuple) and k[0] == prefix and k not in self._pooled
+        )
 
 
 class Properties(_GridWidgette):
@@ -81,51 +302,44 @@ class Properties(_GridWidgette):
 
     def __init__(self, parent):
         super(Properties, self).__init__(parent)
+        self._show_node(None)
 
-        self.is_root_node = self._add_widget_row(
+    def _make_row(self, key):
+        return self._add_field_row(
+            key,
             "Is root node",
-            1,
-            QCheckBox(),
-            tip="Set if this is the (or a) entry point for this conversation"
+            bool,
+            tip="Set if this is the (or a) entry point for this conversation",
         )
 
-    def _set_node(self, old, new):
-        """We've been handed a new node - we should update our displayed text
+    def _default_fields(self) -> dict:
+        return {"root_node": False}
 
-        :param old:
-        :param new:
+    def _node_fields(self, node) -> dict:
+        return {"root_node": node.root_node}
 
-        """
-        # save current state to node
-        if old:
-            old.root_node = self.is_root_node.isChecked()
-
-        # reset our fields
-        self.is_root_node.setChecked(False)
-
-        # set fields to the state(s) of the new node
-        if new:
-            self.is_root_node.setChecked(new.root_node)
+    def _write_fields(self, node, fields):
+        if "root_node" in fields:
+            node.root_node = fields["root_node"]
 
 
 class Actions(_GridWidgette):
-    """Simple widget to show actions panel for a node
+    """Simple widget to show actions panel for a node.
+
+    Each action a node has is a row keyed by (action name, index).
     """
 
     _TITLE = "Actions"
     _TIP = "Use this to trigger actions when this node is reached"
 
-    _ACT = namedtuple("Act", "action widget read write reset id")
-
     _ADD = "add.png"
 
+    # actions that always have (at least) one row, in display order
+    _ACTIONS = [actions.ClearState, actions.AddFlag, actions.SetState]
+
     def __init__(self, parent):
         super(Actions, self).__init__(parent)
-
-        self._widgets = []
-        self._add_action_row(actions.ClearState)
-        self._add_action_row(actions.AddFlag)
-        self._add_action_row(actions.SetState)
+        self._show_node(None)
 
     def _add_toolbar_actions(self):
         self._toolbar.addAction(QIcon(resources.get(self._ADD)), "Add", self.__add_setstate_action)
@@ -136,112 +350,51 @@ class Actions(_GridWidgette):
 
         :return:
         """
-        self._add_action_row(actions.SetState)
-        self.repaint()
+        self._show_row((actions.SetState.Name, self._count_rows(actions.SetState.Name)))
+        Refresher.request(self)
 
-    def _set_node(self, old, new):
-        """We've been handed a new node - we should update our displayed text
+    def _make_row(self, key):
+        action = actions.get_action_by_name(key[0])
+        return self._add_field_row(key, action.Text, action.Field, tip=action.Tip)
 
-        :param old:
-        :param new:
+    def _default_fields(self) -> dict:
+        return {(a.Name, 0): "" if a.Field == str else False for a in self._ACTIONS}
 
-        """
-        # save current state to node
-        if old:
-            old.actions = []  # reset node actions
-            for act in self._widgets:
-                old.actions.append((act.action, act.read()))
-
-        # reset our fields
-        for w in self._widgets:
-            w.reset()
-
-        # set fields to the state(s) of the new node
-        if not new:
-            return
+    def _node_fields(self, node) -> dict:
+        fields = {}
+        counts = {}
+        for (action, value) in node.actions:
+            index = counts.get(action.Name, 0)
+            counts[action.Name] = index + 1
+            fields[(action.Name, index)] = value
+        return fields
 
-        if not new.actions:
-            return
+    def _write_fields(self, node, fields):
+        merged = self._node_fields(node)
+        merged.update(fields)
 
-        done = []
-
-        def find(name):
-            """Find the first non unused widget for the given action.
-
-            :param name:
-            :return: namedTuple
-            """
-            for w in self._widgets:
-                if w.action.Name == name and w.id not in done:
-                    return w
-            return None
-
-        for (action, value) in new.actions:
-            m = find(action.Name)
-            if not m:
-                # if we don't find one, we'll just whack in another row -> boom
-                m = self._add_action_row(action)
-            m.write(value)
-            done.append(m.id)
-
-    def _add_action_row(self, action):
-        """A higher level abstraction over the '_add_widget_row' func,
-        this does the same thing, but keeps the widget & it's related action
-        together, as well as simplifying the
-
-        :param action:
-        :return: namedTuple
-
-        """
-        if action.Field == bool:
-            widget = QCheckBox()
-            read = widget.isChecked
-            write = widget.setChecked
-            reset = partial(widget.setChecked, False)
-        else:
-            widget = QLineEdit()
-            read = widget.text
-            write = widget.setText
-            reset = partial(widget.setText, "")
-
-        index = len(self._widgets)
-        self._add_widget_row(
-            action.Text,
-            index + 1,  # needs to be the row, starts at 1
-            widget,
-            tip=action.Tip,
-        )
-
-        act = self._ACT(action, widget, read, write, reset, index)
-        self._widgets.append(act)
-        return act
+        node.actions = [
+            (actions.get_action_by_name(name), value)
+            for (name, _), value in merged.items()
+            if value not in ("", False)  # blank text / unticked -> no action
+        ]
 
 
 class Conditions(_GridWidgette):
-    """Simple widget to show conditions panel for a node
+    """Simple widget to show conditions panel for a node.
+
+    Each required state is a row (of key=value) keyed by ("state", index).
     """
 
     _TITLE = "Conditions"
     _TIP = "Use this to set conditions that must be met for the conversation to reach this node"
     _ADD = "add.png"
 
+    _STATE = "state"
+
     def __init__(self, parent):
         super(Conditions, self).__init__(parent)
-
-        self.requires_user = self._add_widget_row(
-            "Requires user",
-            1,
-            QCheckBox(),
-            tip="Requires a logged in user. You probably almost always want this set .."
-        )
-        self.requires_flag = self._add_widget_row(
-            "Requires flag",
-            2,
-            QLineEdit(),
-            tip="Requires the user have the given flag."
-        )
-        self.required_states = []
-        self.__add_reqstate_field()
+        self._show_node(None)
 
     def _add_toolbar_actions(self):
         self._toolbar.addAction(QIcon(resources.get(self._ADD)), "Add", self.__add_reqstate_field)
@@ -252,69 +405,75 @@ class Conditions(_GridWidgette):
 
         :return:
         """
-        widget = QLineEdit()
-        self._add_widget_row(
+        self._show_row((self._STATE, self._count_rows(self._STATE)))
+        Refresher.request(self)
+
+    def _make_row(self, key):
+        if key == "requires_user":
+            return self._add_field_row(
+                key,
+                "Requires user",
+                bool,
+                tip="Requires a logged in user. You probably almost always want this set ..",
+            )
+        if key == "requires_flag":
+            return self._add_field_row(
+                key,
+                "Requires flag",
+                str,
+                tip="Requires the user have the given flag.",
+            )
+        return self._add_field_row(
+            key,
             "Require State",
-            len(self.required_states) + 3,  # needs to be the row, starts at 1
-            widget,
+            str,
             tip="Require a particular chat state set to reach here",
         )
-        self.required_states.append(widget)
-        self.repaint()
 
-    def _current_state(self) -> dict:
-        """Parse widget state into internal model state
+    @classmethod
+    def _parse_state(cls, fields) -> dict:
+        """Parse state rows into internal model state
 
+        :param fields: dict ("state", index) -> "key=value"
         :return: dict
 
         """
         state = {}
-        for w in self.required_states:
-            line = w.text()
-            if not line:
+        for _, line in sorted(fields.items(), key=lambda i: i[0][1]):
+            if not line or "=" not in line:
                 continue
 
-            if "=" not in line:
-                continue
-
-            k, v = line.split("=", 2)
+            k, v = line.split("=", 1)
             state[k] = v
         return state
 
-    def _set_node(self, old, new):
-        """We've been handed a new node - we should update our displayed text
-
-        :param old:
-        :param new:
-
-        """
-        # save current state to node
-        if old:
-            old.requires_user = self.requires_user.isChecked()
-            old.requires_flag = self.requires_flag.text()
-
-            x = self._current_state()
-            old.requires_state = x
-
-        # reset fields
-        self.requires_user.setChecked(True)  # default this to True
-        self.requires_flag.setText("")
-        for w in self.required_states:
-            w.setText("")
-
-        # set fields to state of new node
-        if new:
-            self.requires_user.setChecked(new.requires_user)
-            self.requires_flag.setText(new.requires_flag)
-
-            idx = 0
-            for k, v in new.requires_state.items():
-                while len(self.required_states) < idx:
-                    self.__add_reqstate_field()
-
-                w = self.required_states[idx]
-                w.setText("%s=%s" % (k, v))
-                idx += 1
+    def _default_fields(self) -> dict:
+        return {
+            "requires_user": True,  # default this to True
+            "requires_flag": "",
+            (self._STATE, 0): "",
+        }
+
+    def _node_fields(self, node) -> dict:
+        fields = {
+            "requires_user": node.requires_user,
+            "requires_flag": node.requires_flag or "",
+        }
+        for i, (k, v) in enumerate(node.requires_state.items()):
+            fields[(self._STATE, i)] = "%s=%s" % (k, v)
+        return fields
+
+    def _write_fields(self, node, fields):
+        if "requires_user" in fields:
+            node.requires_user = fields["requires_user"]
+        if "requires_flag" in fields:
+            node.requires_flag = fields["requires_flag"]
+
+        state = {k: v for k, v in fields.items() if isinstance(k, tuple)}
+        if state:
+            merged = {k: v for k, v in self._node_fields(node).items() if isinstance(k, tuple)}
+            merged.update(state)
+            node.requires_state = self._parse_state(merged)
 
 
 class Editor(_Widgette):
@@ -329,20 +488,22 @@ class Editor(_Widgette):
         self._editor = QTextEdit(self)
         self.setWidget(self._editor)
 
-    def _set_node(self, old, new):
-        """We've been handed a new node - we should update our displayed text
+    def _read_fields(self) -> dict:
+        return {"text": self._editor.toPlainText()}
 
-        :param old:
-        :param new:
+    def _default_fields(self) -> dict:
+        return {"text": ""}
 
-        """
-        if old:
-            old.text = self._editor.toPlainText()
+    def _node_fields(self, node) -> dict:
+        return {"text": node.text}
 
-        self._editor.setText("")
+    def _show_fields(self, fields):
+        if self._editor.toPlainText() != fields["text"]:
+            self._editor.setPlainText(fields["text"])
 
-        if new:
-            self._editor.setText(new.text)
+    def _write_fields(self, node, fields):
+        if "text" in fields:
+            node.text = fields["text"]
 
     @property
     def default_dock_widget_area(self):
@@ -35,10 +35,10 @@ def draw_hollow_rect(painter, x, y, width, height):
     :param height:
 
     """
-    painter.drawLine(x, y, x + width, y)
-    painter.drawLine(x + width, y, x + width, y + height)
-    painter.drawLine(x + width, y + width, x, y + height)
-    painter.drawLine(x, y + height, x, y)
+    painter.drawLine(QLineF(x, y, x + width, y))
+    painter.drawLine(QLineF(x + width, y, x + width, y + height))
+    painter.drawLine(QLineF(x + width, y + width, x, y + height))
+    painter.drawLine(QLineF(x, y + height, x, y))
 
 
 def set_pen(painter, rgb=(255, 255, 255)):
@@ -0,0 +1,98 @@
+"""Run slow jobs off the UI thread.
+
+The job is handed the worker, which it uses to report progress & check if it has
+been cancelled. Progress, the result & any error are delivered as signals, which
+Qt queues across to the UI thread -- so slots connected to them may touch widgets.
+Jobs must only work on data they own (eg. a snapshot), never on live UI models.
+"""
+import threading
+import traceback
+
+from conversation.ui.manifest import QObject, Signal
+from conversation.ui.trace import Tracer, Info, Warn
+
+
+class Cancelled(Exception):
+    """Raised (by Worker.check) within a job to stop it early
+    """
+    pass
+
+
+class Worker(QObject):
+
+    # something reported by the job as it runs
+    progress = Signal(object)
+
+    # the job's return value, not emitted if the job was cancelled
+    finished = Signal(object)
+
+    # the job raised, with the formatted error
+    failed = Signal(str)
+
+    def __init__(self, name, fn, *args):
+        """
+
+        :param name: for the thread & traces
+        :param fn: func(worker, *args)
+        :param args:
+
+        """
+        super(Worker, self).__init__()
+        self.name = name
+        self._fn = fn
+        self._args = args
+        self._cancel = threading.Event()
+        self._thread = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def cancel(self):
+        """Ask the job to stop, it's up to the job to check this.
+        """
+        self._cancel.set()
+
+    def check(self):
+        """Called by the job at convenient points, raises if the job should stop
+
+        :raises: Cancelled
+
+        """
+        if self.cancelled:
+            raise Cancelled()
+
+    def report(self, value):
+        """Called by the job to report progress
+
+        :param value:
+
+        """
+        if not self.cancelled:
+            self.progress.emit(value)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.__run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    def __run(self):
+        try:
+            result = self._fn(self, *self._args)
+        except Cancelled:
+            Tracer.record(self.name, Info, "job cancelled")
+            return
+        except Exception as e:
+            Tracer.record(self.name, Warn, "job failed %s", e)
+            self.failed.emit(traceback.format_exc())
+            return
+
+        if not self.cancelled:
+            self.finished.emit(result)
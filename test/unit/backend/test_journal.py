@@ -0,0 +1,77 @@
+from conversation.backend.journal import FilesystemJournal
+from conversation.domain import actions
+from conversation.domain.models import Graph, Node
+from conversation.handlers.base import InMemoryHandler
+
+
+def _graph():
+    g = Graph()
+
+    nodes = []
+    for i in range(4):
+        n = Node()
+        n.type = Node.Type.Message if i % 2 == 0 else Node.Type.Reply
+        n.number = i
+        n.root_node = i == 0
+        n.conditions.user_required = False
+        n.add_action(actions.AddFlag, f"flag{i}")
+        n.add_action(actions.SetState, f"at={i}")
+        g.add_node(n)
+        nodes.append(n)
+
+    for a, b in zip(nodes, nodes[1:]):
+        g.add_edge(a, b)
+    return g, nodes
+
+
+class TestFilesystemJournal:
+
+    def test_recover(self, tmp_path):
+        # arrange
+        g, nodes = _graph()
+        journal = FilesystemJournal("s1", str(tmp_path), batch_size=2, snapshot_every=2)
+        hnd = InMemoryHandler(g, apply=True, journal=journal)
+        for n in nodes[1:]:
+            hnd.current_node = n
+        journal.close()
+
+        # act
+        got = InMemoryHandler.recover(g, FilesystemJournal("s1", str(tmp_path)))
+
+        # assert
+        assert got.current_node == nodes[-1]
+        assert got.state() == hnd.state()
+        assert all(got.has_flag(f"flag{i}") for i in range(4))
+
+    def test_load_tail_only(self, tmp_path):
+        # arrange
+        journal = FilesystemJournal("s1", str(tmp_path), snapshot_every=100)
+        journal.record("a", [])
+        journal.snapshot({"node": "a"})
+        journal.record("b", [["AddFeature", "x"]])
+        journal.close()
+
+        # act
+        snapshot, tail = FilesystemJournal("s1", str(tmp_path)).load()
+
+        # assert
+        assert snapshot == {"node": "a"}
+        assert [e["node"] for e in tail] == ["b"]
+
+    def test_load_partial_record(self, tmp_path):
+        # arrange
+        journal = FilesystemJournal("s1", str(tmp_path))
+        journal.record("a", [])
+        journal.close()
+        with open(tmp_path / "s1.log", "ab") as f:
+            f.write(b'{"node": "b"')
+
+        # act
+        journal = FilesystemJournal("s1", str(tmp_path))
+        _, tail = journal.load()
+        journal.record("c", [])
+        journal.close()
+
+        # assert
+        assert [e["node"] for e in tail] == ["a"]
+        assert [e["node"] for e in FilesystemJournal("s1", str(tmp_path)).load()[1]] == ["a", "c"]
@@ -0,0 +1,124 @@
+from conversation.backend.base import FilesystemStorage
+from conversation.backend.recovery import FilesystemRecovery
+from conversation.domain.models import Graph, Node
+
+
+def _graph():
+    g = Graph()
+
+    nodes = []
+    for i in range(3):
+        n = Node(x=i, y=0)
+        n.type = Node.Type.Message
+        n.number = i
+        g.add_node(n)
+        nodes.append(n)
+
+    g.add_edge(nodes[0], nodes[1])
+    return g, nodes
+
+
+class TestFilesystemRecovery:
+
+    def test_replay_over_file(self, tmp_path):
+        # arrange
+        g, nodes = _graph()
+        source = FilesystemStorage().write("g", str(tmp_path), g)
+        recovery = FilesystemRecovery("r", str(tmp_path))
+        recovery.rebase(source)
+
+        nodes[0].text = "changed"
+        recovery.append({"nodes": [nodes[0].encode()], "edges": [[nodes[2].id, nodes[1].id]]})
+        recovery.append({"removed": [nodes[1].id]})
+        recovery.close()
+
+        # act
+        data, got_source = FilesystemRecovery("r", str(tmp_path)).read()
+
+        # assert
+        got = Graph.decode(data)
+        assert got_source == source
+        assert {n.id for n in got.nodes} == {nodes[0].id, nodes[2].id}
+        assert got.get_node(nodes[0].id).text == "changed"
+        assert list(got.edges) == []  # both edges touched the removed node
+
+    def test_exists(self, tmp_path):
+        # arrange
+        recovery = FilesystemRecovery("r", str(tmp_path))
+        recovery.rebase(None)
+        before = recovery.exists()
+
+        # act
+        recovery.append({"removed": ["x"]})
+
+        # assert
+        assert not before
+        assert recovery.exists()
+
+    def test_compact(self, tmp_path):
+        # arrange
+        g, nodes = _graph()
+        recovery = FilesystemRecovery("r", str(tmp_path), compact_every=2)
+        recovery.rebase(None)
+        due = [recovery.append({"nodes": [n.encode()]}) for n in nodes[:2]]
+        expect, _ = recovery.read()
+
+        # act
+        recovery.compact()
+
+        # assert
+        assert due == [False, True]
+        assert (tmp_path / "r.journal").stat().st_size == 0
+        assert recovery.read()[0] == expect
+
+    def test_read_partial_record(self, tmp_path):
+        # arrange
+        g, nodes = _graph()
+        recovery = FilesystemRecovery("r", str(tmp_path))
+        recovery.rebase(None)
+        recovery.append({"nodes": [nodes[0].encode()]})
+        recovery.close()
+        with open(tmp_path / "r.journal", "ab") as f:
+            f.write(b'{"nodes": [')
+
+        # act
+        recovery = FilesystemRecovery("r", str(tmp_path))
+        recovery.read()
+        recovery.append({"nodes": [nodes[1].encode()]})
+        recovery.close()
+
+        # assert
+        data, _ = FilesystemRecovery("r", str(tmp_path)).read()
+        assert {n["id"] for n in data["nodes"]} == {nodes[0].id, nodes[1].id}
+
+    def test_read_stale_offset(self, tmp_path):
+        # arrange -- as if we crashed after emptying the journal, before fixing the base
+        g, nodes = _graph()
+        recovery = FilesystemRecovery("r", str(tmp_path))
+        recovery.rebase(None)
+        recovery.append({"nodes": [nodes[0].encode()]})
+        recovery._write_base({"graph": recovery.read()[0], "offset": 10 ** 6})
+        open(tmp_path / "r.journal", "wb").close()
+
+        # act
+        first, _ = recovery.read()
+        recovery.append({"nodes": [nodes[1].encode()]})
+        second, _ = recovery.read()
+
+        # assert
+        assert [n["id"] for n in first["nodes"]] == [nodes[0].id]
+        assert {n["id"] for n in second["nodes"]} == {nodes[0].id, nodes[1].id}
+
+    def test_claim(self, tmp_path):
+        # arrange
+        first = FilesystemRecovery.claim("r", str(tmp_path))
+        second = FilesystemRecovery.claim("r", str(tmp_path))
+
+        # act
+        first.unlock()
+        third = FilesystemRecovery.claim("r", str(tmp_path))
+
+        # assert
+        assert second._base_path == str(tmp_path / "r-2.base")
+        assert third._base_path == str(tmp_path / "r.base")  # free once unlocked
+        assert not FilesystemRecovery("r-2", str(tmp_path)).lock()
@@ -0,0 +1,39 @@
+import pytest
+
+from conversation.backend.base import FilesystemStorage
+from conversation.domain.generator import GraphGenerator
+
+
+def _failing(nodes):
+    yield from nodes
+    raise RuntimeError("interrupted")
+
+
+class TestFilesystemStorage:
+
+    def test_write_stream(self, tmp_path):
+        # arrange
+        g = GraphGenerator(nodes=20, seed=1).graph()
+        edges = [(a.id, b.id) for a, b in g.edges]
+
+        # act
+        FilesystemStorage().write_stream("g", str(tmp_path), g.nodes, edges)
+
+        # assert
+        got = FilesystemStorage().read("g.cnv", str(tmp_path))
+        assert got.encode()["nodes"] == g.encode()["nodes"]
+        assert [p.name for p in tmp_path.iterdir()] == ["g.cnv"]
+
+    def test_write_stream_failed(self, tmp_path):
+        # arrange
+        g = GraphGenerator(nodes=20, seed=1).graph()
+        FilesystemStorage().write("g", str(tmp_path), g)
+        before = (tmp_path / "g.cnv").read_bytes()
+
+        # act
+        with pytest.raises(RuntimeError):
+            FilesystemStorage().write_stream("g", str(tmp_path), _failing(g.nodes), [])
+
+        # assert
+        assert (tmp_path / "g.cnv").read_bytes() == before
+        assert [p.name for p in tmp_path.iterdir()] == ["g.cnv"]
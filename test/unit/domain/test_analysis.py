@@ -0,0 +1,141 @@
+from conversation.domain import actions
+from conversation.domain.analysis import Reachability, Always, Never, Runtime
+from conversation.domain.models import Graph, Node
+from conversation.handlers.base import InMemoryHandler
+
+
+def _node(g, number, flag=None, state=None, acts=(), root=False):
+    n = Node()
+    n.type = Node.Type.Message if number % 2 == 0 else Node.Type.Reply
+    n.number = number
+    n.root_node = root
+    n.conditions.flag_required = flag
+    n.conditions.state_required = state or {}
+    for a, v in acts:
+        n.add_action(a, v)
+    g.add_node(n)
+    return n
+
+
+class TestReachability:
+
+    def test_verdicts(self):
+        # arrange
+        g = Graph()
+        root = _node(g, 0, root=True, acts=[(actions.AddFlag, "a"), (actions.SetState, "k=v")])
+        always = _node(g, 1, flag="a")
+        never_flag = _node(g, 2, flag="b")
+        never_state = _node(g, 3, state={"k": "x"})
+        runtime = _node(g, 4, state={"k": "v"})
+        for n in [always, never_flag, never_state, runtime]:
+            g.add_edge(root, n)
+
+        # act
+        r = Reachability(g)
+
+        # assert
+        assert r.verdict(None, root) == Always
+        assert r.verdict(root, always) == Always
+        assert r.verdict(root, never_flag) == Never
+        assert r.verdict(root, never_state) == Never
+        assert r.verdict(root, runtime) == Runtime
+        assert {n.id for n in r.dead_nodes} == {never_flag.id, never_state.id}
+
+    def test_clear_state(self):
+        # arrange
+        g = Graph()
+        root = _node(g, 0, root=True, acts=[(actions.SetState, "k=v")])
+        clear = _node(g, 1, acts=[(actions.ClearState, True)])
+        target = _node(g, 2, state={"k": "v"})
+        g.add_edge(root, clear)
+        g.add_edge(clear, target)
+
+        # act
+        r = Reachability(g)
+
+        # assert
+        assert r.verdict(clear, target) == Never
+
+    def test_flag_on_one_path(self):
+        # arrange
+        g = Graph()
+        root = _node(g, 0, root=True)
+        left = _node(g, 1, acts=[(actions.AddFlag, "a")])
+        right = _node(g, 2)
+        join = _node(g, 3)
+        target = _node(g, 4, flag="a")
+        for a, b in [(root, left), (root, right), (left, join), (right, join), (join, target)]:
+            g.add_edge(a, b)
+
+        # act
+        r = Reachability(g)
+
+        # assert
+        assert r.verdict(join, target) == Runtime
+
+    def test_handler_next_nodes(self):
+        # arrange
+        g = Graph()
+        root = _node(g, 0, root=True, acts=[(actions.AddFlag, "a")])
+        ok = _node(g, 1, flag="a")
+        dead = _node(g, 2, flag="b")
+        g.add_edge(root, ok)
+        g.add_edge(root, dead)
+
+        # act
+        hnd = InMemoryHandler(g, apply=True, reachability=Reachability(g))
+
+        # assert
+        assert hnd.next_nodes() == [ok]
+
+    def test_handler_root_not_applied(self):
+        # arrange
+        g = Graph()
+        root = _node(g, 0, root=True, acts=[(actions.AddFlag, "a")])
+        child = _node(g, 1, flag="a")
+        g.add_edge(root, child)
+
+        # act
+        assumes_applied = InMemoryHandler(g, reachability=Reachability(g))
+        not_applied = InMemoryHandler(g, reachability=Reachability(g, apply_roots=False))
+
+        # assert
+        assert Reachability(g, apply_roots=False).verdict(root, child) == Never
+        assert assumes_applied.next_nodes() == []
+        assert assumes_applied.choose_next() is None
+        assert not_applied.next_nodes() == []
+        assert not_applied.choose_next() is None
+
+    def test_handler_started_mid_graph(self):
+        # arrange
+        g = Graph()
+        root = _node(g, 0, root=True, acts=[(actions.AddFlag, "a")])
+        middle = _node(g, 1)
+        child = _node(g, 2, flag="a")
+        g.add_edge(root, middle)
+        g.add_edge(middle, child)
+
+        # act
+        hnd = InMemoryHandler(g, current=middle.id, apply=True, reachability=Reachability(g))
+
+        # assert
+        assert hnd.next_nodes() == []
+        assert hnd.choose_next() is None
+
+    def test_handler_choose_next_skips_never(self):
+        # arrange
+        g = Graph()
+        root = _node(g, 0, root=True, acts=[(actions.AddFlag, "a")])
+        ok = _node(g, 1, flag="a")
+        dead = _node(g, 3, flag="b")
+        g.add_edge(root, ok)
+        g.add_edge(root, dead)
+        hnd = InMemoryHandler(g, apply=True, reachability=Reachability(g), seed=1)
+        hnd.set_flag("b")  # set outside of the graph, so the analysis still rules it out
+
+        # act
+        chosen = {hnd.choose_next().id for _ in range(20)}
+
+        # assert
+        assert chosen == {ok.id}
+        assert hnd.next_nodes() == [ok]
@@ -0,0 +1,52 @@
+from conversation.backend import FilesystemStorage
+from conversation.domain.generator import GraphGenerator
+from conversation.domain.models import Node
+
+
+class TestGraphGenerator:
+
+    def test_graph(self):
+        # arrange
+        gen = GraphGenerator(nodes=500, roots=3, join=0.2, seed=2)
+
+        # act
+        g = gen.graph()
+
+        # assert
+        nodes = list(g.nodes)
+        assert len(nodes) == 500
+        assert len(g.roots) == 3
+        for a, b in g.edges:
+            assert a.type != b.type
+            assert a.number != b.number
+
+    def test_graph_deterministic(self):
+        # arrange
+        a = GraphGenerator(nodes=200, seed=5)
+        b = GraphGenerator(nodes=200, seed=5)
+
+        # act / assert
+        assert a.graph().encode() == b.graph().encode()
+
+    def test_graph_depth(self):
+        # arrange
+        gen = GraphGenerator(nodes=1000, depth=2, message_branching=2)
+
+        # act
+        g = gen.graph()
+
+        # assert
+        types = {n.type for n in g.nodes}
+        assert types == {Node.Type.Message, Node.Type.Reply}
+        assert len(list(g.nodes)) <= 3
+
+    def test_write(self, tmp_path):
+        # arrange
+        gen = GraphGenerator(nodes=300, join=0.1, seed=9)
+        storage = FilesystemStorage()
+
+        # act
+        gen.write(storage, "gen", str(tmp_path))
+
+        # assert
+        assert storage.read("gen.cnv", str(tmp_path)).encode() == gen.graph().encode()
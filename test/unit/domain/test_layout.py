@@ -0,0 +1,65 @@
+from conversation.domain.generator import GraphGenerator
+from conversation.domain.layout import LayeredLayout
+
+
+class TestLayeredLayout:
+
+    def test_positions(self):
+        # arrange
+        g = GraphGenerator(nodes=500, roots=2, join=0.2, seed=3).graph()
+        layout = LayeredLayout.from_graph(g, spacing=50, layer_spacing=100)
+
+        # act
+        positions = layout.positions()
+
+        # assert
+        assert len(positions) == 500
+
+        by_layer = {}
+        for n in g.nodes:
+            x, y = positions[n.id]
+            assert (x // 100) % 2 == (n.type == n.Type.Reply)  # messages & replies alternate
+            by_layer.setdefault(x, []).append(y)
+
+        for ys in by_layer.values():
+            ys.sort()
+            assert all(b - a >= 50 for a, b in zip(ys, ys[1:]))
+
+        for a, b in g.edges:
+            if a.number > b.number:
+                a, b = b, a
+            assert positions[a.id][0] < positions[b.id][0]
+
+    def test_run_progressive(self):
+        # arrange
+        g = GraphGenerator(nodes=100, seed=1).graph()
+        layout = LayeredLayout.from_graph(g, sweeps=3)
+
+        # act
+        passes = list(layout.run())
+
+        # assert
+        assert len(passes) == 4
+        assert all(len(p) == 100 for p in passes)
+
+    def test_subtree(self):
+        # arrange
+        nodes = [
+            ("a", 0, False, 0, 0),
+            ("b", 1, True, 500, 500),
+            ("c", 2, False, 0, 0),
+            ("d", 3, True, 0, 0),
+            ("e", 4, True, 0, 0),
+        ]
+        edges = [("a", "b"), ("c", "b"), ("c", "d"), ("e", "c")]
+        layout = LayeredLayout(nodes, edges, spacing=10, layer_spacing=20)
+
+        # act
+        positions = layout.positions(subtree="b")
+
+        # assert
+        assert set(positions) == {"b", "c", "d", "e"}
+        assert positions["b"] == (500, 500)
+        assert positions["c"] == (520, 500)
+        assert positions["d"] == (540, 500)
+        assert positions["e"] == (540, 510)
@@ -1,6 +1,8 @@
 import pytest
 
-from conversation.domain.models import Node, _Conditions
+from conversation.domain import actions
+from conversation.domain.generator import GraphGenerator
+from conversation.domain.models import Graph, Node, _Conditions
 
 
 class TestConditions:
@@ -124,3 +126,40 @@ class TestNode:
 
         assert data == expected
 
+
+class TestGraph:
+
+    def test_copy(self):
+        # arrange
+        g = GraphGenerator(nodes=50, seed=4).graph()
+
+        # act
+        c = g.copy()
+        for n in g.nodes:
+            n.metadata["x"] = -1
+            n.conditions.flag_required = "changed"
+            n.add_action(actions.AddFlag, "changed")
+
+        # assert
+        encoded = c.encode()
+        assert len(encoded["nodes"]) == 50
+        for n in encoded["nodes"]:
+            assert n["metadata"]["x"] != -1
+            assert n["conditions"]["flag"] != "changed"
+            assert [actions.AddFlag.Name, "changed"] not in n["actions"]
+
+    def test_encode_decode_progress(self, monkeypatch):
+        # arrange
+        monkeypatch.setattr(Graph, "_PROGRESS_EVERY", 10)
+        g = GraphGenerator(nodes=35, seed=4).graph()
+        encoded = []
+        decoded = []
+
+        # act
+        data = g.encode(progress=lambda done, total: encoded.append((done, total)))
+        result = Graph.decode(data, progress=lambda done, total: decoded.append((done, total)))
+
+        # assert
+        assert encoded == [(10, 35), (20, 35), (30, 35), (35, 35)]
+        assert decoded == encoded
+        assert result.encode() == data
@@ -0,0 +1,75 @@
+import json
+
+from conversation.domain.models import Node
+from conversation.handlers.encoders import (
+    to_facebook_message,
+    FacebookMessageEncoder,
+    FacebookMessageBatch,
+)
+
+
+def _node(text, type_=Node.Type.Reply):
+    n = Node()
+    n.type = type_
+    n.text = text
+    return n
+
+
+class TestFacebookMessageEncoder:
+
+    def test_encode(self):
+        # arrange
+        state = {"name": "bob \"the\" builder"}
+        msg = _node("hi {name} é", Node.Type.Message)
+        replies = [_node("static"), _node("hello {name}")]
+        enc = FacebookMessageEncoder()
+
+        # act
+        data = enc.encode(state, msg, replies)
+
+        # assert
+        assert data == json.dumps(to_facebook_message(state, msg, replies)).encode()
+
+    def test_encode_no_replies(self):
+        # arrange
+        msg = _node("bye", Node.Type.Message)
+        enc = FacebookMessageEncoder()
+
+        # act
+        data = enc.encode({}, msg, [])
+
+        # assert
+        assert data == json.dumps(to_facebook_message({}, msg, [])).encode()
+
+    def test_encode_text_changed(self):
+        # arrange
+        msg = _node("before", Node.Type.Message)
+        enc = FacebookMessageEncoder()
+        enc.encode({}, msg, [])
+        msg.text = "after"
+
+        # act
+        data = enc.encode({}, msg, [])
+
+        # assert
+        assert json.loads(data)["payload"]["text"] == "after"
+
+
+class TestFacebookMessageBatch:
+
+    def test_getvalue(self):
+        # arrange
+        msg = _node("hi {x}", Node.Type.Message)
+        replies = [_node("a"), _node("b")]
+        batch = FacebookMessageBatch()
+
+        # act
+        batch.add("s1", {"x": 1}, msg, replies)
+        batch.add("s2", {"x": 2}, msg, replies[:1])
+
+        # assert
+        assert len(batch) == 2
+        assert json.loads(batch.getvalue()) == {
+            "s1": to_facebook_message({"x": 1}, msg, replies),
+            "s2": to_facebook_message({"x": 2}, msg, replies[:1]),
+        }
@@ -0,0 +1,32 @@
+from conversation.domain.generator import GraphGenerator
+from conversation.handlers import memory
+
+
+class TestMemory:
+
+    def test_graph_report(self):
+        # arrange
+        g = GraphGenerator(nodes=100, seed=1).graph()
+
+        # act
+        report = memory.graph_report(g)
+
+        # assert
+        assert report["nodes"] == 100
+        assert report["edges"] == 99
+        components = [v for k, v in report.items() if k not in ("total", "nodes", "edges")]
+        assert all(v > 0 for v in components)
+        assert report["total"] == sum(components)
+
+    def test_session_report(self):
+        # arrange
+        g = GraphGenerator(nodes=100, user_required=0, seed=1).graph()
+
+        # act
+        report = memory.session_report(g, 10, max_steps=5)
+
+        # assert
+        assert report["sessions"] == 10
+        assert report["total"] == report["handler_objects"] + report["state"] + report["flags"] + report["other"]
+        assert report["per_session"] == report["total"] / 10
+        assert report["tracemalloc"] > 0
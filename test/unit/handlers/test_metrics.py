@@ -0,0 +1,139 @@
+import threading
+
+from conversation.domain import actions
+from conversation.domain.models import Graph, Node
+from conversation.handlers.base import InMemoryHandler
+from conversation.handlers.metrics import Metrics
+
+
+def _graph():
+    g = Graph()
+
+    root = Node()
+    root.type = Node.Type.Message
+    root.number = 0
+    root.root_node = True
+    root.add_action(actions.AddFlag, "a")
+    g.add_node(root)
+
+    children = []
+    for i, flag in enumerate(["a", "b", None]):
+        n = Node()
+        n.type = Node.Type.Reply
+        n.number = i + 1
+        n.conditions.flag_required = flag
+        n.conditions.state_required = {"k": "v"} if flag is None else {}
+        g.add_node(n)
+        g.add_edge(root, n)
+        children.append(n)
+
+    return g, root, children
+
+
+class TestMetrics:
+
+    def test_instrument(self):
+        # arrange
+        g, root, children = _graph()
+        metrics = Metrics()
+        cls = metrics.instrument(InMemoryHandler)
+
+        # act
+        hnd = cls(g, current=root.id)
+        hnd.current_node = root
+        options = hnd.next_nodes()
+        data = metrics.snapshot()
+
+        # assert
+        assert options == [children[0]]
+        assert data["steps"] == 1
+        assert data["next_nodes"] == 1
+        assert data["candidates_evaluated"] == 3
+        assert data["actions_applied"] == 1
+        assert data["condition_failures"] == {"user": 0, "flag": 1, "state": 1}
+        assert data["step_seconds"]["count"] == 1
+
+    def test_instrument_cached(self):
+        # arrange
+        metrics = Metrics()
+
+        # act / assert
+        assert metrics.instrument(InMemoryHandler) is metrics.instrument(InMemoryHandler)
+        assert issubclass(metrics.instrument(InMemoryHandler), InMemoryHandler)
+
+    def test_snapshot_threads(self):
+        # arrange
+        g, root, _ = _graph()
+        metrics = Metrics()
+        cls = metrics.instrument(InMemoryHandler)
+
+        def run():
+            hnd = cls(g, current=root.id)
+            for _ in range(100):
+                hnd.current_node = root
+
+        threads = [threading.Thread(target=run) for _ in range(4)]
+
+        # act
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        # assert
+        assert metrics.snapshot()["steps"] == 400
+
+    def test_fold_exited_threads(self):
+        # arrange
+        g, root, _ = _graph()
+        metrics = Metrics()
+        cls = metrics.instrument(InMemoryHandler)
+
+        def run():
+            hnd = cls(g, current=root.id)
+            for _ in range(10):
+                hnd.current_node = root
+
+        # act
+        for _ in range(20):
+            t = threading.Thread(target=run)
+            t.start()
+            t.join()
+        data = metrics.snapshot()
+
+        # assert
+        assert data["steps"] == 200
+        assert data["step_seconds"]["count"] == 200
+        assert len(metrics._shards) == 0
+
+    def test_reset(self):
+        # arrange
+        g, root, _ = _graph()
+        metrics = Metrics()
+        hnd = metrics.instrument(InMemoryHandler)(g, current=root.id)
+        hnd.current_node = root
+        old = metrics._shard()
+
+        # act
+        metrics.reset()
+        hnd.current_node = root
+
+        # assert
+        assert metrics.snapshot()["steps"] == 1
+        assert old.counters["steps"] == 1  # replaced, not zeroed under it's thread
+        assert metrics._shard() is not old
+
+    def test_to_prometheus(self):
+        # arrange
+        g, root, _ = _graph()
+        metrics = Metrics()
+        hnd = metrics.instrument(InMemoryHandler)(g, current=root.id)
+        hnd.next_nodes()
+
+        # act
+        text = metrics.to_prometheus()
+
+        # assert
+        assert "conversation_next_nodes_total 1\n" in text
+        assert 'conversation_condition_failures_total{type="flag"} 2\n' in text
+        assert "conversation_step_seconds_count 0\n" in text
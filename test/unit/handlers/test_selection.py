@@ -0,0 +1,137 @@
+import random
+
+from conversation.domain.models import Graph, Node
+from conversation.handlers.selection import (
+    UniformSelector,
+    WeightedSelector,
+    PrioritySelector,
+)
+
+
+def _graph(metadata):
+    g = Graph()
+
+    root = Node()
+    root.type = Node.Type.Reply
+    root.number = 0
+    root.root_node = True
+    g.add_node(root)
+
+    children = []
+    for i, meta in enumerate(metadata):
+        n = Node(**meta)
+        n.type = Node.Type.Message
+        n.number = i + 1
+        g.add_node(n)
+        g.add_edge(root, n)
+        children.append(n)
+
+    return g, root, children
+
+
+def _always(n):
+    return True
+
+
+class TestUniformSelector:
+
+    def test_choose_eligible_only(self):
+        # arrange
+        g, root, children = _graph([{}] * 10)
+        allowed = children[3]
+        sel = UniformSelector()
+
+        # act
+        got = {sel.choose(g, root, lambda n: n is allowed, random.Random(1)) for _ in range(20)}
+
+        # assert
+        assert got == {allowed}
+
+    def test_choose_none_eligible(self):
+        # arrange
+        g, root, _ = _graph([{}] * 3)
+        sel = UniformSelector()
+
+        # act
+        got = sel.choose(g, root, lambda n: False, random.Random(1))
+
+        # assert
+        assert got is None
+
+    def test_choose_root(self):
+        # arrange
+        g, root, _ = _graph([{}] * 3)
+        sel = UniformSelector()
+
+        # act
+        got = sel.choose(g, None, _always, random.Random(1))
+
+        # assert
+        assert got is root
+
+    def test_choose_seeded(self):
+        # arrange
+        g, root, _ = _graph([{}] * 10)
+        sel = UniformSelector()
+
+        # act
+        a = [sel.choose(g, root, _always, random.Random(7)) for _ in range(5)]
+        b = [sel.choose(g, root, _always, random.Random(7)) for _ in range(5)]
+
+        # assert
+        assert a == b
+
+
+class TestWeightedSelector:
+
+    def test_choose_distribution(self):
+        # arrange
+        g, root, children = _graph([{"weight": 1}, {"weight": 3}, {"weight": 0}])
+        sel = WeightedSelector()
+        rng = random.Random(3)
+
+        # act
+        got = [sel.choose(g, root, _always, rng) for _ in range(4000)]
+
+        # assert
+        assert got.count(children[2]) == 0
+        assert 0.7 < got.count(children[1]) / len(got) < 0.8
+
+    def test_choose_invalid_weights(self):
+        # arrange
+        g, root, children = _graph([{"weight": "3"}, {"weight": "heavy"}, {"weight": None}])
+        sel = WeightedSelector()
+        rng = random.Random(3)
+
+        # act
+        got = [sel.choose(g, root, _always, rng) for _ in range(4000)]
+
+        # assert
+        assert 0.55 < got.count(children[0]) / len(got) < 0.65  # 3 of 5, the others count as 1
+
+
+class TestPrioritySelector:
+
+    def test_choose_highest_eligible(self):
+        # arrange
+        g, root, children = _graph([{"priority": 1}, {"priority": 5}, {"priority": 3}])
+        sel = PrioritySelector()
+
+        # act
+        got = sel.choose(g, root, lambda n: n is not children[1], random.Random(1))
+
+        # assert
+        assert got is children[2]
+
+    def test_choose_mixed_priorities(self):
+        # arrange
+        g, root, children = _graph([{"priority": "2"}, {"priority": 1}, {"priority": "high"}, {}])
+        sel = PrioritySelector()
+
+        # act
+        got = sel.choose(g, root, _always, random.Random(1))
+        rest = {sel.choose(g, root, lambda n: n not in children[:2], random.Random(i)) for i in range(20)}
+
+        # assert
+        assert got is children[0]
+        assert rest == {children[2], children[3]}  # invalid counts as 0, like missing
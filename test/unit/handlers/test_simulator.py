@@ -0,0 +1,69 @@
+from conversation.domain.models import Graph, Node
+from conversation.handlers import simulator
+
+
+def _graph():
+    """root(msg) -> a(reply) -> end(msg)
+                 -> b(reply) (dead end)
+    """
+    g = Graph()
+
+    nodes = {}
+    for number, (name, type_) in enumerate([
+        ("root", Node.Type.Message),
+        ("a", Node.Type.Reply),
+        ("b", Node.Type.Reply),
+        ("end", Node.Type.Message),
+    ]):
+        n = Node()
+        n.id = name
+        n.type = type_
+        n.number = number
+        n.root_node = name == "root"
+        g.add_node(n)
+        nodes[name] = n
+
+    g.add_edge(nodes["root"], nodes["a"])
+    g.add_edge(nodes["root"], nodes["b"])
+    g.add_edge(nodes["a"], nodes["end"])
+    return g
+
+
+class TestSimulate:
+
+    def test_simulate(self):
+        # arrange
+        g = _graph()
+
+        # act
+        result = simulator.simulate(g, 200, seed=4)
+
+        # assert
+        assert result.walks == 200
+        assert result.visits["root"] == 200
+        assert result.visits["a"] + result.visits["b"] == 200
+        assert result.dead_ends["b"] == result.visits["b"]
+        assert result.lengths[2] == result.visits["end"]
+        assert result.steps == result.visits["a"] * 2 + result.visits["b"]
+
+    def test_simulate_seeded(self):
+        # arrange
+        g = _graph()
+
+        # act
+        a = simulator.simulate(g, 50, seed=1)
+        b = simulator.simulate(g, 50, seed=1)
+
+        # assert
+        assert a.visits == b.visits
+
+    def test_simulate_truncated(self):
+        # arrange
+        g = _graph()
+
+        # act
+        result = simulator.simulate(g, 10, max_steps=1)
+
+        # assert
+        assert result.truncated == 10
+        assert result.lengths == {1: 10}
@@ -0,0 +1,60 @@
+from conversation.ui.autosave import Autosave
+
+
+class _Model:
+
+    def __init__(self):
+        self.changed = set()
+        self.marked = set()
+
+    def edit(self, id_):
+        self.changed.add(id_)
+
+    def take_changes(self):
+        changed, self.changed = self.changed, set()
+        return {"nodes": [{"id": i} for i in sorted(changed)], "removed": [], "edges": [], "unlinked": []}
+
+    def mark_changed(self, ids=(), edges=()):
+        self.changed.update(ids)
+
+
+class _Recovery:
+
+    def __init__(self):
+        self.rebased = []
+
+    def rebase(self, source):
+        self.rebased.append(source)
+
+
+class TestAutosave:
+
+    def test_saved_keeps_unsaved_edits(self):
+        # arrange -- the thread isn't started, so jobs are only queued
+        model = _Model()
+        autosave = Autosave(_Recovery(), lambda: model)
+        model.edit("before")
+        autosave.begin_save()
+        model.edit("autosaved")
+        autosave.save()
+        model.edit("pending")
+
+        # act
+        autosave.saved("file")
+
+        # assert
+        assert model.take_changes()["nodes"] == [{"id": "autosaved"}, {"id": "pending"}]
+
+    def test_saved_without_edits(self):
+        # arrange
+        model = _Model()
+        autosave = Autosave(_Recovery(), lambda: model)
+        model.edit("before")
+        autosave.save()
+        autosave.begin_save()
+
+        # act
+        autosave.saved("file")
+
+        # assert
+        assert model.take_changes()["nodes"] == []
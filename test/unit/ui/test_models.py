@@ -0,0 +1,92 @@
+from conversation.domain.models import Graph, Node as DNode
+from conversation.ui.widgets.internal.models import NodeGraph, Node
+
+
+def _model(count, size=None):
+    g = Graph()
+    for i in range(count):
+        n = DNode(x=i * 100, y=0)
+        n.type = DNode.Type.Message if i % 2 == 0 else DNode.Type.Reply
+        n.number = i
+        if size:
+            n.metadata["size"] = size
+        g.add_node(n)
+
+    model = NodeGraph()
+    model.set_domain_graph(g, select=False)
+    return model, [model._nodes[n.id] for n in g.nodes]
+
+
+def _linked():
+    """Return a model with nodes 0 - 4 in a row, linked 0-1, 1-2, 2-3, 3-4 & 1-4
+    """
+    model, nodes = _model(5)
+    for a, b in [(0, 1), (1, 2), (2, 3), (3, 4), (1, 4)]:
+        model.add_edge(nodes[a], nodes[b])
+    return model, nodes
+
+
+def _keys(nodes, pairs):
+    return {NodeGraph._edge_key(nodes[a], nodes[b]) for a, b in pairs}
+
+
+_EVERYWHERE = (-1000, -1000, 1000, 1000)
+
+
+class TestNodeGraph:
+
+    def test_max_node_size(self):
+        # arrange
+        model, nodes = _model(1, size=200)
+        x0, y0, x1, y1 = nodes[0].bounds
+
+        # act
+        visible = list(model._visible_nodes(x1 - 1, y1 - 1, x1, y1))  # the node's far corner
+
+        # assert
+        assert model.max_node_size == 200
+        assert visible == nodes
+
+    def test_remove_nodes_edges(self):
+        # arrange
+        model, nodes = _linked()
+        list(model._visible_edges(*_EVERYWHERE))  # build the edge index
+
+        # act
+        removed = model.remove_nodes(nodes[1])
+
+        # assert
+        left = _keys(nodes, [(2, 3), (3, 4)])
+        assert {NodeGraph._edge_key(a, b) for a, b in removed} == _keys(nodes, [(0, 1), (1, 2), (1, 4)])
+        assert set(model._edges) == left
+        assert set(model._edge_index.query(*_EVERYWHERE)) == left
+        assert set().union(*model._incident.values()) == left
+        assert list(model.node_edges(nodes[0])) == []
+
+    def test_remove_nodes_shared_edge(self):
+        # arrange
+        model, nodes = _linked()
+
+        # act
+        removed = model.remove_nodes([nodes[1], nodes[2]])
+
+        # assert
+        keys = [NodeGraph._edge_key(a, b) for a, b in removed]
+        assert len(keys) == len(set(keys)) == 4  # 1-2 only once
+        assert set(model._edges) == _keys(nodes, [(3, 4)])
+
+    def test_restore_nodes(self):
+        # arrange
+        model, nodes = _linked()
+        before = set(model._edges)
+        list(model._visible_edges(*_EVERYWHERE))
+        removed = model.remove_nodes([nodes[1], nodes[2]])
+
+        # act
+        model.restore_nodes([nodes[1], nodes[2]], removed)
+
+        # assert
+        assert set(model._edges) == before
+        assert set(model.objects_in(*_EVERYWHERE)) == set(nodes)
+        assert {NodeGraph._edge_key(a, b) for a, b in model._visible_edges(*_EVERYWHERE)} == before
+        assert set(model.node_edges(nodes[1])) == {nodes[0], nodes[2], nodes[4]}
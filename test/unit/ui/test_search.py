@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+
+from conversation.domain import actions
+from conversation.ui.widgets.internal.search import SearchIndex, tokenize
+
+
+def _index(**nodes):
+    index = SearchIndex()
+    for id_, text in nodes.items():
+        index.update(id_, {w: SearchIndex.WeightText for w in tokenize(text)})
+    return index
+
+
+def _ids(results):
+    return [id_ for id_, _ in results]
+
+
+class TestSearchIndex:
+
+    def test_prefix(self):
+        # arrange
+        index = _index(a="hello there", b="help me", c="goodbye")
+
+        # act
+        got = index.search("hel")
+
+        # assert
+        assert sorted(_ids(got)) == ["a", "b"]
+        assert index.search("ello") == []  # only the start of a word matches
+
+    def test_all_words(self):
+        # arrange
+        index = _index(a="hello there", b="hello you", c="there you are")
+
+        # act
+        got = index.search("hello th")
+
+        # assert
+        assert _ids(got) == ["a"]
+        assert index.search("hello nobody") == []
+
+    def test_exact_word_ranked_first(self):
+        # arrange
+        index = _index(a="carpet", b="car")
+
+        # act
+        got = index.search("car")
+
+        # assert
+        assert got == [
+            ("b", SearchIndex.WeightText * SearchIndex.ExactBonus),
+            ("a", SearchIndex.WeightText),
+        ]
+
+    def test_flag_weight(self):
+        # arrange
+        index = SearchIndex()
+        index.update("text", SearchIndex.fields(SimpleNamespace(
+            text="vip", requires_flag=None, requires_state={}, actions=[],
+        )))
+        index.update("flag", SearchIndex.fields(SimpleNamespace(
+            text="", requires_flag="vip", requires_state={}, actions=[],
+        )))
+        index.update("action", SearchIndex.fields(SimpleNamespace(
+            text="", requires_flag=None, requires_state={}, actions=[(actions.AddFlag, "vip")],
+        )))
+
+        # act
+        got = index.search("vip")
+
+        # assert
+        assert _ids(got) == ["action", "flag", "text"]  # ties broken by id
+        assert got[0][1] == got[1][1] == SearchIndex.WeightFlag * SearchIndex.ExactBonus
+        assert got[2][1] == SearchIndex.WeightText * SearchIndex.ExactBonus
+
+    def test_update(self):
+        # arrange
+        index = _index(a="apple banana", b="banana")
+
+        # act
+        index.update("a", {"cherry": 1, "banana": 1})
+
+        # assert
+        assert index._words == sorted(index._postings) == ["banana", "cherry"]
+        assert index.search("apple") == []
+        assert _ids(index.search("cherry")) == ["a"]
+        assert sorted(_ids(index.search("banana"))) == ["a", "b"]
+
+    def test_remove(self):
+        # arrange
+        index = _index(a="apple banana", b="banana")
+
+        # act
+        index.remove("a")
+        index.remove("missing")
+
+        # assert
+        assert "a" not in index
+        assert len(index) == 1
+        assert index._words == sorted(index._postings) == ["banana"]
+        assert _ids(index.search("banana")) == ["b"]
+        assert index.search("apple") == []
@@ -0,0 +1,90 @@
+import random
+
+from conversation.ui.widgets.internal.spatial import SpatialGrid
+
+
+class TestSpatialGrid:
+
+    def test_insert(self):
+        # arrange
+        grid = SpatialGrid(cell=10)
+
+        # act
+        grid.insert("point", 5, 5)
+        grid.insert("box", 8, 8, 25, 12)
+
+        # assert
+        assert len(grid) == 2
+        assert set(grid.query(4, 4, 6, 6)) == {"point"}
+        assert set(grid.query(20, 10, 30, 11)) == {"box"}  # a cell the box overlaps
+        assert set(grid.query(0, 0, 9, 9)) == {"point", "box"}
+        assert set(grid.query(6, 0, 7, 4)) == set()  # same cell, outside both
+
+    def test_reinsert(self):
+        # arrange
+        grid = SpatialGrid(cell=10)
+        grid.insert("a", 5, 5, 15, 15)
+
+        # act
+        grid.insert("a", 105, 105)
+
+        # assert
+        assert len(grid) == 1
+        assert grid.bounds("a") == (105, 105, 105, 105)
+        assert list(grid.query(0, 0, 50, 50)) == []
+        assert list(grid.query(100, 100, 110, 110)) == ["a"]
+        assert set(grid._cells) == {(10, 10)}  # nothing left in the old cells
+
+    def test_remove(self):
+        # arrange
+        grid = SpatialGrid(cell=10)
+        grid.insert("a", 0, 0, 30, 5)
+        grid.insert("b", 25, 0)
+
+        # act
+        grid.remove("a")
+        grid.remove("missing")
+
+        # assert
+        assert "a" not in grid
+        assert list(grid.query(0, 0, 30, 5)) == ["b"]
+        assert set(grid._cells) == {(2, 0)}
+
+    def test_query_many_cells(self):
+        # arrange -- both ways of finding cells: walking the rect, or the cells we have
+        grid = SpatialGrid(cell=10)
+        rng = random.Random(2)
+        items = {}
+        for i in range(300):
+            x, y = rng.uniform(-500, 500), rng.uniform(-500, 500)
+            items[i] = (x, y, x + rng.uniform(0, 40), y + rng.uniform(0, 40))
+            grid.insert(i, *items[i])
+
+        rects = [(-480, -300, 420, 90), (-30, -30, 30, 30), (-1000, -1000, 1000, 1000)]
+
+        # act
+        got = [set(grid.query(*r)) for r in rects]
+
+        # assert
+        for found, (x0, y0, x1, y1) in zip(got, rects):
+            expect = {
+                i for i, (bx0, by0, bx1, by1) in items.items()
+                if bx0 <= x1 and bx1 >= x0 and by0 <= y1 and by1 >= y0
+            }
+            assert found == expect
+
+    def test_negative(self):
+        # arrange
+        grid = SpatialGrid(cell=10)
+        grid.insert("a", -15, -15, -5, -5)
+        grid.insert("b", -1, -1)
+        grid.insert("c", 1, 1)
+
+        # act
+        left = set(grid.query(-20, -20, -0.5, -0.5))
+        middle = set(grid.query(-1, -1, 1, 1))
+
+        # assert
+        assert left == {"a", "b"}
+        assert middle == {"b", "c"}
+        assert (-1, -1) in grid._cells  # -1 isn't in the same cell as 1
@@ -0,0 +1,169 @@
+from conversation.ui.undo import Command, Call, MoveNodes, _UndoManager
+
+
+class _Sized(Command):
+
+    def __init__(self, name, size, done):
+        self.name = name
+        self._size = size
+        self._done = done
+
+    def undo(self):
+        self._done.append(("undo", self.name))
+
+    def redo(self):
+        self._done.append(("redo", self.name))
+
+    def size(self) -> int:
+        return self._size
+
+
+class _Model:
+
+    def __init__(self):
+        self.positions = {}
+
+    def move_nodes(self, positions):
+        self.positions.update(positions)
+
+
+def _names(undo):
+    return [c.name for c, _ in undo._stack]
+
+
+class TestUndo:
+
+    def test_max_entries(self):
+        # arrange
+        undo = _UndoManager(max_entries=3)
+        done = []
+
+        # act
+        for i in range(5):
+            undo.add(_Sized(str(i), 10, done))
+
+        # assert
+        assert _names(undo) == ["2", "3", "4"]
+        assert undo.memory == 30
+
+    def test_max_bytes(self):
+        # arrange
+        undo = _UndoManager(max_bytes=250)
+        done = []
+
+        # act
+        for i in range(4):
+            undo.add(_Sized(str(i), 100, done))
+
+        # assert
+        assert _names(undo) == ["2", "3"]
+        assert undo.memory == 200
+
+    def test_trim_keeps_last(self):
+        # arrange
+        undo = _UndoManager()
+        done = []
+        for i in range(3):
+            undo.add(_Sized(str(i), 100, done))
+
+        # act
+        undo.configure(max_bytes=50)
+
+        # assert
+        assert _names(undo) == ["2"]  # over the bound, but the latest is never dropped
+        assert undo.memory == 100
+
+    def test_merge_moves(self):
+        # arrange
+        undo = _UndoManager()
+        model = _Model()
+
+        # act
+        undo.add(MoveNodes(model, {"a": (0, 0)}, {"a": (1, 1)}))
+        undo.add(MoveNodes(model, {"a": (1, 1)}, {"a": (2, 2)}))
+        undo.add(MoveNodes(model, {"b": (0, 0)}, {"b": (5, 5)}))
+        undo.undo()
+        undo.undo()
+
+        # assert
+        assert undo.size == 0
+        assert model.positions == {"a": (0, 0), "b": (0, 0)}
+
+    def test_merge_unmergeable(self):
+        # arrange
+        undo = _UndoManager()
+        model = _Model()
+
+        # act
+        undo.add(MoveNodes(model, {"a": (0, 0)}, {"a": (1, 1)}, name="layout", mergeable=False))
+        undo.add(MoveNodes(model, {"a": (1, 1)}, {"a": (2, 2)}, name="layout", mergeable=False))
+
+        # assert
+        assert undo.size == 2
+
+    def test_nested_group(self):
+        # arrange
+        undo = _UndoManager()
+        done = []
+        refreshed = []
+
+        with undo.group("outer", refresh=lambda: refreshed.append(len(done))):
+            undo.add(_Sized("a", 10, done))
+            with undo.group("inner"):
+                undo.add(_Sized("b", 10, done))
+                undo.add(_Sized("c", 10, done))
+
+        # act
+        undo.undo()
+        undo.redo()
+
+        # assert
+        assert _names(undo) == ["outer"]
+        assert done == [
+            ("undo", "c"), ("undo", "b"), ("undo", "a"),
+            ("redo", "a"), ("redo", "b"), ("redo", "c"),
+        ]
+        assert refreshed == [3, 6]  # once all are done
+
+    def test_empty_group(self):
+        # arrange
+        undo = _UndoManager()
+
+        # act
+        with undo.group("nothing"):
+            pass
+
+        # assert
+        assert undo.size == 0
+
+    def test_add_clears_redo(self):
+        # arrange
+        undo = _UndoManager()
+        done = []
+        undo.add(_Sized("a", 10, done))
+        undo.add(_Sized("b", 10, done))
+        undo.undo()
+
+        # act
+        undo.add(_Sized("c", 10, done))
+        undo.redo()
+
+        # assert
+        assert undo.next_redo_name is None
+        assert _names(undo) == ["a", "c"]
+        assert undo.memory == 20
+        assert done == [("undo", "b")]
+
+    def test_failed_undo(self):
+        # arrange
+        undo = _UndoManager()
+        undo.add(Call("ok", [lambda: None], redo=[lambda: None]))
+        undo.add(Call("broken", [lambda: 1 / 0], redo=[lambda: None]))
+        undo.undo()
+
+        # act
+        undo.undo()  # the failed one is dropped, this undoes the one before
+
+        # assert
+        assert undo.size == 0
+        assert undo.next_redo_name == "ok"